@@ -0,0 +1,116 @@
+# api_client.py
+"""EcoSeal Takeoff System - API CLIENT
+
+Thin client for the takeoff API (backend/main.py) shared by the Streamlit
+interface. One pooled, keep-alive HTTP session is reused for every call;
+idempotent reads are retried on connection errors and 502/503/504.
+
+Every Streamlit user's calls come from the Streamlit server's address, so
+they share one admission rate-limit bucket per route class on the API.
+"""
+
+import os
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Takeoff API base URL
+API_URL = os.getenv("API_URL", "http://localhost:8000").rstrip("/")
+
+# Seconds to wait for a connection / for a response
+TIMEOUT = (3, 30)
+
+
+class APIError(Exception):
+    """The API could not be reached or rejected the request"""
+
+
+def _idempotent(key):
+    return {"Idempotency-Key": key} if key else None
+
+
+class APIClient:
+    def __init__(self, base_url=API_URL, pool_size=10):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+        retry = Retry(
+            total=2,
+            backoff_factor=0.2,
+            status_forcelist=(429, 502, 503, 504),  # waits out Retry-After when the API sheds load
+            allowed_methods=frozenset({"GET", "HEAD"}),
+        )
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _request(self, method, path, **kwargs):
+        try:
+            response = self.session.request(method, f"{self.base_url}{path}", timeout=TIMEOUT, **kwargs)
+        except requests.RequestException as e:
+            raise APIError(f"Could not reach the API at {self.base_url}: {e}") from e
+        if not response.ok:
+            try:
+                detail = response.json().get("detail", response.text)
+            except ValueError:
+                detail = response.text
+            raise APIError(f"{method} {path} failed ({response.status_code}): {detail}")
+        return response.json()
+
+    # Projects
+
+    def list_projects(self):
+        """Projects with their takeoff count and quantity per material"""
+        return self._request("GET", "/api/projects")
+
+    def project_detail(self, project_id):
+        """A project, its takeoffs and their summary in one request"""
+        return self._request("GET", f"/api/projects/{project_id}/full")
+
+    def create_project(self, name, notes="", date=None, idempotency_key=None):
+        return self._request("POST", "/api/projects", json={"name": name, "notes": notes, "date": date},
+                             headers=_idempotent(idempotency_key))
+
+    # Takeoffs
+
+    def list_takeoffs(self, project_id):
+        return self._request("GET", f"/api/projects/{project_id}/takeoffs")
+
+    def create_takeoffs(self, project_id, takeoffs, idempotency_key=None):
+        """Create every takeoff row in one request"""
+        return self._request("POST", f"/api/projects/{project_id}/takeoffs/batch", json=list(takeoffs),
+                             headers=_idempotent(idempotency_key))
+
+    def save_project(self, name, takeoffs, notes="", date=None, idempotency_key=None):
+        """
+        Create a project and its takeoffs: two requests however many rows
+        there are. Calling again with the same `idempotency_key` after a
+        failure finishes the save without duplicating what was written.
+        """
+        key = idempotency_key or uuid.uuid4().hex
+        project = self.create_project(name, notes=notes, date=date, idempotency_key=f"{key}-project")
+        return project, self.create_takeoffs(project["id"], takeoffs, idempotency_key=f"{key}-takeoffs")
+
+    # Sync
+
+    def sync(self, since=0):
+        """Rows changed and ids deleted since sequence number `since`"""
+        return self._request("GET", "/api/sync", params={"since": since})
+
+    # Material orders
+
+    def orders(self, project_id=None, delivery_drums=None):
+        """Material orders per delivery phase for one project, or the roll-up over open projects"""
+        path = f"/api/projects/{project_id}/orders" if project_id is not None else "/api/orders"
+        params = {"delivery_drums": delivery_drums} if delivery_drums else None
+        return self._request("GET", path, params=params)
+
+    # Stats
+
+    def stats(self):
+        return self._request("GET", "/api/stats")
+
+    def analytics(self, period="month", **filters):
+        params = {"period": period, **{k: v for k, v in filters.items() if v is not None}}
+        return self._request("GET", "/api/analytics", params=params)
@@ -0,0 +1,294 @@
+"""
+EcoSeal Takeoff System - Admission Control
+Per-route-class concurrency limits, bounded queues and per-client rate limits
+
+Every request is put in a route class:
+
+    crud        project, takeoff, revision and settings calls
+    export      large reads: sync, stats, analytics, orders, segments
+    extraction  PDF upload and indexing, takeoff calculation, import
+    tiles       plan viewer tiles and boundary overlays
+
+Tiles get a class of their own with a high rate: one sheet view asks for a
+dozen or more at once, through plain <img> tags that never retry a 429.
+
+Each class has its own concurrency limit and a bounded queue in front of
+it, so a burst of extraction or export requests waits in (or is turned
+away from) its own queue instead of taking every thread the sync
+endpoints run on. A request that finds its class's queue full, or waits
+longer than QUEUE_TIMEOUT_S, gets 503; a client over its class's
+token-bucket rate gets 429. Both carry Retry-After and are answered
+without touching the app, so shedding costs next to nothing.
+
+Limits are set per class from the environment, e.g.
+ADMISSION_EXTRACTION_CONCURRENCY=4, ADMISSION_EXTRACTION_QUEUE=8,
+ADMISSION_EXTRACTION_RATE=0.5 (requests per second per client) and
+ADMISSION_EXTRACTION_BURST=5. A concurrency of 0 turns a class's limits
+off.
+"""
+
+import asyncio
+import json
+import math
+import os
+import re
+import time
+from collections import OrderedDict, deque
+
+from starlette.datastructures import Headers
+
+
+def _setting(route_class, name, default):
+    return type(default)(os.getenv(f"ADMISSION_{route_class.upper()}_{name}", default))
+
+
+# Route class -> (concurrency, queue length, requests per second per client, burst)
+DEFAULT_LIMITS = {
+    "crud": (16, 64, 20.0, 40),
+    "export": (4, 8, 2.0, 10),
+    "extraction": (4, 8, 0.5, 5),
+    "tiles": (4, 64, 20.0, 100),
+}
+
+LIMITS = {
+    route_class: {
+        "concurrency": _setting(route_class, "CONCURRENCY", concurrency),
+        "queue": _setting(route_class, "QUEUE", queue),
+        "rate": _setting(route_class, "RATE", rate),
+        "burst": _setting(route_class, "BURST", burst),
+    }
+    for route_class, (concurrency, queue, rate, burst) in DEFAULT_LIMITS.items()
+}
+
+# Seconds a queued request waits for a slot before it is shed with 503
+QUEUE_TIMEOUT_S = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_S", "10"))
+
+# Clients tracked for rate limiting; idle ones are dropped first
+MAX_CLIENTS = int(os.getenv("ADMISSION_MAX_CLIENTS", "10000"))
+
+# Proxies in front of the app that append to X-Forwarded-For (1 on Railway or Vercel).
+# 0 ignores the header, which clients can set to anything
+TRUSTED_PROXIES = int(os.getenv("ADMISSION_TRUSTED_PROXIES", "0"))
+
+# Paths never limited: health checks, docs, the root
+EXEMPT = re.compile(r"^/(health(/.*)?|docs|redoc|openapi\.json)?$")
+
+# (method, path pattern, route class); first match wins, anything else is crud
+ROUTES = [
+    ("POST", r"^/api/projects/\d+/plans$", "extraction"),
+    ("POST", r"^/api/projects/\d+/takeoffs/calculate$", "extraction"),
+    ("GET", r"^/api/projects/\d+/plans/[^/]+/pages/\d+/(tiles/.+\.png|boundary\.(geojson|svg))$", "tiles"),
+    ("POST", r"^/api/import$", "extraction"),
+    ("GET", r"^/api/(sync|stats|analytics|orders)$", "export"),
+    ("GET", r"^/api/projects/\d+/(full|orders|segments|revisions/diff)$", "export"),
+    ("GET", r"^/api/projects/\d+/revisions/\d+/takeoffs$", "export"),
+]
+
+_ROUTES = [(method, re.compile(pattern), route_class) for method, pattern, route_class in ROUTES]
+
+# Smoothing for the per-class service time behind Retry-After
+_LATENCY_WEIGHT = 0.2
+
+
+def classify(method, path):
+    """Route class of a request"""
+    for route_method, pattern, route_class in _ROUTES:
+        if method == route_method and pattern.match(path):
+            return route_class
+    return "crud"
+
+
+def client_key(scope, trusted_proxies=TRUSTED_PROXIES):
+    """
+    The client a request counts against. Each trusted proxy appends the
+    address it received the request from, so the client is the
+    `trusted_proxies`-th X-Forwarded-For hop from the right; hops further
+    left came from the client and are ignored. Otherwise the peer address.
+    """
+    if trusted_proxies > 0:
+        hops = [hop.strip() for hop in Headers(scope=scope).get("x-forwarded-for", "").split(",") if hop.strip()]
+        if len(hops) >= trusted_proxies:
+            return hops[-trusted_proxies]
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+# ============================================================================
+# LIMITS
+# ============================================================================
+
+class TokenBuckets:
+    """Per-client token buckets for one route class, kept in memory"""
+
+    def __init__(self, rate, burst, max_clients=MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self.buckets = OrderedDict()  # client -> (tokens, updated), least recently seen first
+
+    def take(self, client, now=None):
+        """Take a token for `client`; returns 0, or the seconds until one is available"""
+        if self.rate <= 0:
+            return 0.0
+        now = time.monotonic() if now is None else now
+        tokens, updated = self.buckets.pop(client, (self.burst, now))
+        tokens = min(self.burst, tokens + (now - updated) * self.rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / self.rate
+        self.buckets[client] = (tokens, now)
+        while len(self.buckets) > self.max_clients:
+            self.buckets.popitem(last=False)
+        return wait
+
+
+class Limiter:
+    """
+    Concurrency limit with a bounded FIFO queue for one route class.
+    Runs on the event loop, so plain counters need no lock.
+    """
+
+    def __init__(self, concurrency, queue, queue_timeout_s=QUEUE_TIMEOUT_S):
+        self.concurrency = concurrency
+        self.queue = queue
+        self.queue_timeout_s = queue_timeout_s
+        self.active = 0
+        self.waiters = deque()
+        self.latency_s = 0.0
+        self.counts = {"admitted": 0, "queued": 0, "shed_full": 0, "shed_timeout": 0, "rate_limited": 0}
+
+    async def acquire(self):
+        """True once a slot is held; False when the queue is full or the wait times out"""
+        if self.active < self.concurrency and not self.waiters:
+            self.active += 1
+            self.counts["admitted"] += 1
+            return True
+        if len(self.waiters) >= self.queue:
+            self.counts["shed_full"] += 1
+            return False
+        waiter = asyncio.get_running_loop().create_future()
+        self.waiters.append(waiter)
+        self.counts["queued"] += 1
+        try:
+            await asyncio.wait_for(waiter, self.queue_timeout_s)
+        except asyncio.TimeoutError:
+            if waiter in self.waiters:
+                self.waiters.remove(waiter)
+            self.counts["shed_timeout"] += 1
+            return False
+        except asyncio.CancelledError:
+            # Client went away; pass on a slot that was already handed over
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        self.counts["admitted"] += 1
+        return True
+
+    def release(self, seconds=None):
+        if seconds is not None:
+            weight = _LATENCY_WEIGHT if self.latency_s else 1.0
+            self.latency_s += weight * (seconds - self.latency_s)
+        while self.waiters:
+            waiter = self.waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(True)  # the slot passes straight to the next in line
+                return
+        self.active -= 1
+
+    def retry_after(self):
+        """Seconds until the queue ahead has likely drained"""
+        return self.latency_s * (len(self.waiters) + 1) / max(1, self.concurrency)
+
+    def status(self):
+        return {
+            "concurrency": self.concurrency,
+            "queue": self.queue,
+            "active": self.active,
+            "waiting": len(self.waiters),
+            "latency_ms": round(self.latency_s * 1000, 1),
+            **self.counts,
+        }
+
+
+# ============================================================================
+# MIDDLEWARE
+# ============================================================================
+
+class AdmissionController:
+    """Limiters and token buckets for every route class"""
+
+    def __init__(self, limits=LIMITS, queue_timeout_s=QUEUE_TIMEOUT_S):
+        self.limits = limits
+        self.limiters = {
+            route_class: Limiter(limit["concurrency"], limit["queue"], queue_timeout_s)
+            for route_class, limit in limits.items()
+        }
+        self.buckets = {
+            route_class: TokenBuckets(limit["rate"], limit["burst"]) for route_class, limit in limits.items()
+        }
+
+    def thread_demand(self):
+        """Sync endpoint threads the class limits can keep busy at once"""
+        return sum(limit["concurrency"] for limit in self.limits.values())
+
+    def status(self):
+        return {
+            route_class: dict(limiter.status(), rate=self.limits[route_class]["rate"],
+                              burst=self.limits[route_class]["burst"],
+                              clients=len(self.buckets[route_class].buckets))
+            for route_class, limiter in self.limiters.items()
+        }
+
+
+async def _reject(send, status_code, detail, retry_after):
+    body = json.dumps({"detail": detail}).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status_code,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an AdmissionController. A request's slot is
+    held until its response has been sent in full, streamed bodies
+    included.
+    """
+
+    def __init__(self, app, controller):
+        self.app = app
+        self.controller = controller
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "OPTIONS" or EXEMPT.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        route_class = classify(scope["method"], scope["path"])
+        limiter = self.controller.limiters[route_class]
+        if limiter.concurrency <= 0:
+            await self.app(scope, receive, send)
+            return
+
+        wait = self.controller.buckets[route_class].take(client_key(scope))
+        if wait:
+            limiter.counts["rate_limited"] += 1
+            await _reject(send, 429, f"Too many {route_class} requests; slow down", wait)
+            return
+        if not await limiter.acquire():
+            await _reject(send, 503, f"Server busy with {route_class} requests; try again shortly",
+                          limiter.retry_after())
+            return
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release(time.perf_counter() - started)
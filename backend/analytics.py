@@ -0,0 +1,141 @@
+"""
+EcoSeal Takeoff System - Analytics
+Time-bucketed takeoff and project aggregates from daily rollups
+
+Takeoffs roll up per (day, material) into sums - takeoff count, square
+footage, R-value x area, area with a known R-value, RED count - and
+projects into a count per day. Sums can be adjusted by a row's
+contribution when it is written, so the rollups are maintained
+incrementally and never rebuilt from raw rows; week and month buckets are
+regrouped from the daily rows, a few hundred per year of data.
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from assemblies import r_number
+
+PERIODS = ("day", "week", "month")
+
+# Additive takeoff measures kept per (day, material)
+MEASURES = ("takeoffs", "sqft", "r_weighted", "r_sqft", "red")
+
+
+def day_of(value):
+    if value is None:
+        return datetime.utcnow().date()
+    return value.date() if isinstance(value, datetime) else value
+
+
+def takeoff_contribution(values, sign=1):
+    """
+    ((day, material), measures) added to the rollups by one takeoff row
+    (sign=1) or removed when it is deleted or changed (sign=-1). `values`
+    holds created_at, material_type, quantity, r_value and confidence.
+    """
+    quantity = values["quantity"] or 0.0
+    r = r_number(values["r_value"])
+    return (day_of(values["created_at"]), values["material_type"]), {
+        "takeoffs": sign,
+        "sqft": sign * quantity,
+        "r_weighted": sign * r * quantity if r is not None else 0.0,
+        "r_sqft": sign * quantity if r is not None else 0.0,
+        "red": sign if values["confidence"] == "RED" else 0,
+    }
+
+
+def takeoff_rollups(days, materials, quantity, r_values, confidence):
+    """
+    combine(takeoff_contribution(row) for row in rows) for many new rows
+    at once, from column arrays (days as datetime64).
+    """
+    r_table, r_index = np.unique(np.asarray(r_values, dtype=str), return_inverse=True)
+    r = np.array([r_number(v) if r_number(v) is not None else np.nan for v in r_table])[r_index]
+    rated = ~np.isnan(r)
+    material_table, material_index = np.unique(np.asarray(materials, dtype=str), return_inverse=True)
+    day_numbers = np.asarray(days).astype("datetime64[D]").astype(np.int64)
+    keys, group = np.unique(day_numbers * len(material_table) + material_index, return_inverse=True)
+
+    sums = {
+        "takeoffs": np.bincount(group, minlength=len(keys)),
+        "sqft": np.bincount(group, weights=quantity, minlength=len(keys)),
+        "r_weighted": np.bincount(group, weights=np.where(rated, r * quantity, 0.0), minlength=len(keys)),
+        "r_sqft": np.bincount(group, weights=np.where(rated, quantity, 0.0), minlength=len(keys)),
+        "red": np.bincount(group, weights=np.asarray(confidence) == "RED", minlength=len(keys)),
+    }
+    days_out = (keys // len(material_table)).astype("datetime64[D]").tolist()
+    return {
+        (day, str(material_table[k % len(material_table)])): {
+            name: (int(values[i]) if name in ("takeoffs", "red") else float(values[i]))
+            for name, values in sums.items()
+        }
+        for i, (k, day) in enumerate(zip(keys, days_out))
+    }
+
+
+def project_contribution(project_date, sign=1):
+    """((day,), measures) added to the rollups by one project"""
+    return (day_of(project_date),), {"projects": sign}
+
+
+def combine(contributions):
+    """Sum contributions per key, dropping keys that cancel out"""
+    totals = {}
+    for key, measures in contributions:
+        current = totals.setdefault(key, {})
+        for name, value in measures.items():
+            current[name] = current.get(name, 0) + value
+    return {key: m for key, m in totals.items() if any(m.values())}
+
+
+def bucket_start(day, period):
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return day.replace(day=1)
+    return day
+
+
+def _summarise(b):
+    return {
+        "projects": b["projects"],
+        "takeoffs": b["takeoffs"],
+        "sqft": round(float(b["sqft"]), 1),
+        "avg_r_value": round(b["r_weighted"] / b["r_sqft"], 1) if b["r_sqft"] else None,
+        "red_rate": round(b["red"] / b["takeoffs"], 3) if b["takeoffs"] else None,
+        "materials": {m: round(q, 1) for m, q in sorted(b["materials"].items())},
+    }
+
+
+def _empty():
+    return {"projects": 0, "materials": {}, **dict.fromkeys(MEASURES, 0)}
+
+
+def series(takeoff_rows, project_rows, period="month", material=None):
+    """
+    Regroup daily rollups into period buckets.
+
+    `takeoff_rows` are (day, material_type, takeoffs, sqft, r_weighted,
+    r_sqft, red); `project_rows` are (day, projects). With `material`,
+    takeoff figures cover that material only. Returns (buckets oldest
+    first, totals over all of them).
+    """
+    if period not in PERIODS:
+        raise ValueError(f"Period must be one of {PERIODS}")
+    buckets = {}
+    overall = _empty()
+
+    for day, count in project_rows:
+        for b in (buckets.setdefault(bucket_start(day, period), _empty()), overall):
+            b["projects"] += count
+    for day, material_type, *measures in takeoff_rows:
+        for b in (buckets.setdefault(bucket_start(day, period), _empty()), overall):
+            b["materials"][material_type] = b["materials"].get(material_type, 0.0) + measures[1]
+            if material is None or material_type == material:
+                for name, value in zip(MEASURES, measures):
+                    b[name] += value
+
+    return [
+        {"start": start.isoformat(), **_summarise(b)} for start, b in sorted(buckets.items())
+    ], _summarise(overall)
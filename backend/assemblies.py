@@ -0,0 +1,197 @@
+"""
+EcoSeal Takeoff System - Assembly Parser
+Structured wall assemblies from free-text schedule entries
+
+Schedules describe assemblies as text like '2x6 studs, 3.5" ccSPF, 6mil
+poly' with the R-value alongside as 'R-30'. One compiled tokenizer reads
+the framing, each insulation layer with its thickness, and the vapour
+barrier in a single pass, and the R-value becomes a number: the stated one
+when there is one, otherwise an estimate from layer thickness x R per
+inch. Results are memoized by string, since a project repeats a handful of
+assemblies across hundreds of rows.
+
+parse_wall_schedule reads the schedule table itself (wall type,
+description, assembly, R-value) from a schedule page's words.
+"""
+
+import re
+from functools import lru_cache
+
+# Distinct (assembly, R-value) strings kept parsed in memory
+PARSE_CACHE_SIZE = 4096
+
+# Insulation name -> (pattern, R per inch) for estimating unstated R-values
+INSULATION = {
+    "ccSPF": (r"cc\s*-?\s*spf|closed[- ]cell(?:\s+spray)?(?:\s+foam)?", 6.5),
+    "ocSPF": (r"oc\s*-?\s*spf|open[- ]cell(?:\s+spray)?(?:\s+foam)?", 3.7),
+    "mineral_wool": (r"mineral\s+wool|rock\s*wool", 4.2),
+    "batt": (r"(?:fib(?:er|re)glass\s+)?batts?|fib(?:er|re)glass", 3.7),
+    "polyiso": (r"polyiso(?:cyanurate)?", 6.0),
+    "XPS": (r"xps", 5.0),
+    "EPS": (r"eps", 4.0),
+}
+
+# Actual depth (inches) of nominal 2x lumber
+LUMBER_DEPTH_IN = {"2x3": 2.5, "2x4": 3.5, "2x6": 5.5, "2x8": 7.25, "2x10": 9.25, "2x12": 11.25}
+
+_NUMBER = r"\d+(?:\.\d+)?(?:[- ]\d+/\d+)?|\d+/\d+"
+_INCH = r"(?:\"|”|″|\s*in\b\.?|\s*inch(?:es)?\b)"
+
+R_VALUE = re.compile(r"R-?\s*(\d+(?:\.\d+)?)", re.IGNORECASE)
+
+# Wall type marks in a schedule's first column: EW-1, IW2, W1A
+WALL_TYPE = re.compile(r"^[A-Z]{1,3}-?\d{1,3}[A-Z]?$")
+
+# Wall schedule header words -> column
+SCHEDULE_HEADERS = {
+    "WALL": "wall_type", "TYPE": "wall_type", "MARK": "wall_type", "TAG": "wall_type",
+    "DESCRIPTION": "description", "LOCATION": "description",
+    "ASSEMBLY": "assembly", "CONSTRUCTION": "assembly", "COMPOSITION": "assembly",
+    "R-VALUE": "r_value", "RVALUE": "r_value", "R": "r_value",
+}
+
+TOKENS = re.compile("|".join([
+    r"(?P<lumber>\b2\s*x\s*(?P<lumber_size>\d{1,2})\b(?:\s*(?:wood\s+)?studs?)?)",
+    rf"(?P<steel>(?:(?P<steel_depth>{_NUMBER}){_INCH}\s*)?(?:steel|metal)\s+studs?)",
+    rf"(?P<cmu>(?:(?P<cmu_depth>\d+){_INCH}?\s*)?\bcmu\b)",
+    rf"(?P<insulation>(?:(?P<thickness>{_NUMBER}){_INCH}\s*)?(?:"
+    + "|".join(rf"(?P<{name.lower()}>\b(?:{pattern})\b)" for name, (pattern, _) in INSULATION.items())
+    + "))",
+    r"(?P<barrier>(?:(?P<mil>\d+(?:\.\d+)?)\s*-?\s*mil\b\s*(?:poly(?:ethylene)?\b|vb\b|vapou?r\s+(?:barrier|retarder))?)"
+    r"|\bpoly(?:ethylene)?\s+vapou?r\s+(?:barrier|retarder)|\bvapou?r\s+(?:barrier|retarder))",
+    r"(?P<r_value>\bR\s*-?\s*(?P<r_number>\d+(?:\.\d+)?))",
+]), re.IGNORECASE)
+
+
+def _inches(text):
+    """'1.5', '1-1/2', '1 1/2' or '3/4' as a float"""
+    parts = re.split(r"[- ]", text.strip())
+    whole, fraction = (float(parts[0]), parts[1]) if len(parts) == 2 else (0.0, parts[0])
+    if "/" in fraction:
+        numerator, denominator = fraction.split("/")
+        return whole + float(numerator) / float(denominator)
+    return whole + float(fraction)
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def r_number(r_value):
+    """Numeric R-value from text like "R-21" or "R21 + R5 ci", else None"""
+    match = R_VALUE.search(r_value or "")
+    return float(match.group(1)) if match else None
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def _parse(assembly, r_value):
+    framing, framing_depth = None, None
+    layers = []
+    barrier, barrier_mil = None, None
+    stated = r_number(r_value)
+
+    for token in TOKENS.finditer(assembly or ""):
+        kind = token.lastgroup  # the outermost group, which closes last
+        if kind == "lumber" and framing is None:
+            framing = f"2x{token.group('lumber_size')}"
+            framing_depth = LUMBER_DEPTH_IN.get(framing)
+        elif kind == "steel" and framing is None:
+            framing = "steel_stud"
+            framing_depth = _inches(token.group("steel_depth")) if token.group("steel_depth") else None
+        elif kind == "cmu" and framing is None:
+            framing = "cmu"
+            framing_depth = float(token.group("cmu_depth")) if token.group("cmu_depth") else None
+        elif kind == "insulation":
+            material = next(name for name in INSULATION if token.group(name.lower()))
+            thickness = _inches(token.group("thickness")) if token.group("thickness") else None
+            layers.append({"material": material, "thickness_in": thickness})
+        elif kind == "barrier" and barrier is None:
+            barrier_mil = float(token.group("mil")) if token.group("mil") else None
+            barrier = "poly" if "poly" in token.group(0).lower() or barrier_mil else "vapour_barrier"
+        elif kind == "r_value" and stated is None:
+            stated = float(token.group("r_number"))
+
+    thicknesses = [layer["thickness_in"] for layer in layers if layer["thickness_in"] is not None]
+    estimated = None
+    if stated is None and layers and len(thicknesses) == len(layers):
+        estimated = round(sum(layer["thickness_in"] * INSULATION[layer["material"]][1] for layer in layers), 1)
+    return {
+        "framing": framing,
+        "framing_depth_in": framing_depth,
+        "insulation": layers[0]["material"] if layers else None,
+        "thickness_in": round(sum(thicknesses), 3) if thicknesses else None,
+        "vapour_barrier": barrier,
+        "vapour_barrier_mil": barrier_mil,
+        "r_value_number": stated if stated is not None else estimated,
+        "r_value_estimated": stated is None and estimated is not None,
+        "layers": tuple((layer["material"], layer["thickness_in"]) for layer in layers),
+    }
+
+
+def parse(assembly, r_value=None):
+    """
+    Structured form of an assembly description and its R-value text:
+
+        parse('2x4 studs, 1.5" ccSPF, 6mil poly', "R-24")
+        -> {"framing": "2x4", "framing_depth_in": 3.5, "insulation": "ccSPF",
+            "thickness_in": 1.5, "vapour_barrier": "poly", "vapour_barrier_mil": 6.0,
+            "r_value_number": 24.0, "r_value_estimated": False,
+            "layers": [{"material": "ccSPF", "thickness_in": 1.5}]}
+
+    "insulation" is the first insulation layer and "thickness_in" the total
+    over all layers. Without a stated R-value (in `r_value` or the text),
+    one is estimated when every layer has a thickness.
+    """
+    parsed = dict(_parse(assembly or "", r_value or ""))
+    parsed["layers"] = [{"material": m, "thickness_in": t} for m, t in parsed["layers"]]
+    return parsed
+
+
+def _columns(line):
+    """[(x0, column)] from a wall schedule header line, or None if it is not one"""
+    columns = []
+    for word in line:
+        column = SCHEDULE_HEADERS.get(word["text"].upper().rstrip(":"))
+        if column and column not in [c for _, c in columns]:
+            columns.append((word["x0"], column))
+    names = {c for _, c in columns}
+    return columns if {"wall_type", "assembly"} <= names else None
+
+
+def parse_wall_schedule(words):
+    """
+    Read wall schedule rows from a page's words (extraction.extract_page).
+
+    Words are regrouped into text lines. A header line naming at least the
+    wall type and assembly columns fixes the column positions; each line
+    after it that starts with a wall type mark is a row, its words falling
+    in the column whose header starts left of them. A table ends at the
+    first line that is not a row. Returns
+    {wall_type: {"description", "assembly", "r_value"}}.
+    """
+    lines = {}
+    for w in words:
+        lines.setdefault(round(w["top"]), []).append(w)
+    schedule = {}
+    columns, started = None, False
+    for _, line in sorted(lines.items()):
+        line = sorted(line, key=lambda w: w["x0"])
+        header = _columns(line)
+        if header:
+            columns, started = header, False
+            continue
+        if columns is None:
+            continue
+        if not WALL_TYPE.match(line[0]["text"].upper()):
+            if started:
+                columns = None
+            continue
+        started = True
+        cells = {}
+        for word in line:
+            column = next((c for x, c in reversed(columns) if x <= word["x0"] + 2), columns[0][1])
+            cells.setdefault(column, []).append(word["text"])
+        wall_type = line[0]["text"].upper()
+        schedule[wall_type] = {
+            "description": " ".join(cells.get("description", [])),
+            "assembly": " ".join(cells.get("assembly", [])),
+            "r_value": " ".join(cells.get("r_value", [])),
+        }
+    return schedule
@@ -0,0 +1,368 @@
+"""
+EcoSeal Takeoff System - Batch Processing
+Headless processing of a directory of plan sets into projects and takeoffs
+
+Each PDF in the directory becomes a project. The work runs in a process
+pool as two kinds of task:
+
+    plan set   page classification, wall and door/window schedules,
+               the floors to calculate
+    page       one floor plan: extraction, scale, boundary, openings,
+               takeoff rows
+
+A plan set's page tasks are queued as soon as its plan set task is done,
+so pages from different files run side by side. Tasks run in supervised
+workers (see workers.py) with a memory cap and timeout; a page that is
+killed or crashes its worker is written as RED rows rather than failing
+its plan set, and peak worker memory is reported at the end. Every finished task is
+checkpointed in a SQLite file in the directory; running the same command
+again after an interruption skips everything already done. A plan set is
+written to the database (one transaction, multi-row inserts) once all its
+pages are in, and plan sets already in the database are skipped.
+
+Floor heights are not drawn on floor plans, so every floor gets --height,
+and the exterior wall type from the wall schedule (or --wall-type) sets
+the assembly and R-value.
+
+Usage:
+    python batch.py /bids/plans [--workers 8] [--height 10] [--parapet-height 4]
+                                [--memory-mb 2048] [--timeout 120]
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import assemblies
+import extraction
+import openings
+import page_index
+import takeoff
+import workers
+from materials import level_rank
+
+logger = logging.getLogger(__name__)
+
+# Checkpoint file kept in the plan directory
+CHECKPOINT_NAME = ".ecoseal-batch.sqlite"
+
+# Floor height (feet) when none is given
+DEFAULT_HEIGHT_FT = 10.0
+
+
+# ============================================================================
+# CHECKPOINTS
+# ============================================================================
+
+class Checkpoint:
+    """Finished plan set and page tasks of a batch run, in a SQLite file"""
+
+    def __init__(self, path):
+        self.db = sqlite3.connect(path)
+        self.db.executescript("""
+            CREATE TABLE IF NOT EXISTS plan_sets (
+                file_hash TEXT PRIMARY KEY,
+                path TEXT,
+                plan TEXT,
+                project_id INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS rows (
+                file_hash TEXT,
+                page_number INTEGER,
+                position INTEGER,
+                data TEXT,
+                segments BLOB,
+                PRIMARY KEY (file_hash, page_number, position)
+            );
+        """)
+
+    def plan(self, file_hash):
+        """(plan, project_id) recorded for a plan set; None for what is not done yet"""
+        row = self.db.execute(
+            "SELECT plan, project_id FROM plan_sets WHERE file_hash = ?", (file_hash,)
+        ).fetchone()
+        if row is None:
+            return None, None
+        return (json.loads(row[0]) if row[0] else None), row[1]
+
+    def save_plan(self, file_hash, path, plan):
+        with self.db:
+            self.db.execute(
+                "INSERT OR REPLACE INTO plan_sets (file_hash, path, plan) VALUES (?, ?, ?)",
+                (file_hash, path, json.dumps(plan)),
+            )
+
+    def pages(self, file_hash):
+        """{page number: takeoff rows} for the pages of a plan set already done"""
+        done = {}
+        for page_number, data, segments in self.db.execute(
+            "SELECT page_number, data, segments FROM rows WHERE file_hash = ? ORDER BY page_number, position",
+            (file_hash,),
+        ):
+            done.setdefault(page_number, []).append(dict(json.loads(data), segments=segments))
+        return done
+
+    def save_page(self, file_hash, page_number, rows):
+        with self.db:
+            self.db.executemany(
+                "INSERT OR REPLACE INTO rows (file_hash, page_number, position, data, segments) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (file_hash, page_number, i, json.dumps({k: v for k, v in row.items() if k != "segments"}),
+                     row["segments"])
+                    for i, row in enumerate(rows)
+                ],
+            )
+
+    def done(self, file_hash, project_id):
+        with self.db:
+            self.db.execute("UPDATE plan_sets SET project_id = ? WHERE file_hash = ?", (project_id, file_hash))
+            self.db.execute("DELETE FROM rows WHERE file_hash = ?", (file_hash,))
+
+
+# ============================================================================
+# TASKS (run in worker processes)
+# ============================================================================
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _wall(walls, wall_type, keyword, prefix):
+    """(wall type, schedule row): the named type, else one described by `keyword`, else one starting with `prefix`"""
+    if wall_type:
+        return wall_type, walls.get(wall_type.upper(), {})
+    for name, wall in walls.items():
+        if keyword in wall["description"].upper():
+            return name, wall
+    for name, wall in walls.items():
+        if name.startswith(prefix):
+            return name, wall
+    return next(iter(walls.items()), ("EXT", {}))
+
+
+def _floor(level, height_ft, wall_type, wall):
+    assembly, r_value = wall.get("assembly", ""), wall.get("r_value", "")
+    return {
+        "level": level,
+        "height_ft": height_ft,
+        "wall_type": wall_type,
+        "assembly": assembly,
+        "r_value": r_value,
+        "material_type": assemblies.parse(assembly, r_value)["insulation"] or "ccSPF",
+    }
+
+
+def plan_task(path, height_ft, parapet_height_ft=None, wall_type=None):
+    """
+    Classify a plan set's pages and read its schedules. Returns the page
+    index, the door/window schedule and [page number, floors] for each
+    floor plan, bottom floor first.
+    """
+    index = page_index.build_index(path)
+    schedule_pages = [entry["page_number"] for entry in index if entry["page_type"] == "schedule"]
+    walls, schedule = {}, {}
+    for page in extraction.extract_pdf(path, schedule_pages) if schedule_pages else []:
+        walls.update(assemblies.parse_wall_schedule(page["words"]))
+        schedule.update(openings.parse_schedule(page["words"]))
+
+    exterior = _wall(walls, wall_type, "EXTERIOR", "EW")
+    plans = sorted(
+        (entry for entry in index if entry["page_type"] == "floor_plan"),
+        key=lambda entry: level_rank(entry["level"] or entry["sheet_number"]),
+    )
+    pages, seen = [], set()
+    for entry in plans:
+        level = entry["level"] or entry["sheet_number"] or f"Page {entry['page_number']}"
+        if level in seen:
+            level = f"{level} ({entry['sheet_number'] or entry['page_number']})"
+        seen.add(level)
+        pages.append([entry["page_number"], [_floor(level, height_ft, *exterior)]])
+    if pages and parapet_height_ft:
+        pages[-1][1].append(_floor("Parapet", parapet_height_ft, *_wall(walls, None, "PARAPET", "EW")))
+    return {"index": index, "schedule": schedule, "pages": pages}
+
+
+def page_task(path, page_number, floors, schedule):
+    """Takeoff rows for the floors on one floor plan page"""
+    page = extraction.extract_pdf(path, [page_number])[0]
+    return _plain(takeoff.page_rows(page, floors, schedule))
+
+
+def failed_page_rows(page_number, floors, error):
+    """RED rows for the floors on a page whose extraction failed"""
+    return _plain(takeoff.page_rows(extraction.failed_page(page_number, error), floors))
+
+
+def _plain(rows):
+    for row in rows:
+        # JSON round trip so numpy scalars store like plain values
+        row["deductions"] = json.loads(json.dumps(row["deductions"], default=float))
+    return rows
+
+
+# ============================================================================
+# RUN
+# ============================================================================
+
+def run(directory, worker_count=None, height_ft=DEFAULT_HEIGHT_FT, parapet_height_ft=None, wall_type=None,
+        checkpoint_path=None, memory_limit_mb=workers.MEMORY_LIMIT_MB, timeout_s=workers.TASK_TIMEOUT_S,
+        max_tasks=workers.MAX_TASKS_PER_WORKER):
+    """
+    Process every PDF in `directory` into a project. Returns counts of plan
+    sets written, skipped (done in an earlier run) and failed, pages
+    calculated and pages that could not be extracted (written RED), and the
+    worker pool's status with per-worker peak memory.
+    """
+    from main import PlanPageDB, SessionLocal, store_plan_set
+
+    checkpoint = Checkpoint(checkpoint_path or os.path.join(directory, CHECKPOINT_NAME))
+    paths = sorted(
+        os.path.join(directory, name) for name in os.listdir(directory) if name.lower().endswith(".pdf")
+    )
+    result = {"plan_sets": len(paths), "written": 0, "skipped": 0, "failed": 0, "pages": 0, "red_pages": 0}
+    plans, remaining = {}, {}
+
+    def store(digest, path):
+        plan = plans[digest]
+        done = checkpoint.pages(digest)
+        rows = [row for page_number, _ in plan["pages"] for row in done[page_number]]
+        name = os.path.splitext(os.path.basename(path))[0]
+        db = SessionLocal()
+        try:
+            project_id = store_plan_set(
+                db, path, digest, plan["index"], rows, name,
+                notes=f"Batch processed from {os.path.basename(path)}",
+            )
+        finally:
+            db.close()
+        checkpoint.done(digest, project_id)
+        result["written"] += 1
+        logger.info(f"Wrote {name} as project {project_id}: {len(rows)} takeoffs")
+
+    pool = workers.WorkerPool(worker_count or os.cpu_count() or 1, memory_limit_mb, timeout_s, max_tasks)
+    try:
+        pending = {}
+
+        def submit_pages(digest, path):
+            done = checkpoint.pages(digest)
+            todo = [(n, floors) for n, floors in plans[digest]["pages"] if n not in done]
+            remaining[digest] = len(todo)
+            for n, floors in todo:
+                future = pool.submit(page_task, path, n, floors, plans[digest]["schedule"],
+                                     description=f"{os.path.basename(path)} page {n}")
+                pending[future] = ("page", digest, path, n)
+            if not todo:
+                store(digest, path)
+
+        db = SessionLocal()
+        try:
+            for path in paths:
+                digest = file_hash(path)
+                plan, project_id = checkpoint.plan(digest)
+                if digest in plans or digest in remaining or any(kind == "plan" and d == digest
+                                                                 for kind, d, *_ in pending.values()):
+                    logger.info(f"Skipping {path}: same file as another in this run")
+                    result["skipped"] += 1
+                elif project_id or db.query(PlanPageDB.id).filter(PlanPageDB.file_hash == digest).first():
+                    logger.info(f"Skipping {path}: already processed")
+                    result["skipped"] += 1
+                elif plan:
+                    plans[digest] = plan
+                    submit_pages(digest, path)
+                else:
+                    future = pool.submit(plan_task, path, height_ft, parapet_height_ft, wall_type,
+                                         description=os.path.basename(path))
+                    pending[future] = ("plan", digest, path, None)
+        finally:
+            db.close()
+
+        while pending:
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                kind, digest, path, page_number = pending.pop(future)
+                if digest in remaining and remaining[digest] < 0:
+                    continue  # plan set already failed
+                try:
+                    value = future.result()
+                except workers.TaskFailed as e:
+                    if kind == "plan" or e.reason == "error":
+                        where = f"page {page_number} of {path}" if page_number else path
+                        logger.error(f"Failed on {where}: {str(e)}")
+                        result["failed"] += 1
+                        remaining[digest] = -1
+                        continue
+                    # Killed for memory or time, or crashed its worker: keep the plan set
+                    logger.warning(f"Page {page_number} of {path} could not be extracted ({e.reason}); "
+                                   f"writing it RED")
+                    floors = dict(plans[digest]["pages"])[page_number]
+                    value = failed_page_rows(page_number, floors, str(e))
+                    result["red_pages"] += 1
+                except Exception as e:
+                    where = f"page {page_number} of {path}" if page_number else path
+                    logger.error(f"Failed on {where}: {str(e)}")
+                    result["failed"] += 1
+                    remaining[digest] = -1
+                    continue
+                if kind == "plan":
+                    plans[digest] = value
+                    checkpoint.save_plan(digest, path, value)
+                    submit_pages(digest, path)
+                else:
+                    checkpoint.save_page(digest, page_number, value)
+                    result["pages"] += 1
+                    remaining[digest] -= 1
+                    if remaining[digest] == 0:
+                        store(digest, path)
+    finally:
+        result["workers"] = pool.status()
+        pool.shutdown()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process a directory of plan set PDFs into projects and takeoffs")
+    parser.add_argument("directory", help="directory of plan set PDFs, one project each")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument("--height", type=float, default=DEFAULT_HEIGHT_FT, help="floor height in feet")
+    parser.add_argument("--parapet-height", type=float, default=None,
+                        help="add a parapet row of this height above the top floor")
+    parser.add_argument("--wall-type", default=None, help="wall schedule type for every floor (default: exterior)")
+    parser.add_argument("--checkpoint", default=None,
+                        help=f"checkpoint file (default: {CHECKPOINT_NAME} in the directory)")
+    parser.add_argument("--memory-mb", type=int, default=workers.MEMORY_LIMIT_MB,
+                        help="resident memory a worker may reach before its task is killed")
+    parser.add_argument("--timeout", type=float, default=workers.TASK_TIMEOUT_S, help="seconds a task may run")
+    parser.add_argument("--max-tasks", type=int, default=workers.MAX_TASKS_PER_WORKER,
+                        help="tasks a worker runs before it is replaced")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    result = run(args.directory, args.workers, args.height, args.parapet_height, args.wall_type, args.checkpoint,
+                 args.memory_mb, args.timeout, args.max_tasks)
+    print(f"Processed {result['written']:,} of {result['plan_sets']:,} plan sets ({result['pages']:,} pages) "
+          f"in {time.perf_counter() - started:.1f}s")
+    if result["skipped"]:
+        print(f"{result['skipped']:,} already processed")
+    if result["red_pages"]:
+        print(f"{result['red_pages']:,} pages could not be extracted and were written RED")
+    if result["failed"]:
+        print(f"{result['failed']:,} failed; run again to retry")
+    pool = result["workers"]
+    peaks = ", ".join(f"{w['peak_rss_mb']:g}" for w in pool["workers"] if w["peak_rss_mb"] is not None)
+    print(f"Worker peak RSS {pool['peak_rss_mb'] or 0:g} MB (current workers: {peaks or '-'} MB); "
+          f"{pool['recycled']} recycled, {pool['killed_memory']} killed for memory, "
+          f"{pool['killed_timeout']} for time, {pool['crashed']} crashed")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
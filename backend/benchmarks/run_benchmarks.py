@@ -0,0 +1,582 @@
+"""
+EcoSeal Takeoff System - Benchmark Suite
+
+Seeds throwaway SQLite databases with synthetic projects through the app's
+bulk import (so rollups, assembly links and the search index are built as
+for real data), drives every API endpoint through an in-process ASGI
+client, times PDF extraction on generated floor plans and writes the
+results as JSON. The API run also uploads a generated plan set to time
+takeoff calculation (cold and with one floor changed), tiles and
+boundaries, and covers search, analytics, assemblies, orders, sync,
+import and the compressed and MessagePack takeoff lists.
+
+Usage (from the backend directory):
+    python benchmarks/run_benchmarks.py
+    python benchmarks/run_benchmarks.py --sizes 1000 --iterations 10
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/baseline.json
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import case
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(BACKEND_DIR, "benchmarks", "results")
+
+# Add backend directory to path for imports
+sys.path.insert(0, BACKEND_DIR)
+
+DEFAULT_SIZES = [1_000, 100_000, 1_000_000]
+DEFAULT_SEGMENTS = [100, 1_000, 10_000]
+TAKEOFFS_PER_PROJECT = 20
+
+# Rows in the spreadsheet timed through POST /api/import
+IMPORT_ROWS = 1_000
+
+IMPORT_COLUMNS = ["project", "project_date", "project_notes", "level", "wall_type", "material_type", "quantity",
+                  "unit", "assembly", "r_value", "perimeter_ft", "height_ft", "confidence", "created_at"]
+
+# Openings drawn on each generated floor plan
+OPENINGS_PER_LEVEL = {"door": 4, "window": 8}
+
+LEVELS = ["L1-2", "L2-3", "L3-4", "L4-5", "Parapet"]
+WALL_TYPES = ["EW-1", "EW-2", "IW-1"]
+MATERIALS = ["ccSPF", "Batt", "Blown-in", "Polyiso"]
+CONFIDENCES = ["GREEN", "GREEN", "GREEN", "YELLOW", "RED"]
+
+SAMPLE_TAKEOFF = {
+    "level": "L2-3",
+    "wall_type": "EW-1",
+    "material_type": "ccSPF",
+    "quantity": 5200.0,
+    "unit": "sqft",
+    "assembly": '2x4 studs, 1.5" ccSPF, 6mil poly',
+    "r_value": "R-24",
+    "perimeter_ft": 520.0,
+    "height_ft": 10.0,
+    "confidence": "GREEN",
+}
+
+
+# ============================================================================
+# SEEDING
+# ============================================================================
+
+def write_takeoff_csv(path, takeoff_count, project_count, rng):
+    """Synthetic takeoffs as an import spreadsheet, `project_count` projects round robin"""
+    now = datetime.utcnow()
+    project_dates = [now - timedelta(days=rng.randint(0, 3 * 365)) for _ in range(project_count)]
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(IMPORT_COLUMNS)
+        for i in range(takeoff_count):
+            project = i % project_count
+            perimeter = rng.uniform(200, 900)
+            height = rng.choice([4.0, 10.0, 10.5, 12.0])
+            writer.writerow([
+                f"Benchmark Project {project + 1}",
+                project_dates[project].strftime("%Y-%m-%d"),
+                f"Synthetic project {project + 1}, {rng.choice(LEVELS)} wood frame",
+                rng.choice(LEVELS),
+                rng.choice(WALL_TYPES),
+                rng.choice(MATERIALS),
+                round(perimeter * height, 1),
+                "sqft",
+                SAMPLE_TAKEOFF["assembly"],
+                rng.choice(["R-13", "R-24", "R-30"]),
+                round(perimeter, 1),
+                height,
+                rng.choice(CONFIDENCES),
+                (now - timedelta(days=rng.randint(0, 3 * 365))).strftime("%Y-%m-%dT%H:%M:%S"),
+            ])
+
+
+def seed_database(main, takeoff_count, rng, workdir):
+    """
+    Seed synthetic projects and takeoffs through the app's bulk import, so
+    rollups, assembly links, the search index and the change log are
+    written as they are for real data. Returns project ids.
+    """
+    project_count = max(1, takeoff_count // TAKEOFFS_PER_PROJECT)
+    path = os.path.join(workdir, f"seed_{takeoff_count}.csv")
+    write_takeoff_csv(path, takeoff_count, project_count, rng)
+
+    if main.engine.dialect.name == "sqlite":
+        with main.engine.begin() as conn:
+            conn.exec_driver_sql("PRAGMA journal_mode=WAL")
+    db = main.SessionLocal()
+    try:
+        with open(path, "rb") as f:
+            main.import_takeoffs(db, f, "seed.csv", max_errors=0)
+        # Imported projects are complete; spread them over the statuses orders filter on
+        db.query(main.ProjectDB).update({main.ProjectDB.status: case(
+            (main.ProjectDB.id % 3 == 0, "draft"), (main.ProjectDB.id % 3 == 1, "in_progress"), else_="complete"
+        )}, synchronize_session=False)
+        db.commit()
+        return [project_id for (project_id,) in db.query(main.ProjectDB.id).order_by(main.ProjectDB.id)]
+    finally:
+        db.close()
+        os.remove(path)
+
+
+# ============================================================================
+# API BENCHMARKS
+# ============================================================================
+
+def summarize(samples):
+    """Reduce a list of latencies (seconds) to millisecond statistics"""
+    ordered = sorted(samples)
+
+    def pct(p):
+        return ordered[min(len(ordered) - 1, int(round(p * (len(ordered) - 1))))] * 1000
+
+    return {
+        "count": len(ordered),
+        "mean_ms": statistics.fmean(ordered) * 1000,
+        "p50_ms": pct(0.50),
+        "p95_ms": pct(0.95),
+        "p99_ms": pct(0.99),
+        "min_ms": ordered[0] * 1000,
+        "max_ms": ordered[-1] * 1000,
+    }
+
+
+def import_csv(rows, rng):
+    """A small import spreadsheet, as bytes"""
+    f = io.StringIO()
+    writer = csv.writer(f)
+    writer.writerow(IMPORT_COLUMNS)
+    for i in range(rows):
+        perimeter = rng.uniform(200, 900)
+        writer.writerow([f"Import Benchmark {i % 10}", "2026-01-15", "", rng.choice(LEVELS), rng.choice(WALL_TYPES),
+                         rng.choice(MATERIALS), round(perimeter * 10, 1), "sqft", SAMPLE_TAKEOFF["assembly"],
+                         "R-24", round(perimeter, 1), 10.0, "GREEN", ""])
+    return f.getvalue().encode()
+
+
+async def run_api_benchmarks(main, project_ids, iterations, rng, workdir):
+    """Time every endpoint in main.py against the seeded database"""
+    import httpx
+
+    import plan_generator
+
+    transport = httpx.ASGITransport(app=main.app)
+    results = {}
+
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+
+        async def timed(name, method, url, expected=200, **kwargs):
+            start = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            elapsed = time.perf_counter() - start
+            entry = results.setdefault(name, {"samples": [], "errors": 0})
+            entry["samples"].append(elapsed)
+            if response.status_code != expected:
+                entry["errors"] += 1
+            return response
+
+        project_body = {"name": "Benchmark Write", "notes": "", "date": "2026-02-24"}
+        spreadsheet = import_csv(IMPORT_ROWS, rng)
+
+        # A plan set to calculate, tile and trace
+        plan_path = os.path.join(workdir, "api_plan.pdf")
+        plan_generator.generate_plan_set(
+            plan_path, levels=3, shape="l_shape",
+            doors=OPENINGS_PER_LEVEL["door"], windows=OPENINGS_PER_LEVEL["window"],
+        )
+        plan_project = (await client.post("/api/projects", json=project_body)).json()["id"]
+        with open(plan_path, "rb") as f:
+            index = await timed("POST /api/projects/{id}/plans", "POST", f"/api/projects/{plan_project}/plans",
+                                files={"file": ("plans.pdf", f.read(), "application/pdf")})
+        file_hash = index.json()["file_hash"]
+        plan_pages = [page for page in index.json()["pages"] if page["page_type"] == "floor_plan"]
+        floors = [
+            {"level": page["level"] or f"Page {page['page_number']}", "page_number": page["page_number"],
+             "height_ft": 10.0, "wall_type": "EW-1", "assembly": SAMPLE_TAKEOFF["assembly"], "r_value": "R-24"}
+            for page in plan_pages
+        ]
+        calculate = f"/api/projects/{plan_project}/takeoffs/calculate"
+        await timed("POST /api/projects/{id}/takeoffs/calculate (cold)", "POST", calculate,
+                    json={"file_hash": file_hash, "floors": floors})
+        page_url = f"/api/projects/{plan_project}/plans/{file_hash}/pages/{plan_pages[0]['page_number']}"
+        top = (await client.get(f"{page_url}/tiles")).json()["levels"][-1]
+        sync_seq, more = 0, True
+        while more:
+            page = (await client.get("/api/sync", params={"since": sync_seq})).json()
+            sync_seq, more = page["seq"], page["more"]
+
+        for i in range(iterations):
+            pid = rng.choice(project_ids)
+
+            await timed("GET /", "GET", "/")
+            await timed("GET /health", "GET", "/health")
+            await timed("GET /api/stats", "GET", "/api/stats")
+            await timed("GET /api/projects", "GET", "/api/projects")
+            await timed("GET /api/projects/{id}", "GET", f"/api/projects/{pid}")
+            await timed("PUT /api/projects/{id}", "PUT", f"/api/projects/{pid}",
+                        json={"name": f"Benchmark Project {pid}", "notes": "updated"})
+            await timed("GET /api/projects/{id}/takeoffs", "GET", f"/api/projects/{pid}/takeoffs")
+            for label, headers in (
+                ("identity", {"Accept-Encoding": "identity"}),
+                ("gzip", {"Accept-Encoding": "gzip"}),
+                ("br", {"Accept-Encoding": "br"}),
+                ("msgpack", {"Accept": "application/msgpack", "Accept-Encoding": "identity"}),
+            ):
+                await timed(f"GET /api/projects/{{id}}/takeoffs [{label}]", "GET",
+                            f"/api/projects/{pid}/takeoffs", headers=headers)
+
+            created = await timed("POST /api/projects", "POST", "/api/projects", json=project_body)
+            new_id = created.json()["id"]
+            takeoff = await timed("POST /api/projects/{id}/takeoffs", "POST",
+                                  f"/api/projects/{new_id}/takeoffs", json=SAMPLE_TAKEOFF)
+            await timed("DELETE /api/projects/{id}/takeoffs/{takeoff_id}", "DELETE",
+                        f"/api/projects/{new_id}/takeoffs/{takeoff.json()['id']}")
+            await timed("DELETE /api/projects/{id}", "DELETE", f"/api/projects/{new_id}")
+
+            await timed("POST /api/settings", "POST", "/api/settings",
+                        json={"key": "default_material", "value": "ccSPF"})
+            await timed("GET /api/settings/{key}", "GET", "/api/settings/default_material")
+
+            await timed("GET /api/projects/search", "GET", "/api/projects/search",
+                        params={"q": rng.choice(["wood frame", "ccSPF", "Parapet", f"Project {pid}"])})
+            await timed("GET /api/analytics", "GET", "/api/analytics", params={"period": "month"})
+            await timed("GET /api/assemblies", "GET", "/api/assemblies")
+            await timed("GET /api/projects/{id}/orders", "GET", f"/api/projects/{pid}/orders")
+            await timed("GET /api/orders", "GET", "/api/orders")
+            await timed("GET /api/sync (full page)", "GET", "/api/sync", params={"since": 0})
+            # Changes since the previous iteration's delta: this iteration's writes
+            delta = await timed("GET /api/sync (delta)", "GET", "/api/sync", params={"since": sync_seq})
+            sync_seq = delta.json()["seq"]
+            await timed(f"POST /api/import ({IMPORT_ROWS} rows)", "POST", "/api/import",
+                        files={"file": ("takeoffs.csv", spreadsheet, "text/csv")})
+
+            # One floor's height changes; only its row is recomputed
+            floors[0]["height_ft"] = 10.0 + (i % 2 + 1) / 2
+            await timed("POST /api/projects/{id}/takeoffs/calculate (one floor changed)", "POST", calculate,
+                        json={"file_hash": file_hash, "floors": floors})
+            await timed("GET .../pages/{n}/tiles", "GET", f"{page_url}/tiles")
+            tile = i % (top["columns"] * top["rows"])
+            tile_url = f"{page_url}/tiles/{top['zoom']}/{tile % top['columns']}/{tile // top['columns']}.png"
+            await timed("GET .../tiles/{zoom}/{x}/{y}.png (render)", "GET", tile_url)
+            await timed("GET .../tiles/{zoom}/{x}/{y}.png (cached)", "GET", tile_url)
+            await timed("GET .../pages/{n}/boundary.geojson", "GET", f"{page_url}/boundary.geojson")
+
+    main.extraction_pool.shutdown()
+    return {
+        name: dict(summarize(entry["samples"]), errors=entry["errors"])
+        for name, entry in results.items()
+    }
+
+
+def run_tier(size, db_path, iterations, seed):
+    """Worker entry point: seed one database size and benchmark the API"""
+    workdir = os.path.dirname(db_path)
+    os.environ["DATABASE_URL"] = f"sqlite:///{db_path}"
+    os.environ["UPLOAD_DIR"] = os.path.join(workdir, f"uploads_{size}")
+    # Measure the endpoints themselves, not admission control shedding the benchmark client
+    for route_class in ("CRUD", "EXPORT", "EXTRACTION", "TILES"):
+        os.environ[f"ADMISSION_{route_class}_CONCURRENCY"] = "0"
+    import logging
+    logging.disable(logging.INFO)
+
+    import main
+
+    rng = random.Random(seed)
+    start = time.perf_counter()
+    project_ids = seed_database(main, size, rng, workdir)
+    seed_seconds = time.perf_counter() - start
+
+    endpoints = asyncio.run(run_api_benchmarks(main, project_ids, iterations, rng, workdir))
+    return {
+        "takeoffs": size,
+        "projects": len(project_ids),
+        "seed_seconds": seed_seconds,
+        "import_rows": IMPORT_ROWS,
+        "endpoints": endpoints,
+    }
+
+
+def run_tier_subprocess(size, iterations, seed, workdir):
+    """Run one tier in a fresh interpreter so each size gets its own engine"""
+    db_path = os.path.join(workdir, f"bench_{size}.db")
+    out_path = os.path.join(workdir, f"bench_{size}.json")
+    subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--worker",
+         "--sizes", str(size), "--iterations", str(iterations),
+         "--seed", str(seed), "--db", db_path, "--output", out_path],
+        check=True,
+        cwd=BACKEND_DIR,
+    )
+    with open(out_path) as f:
+        return json.load(f)
+
+
+# ============================================================================
+# EXTRACTION BENCHMARKS
+# ============================================================================
+
+def score_boundaries(extracted, truth):
+    """Time boundary tracing and compare perimeters against the ground truth"""
+    import boundary
+    import extraction
+
+    engine = boundary.BoundaryEngine()
+    methods = {}
+    errors = []
+    start = time.perf_counter()
+    for page, page_truth in zip(extracted, truth["pages"]):
+        if page_truth["type"] != "floor_plan":
+            continue
+        scale = extraction.detect_scale(page["words"])
+        result = engine.extract(
+            page["page"], page["segments"],
+            scale["points_per_foot"] if scale else None,
+            (page["width"], page["height"]),
+        )
+        methods[result["method"]] = methods.get(result["method"], 0) + 1
+        expected = page_truth["outline"]["perimeter_ft"]
+        errors.append(abs(result["perimeter"] - expected) / expected if result["units"] == "ft" else 1.0)
+    return {
+        "seconds": time.perf_counter() - start,
+        "methods": methods,
+        "mean_perimeter_error": statistics.fmean(errors) if errors else None,
+        "max_perimeter_error": max(errors) if errors else None,
+    }
+
+
+def score_openings(extracted, truth):
+    """Detect openings on every floor plan in one batch and score them"""
+    import boundary
+    import extraction
+    import openings
+
+    engine = boundary.BoundaryEngine()
+    schedule = {}
+    levels, expected = [], []
+    for page, page_truth in zip(extracted, truth["pages"]):
+        if page_truth["type"] == "schedule":
+            schedule.update(openings.parse_schedule(page["words"]))
+        if page_truth["type"] != "floor_plan":
+            continue
+        scale = extraction.detect_scale(page["words"])
+        ppf = scale["points_per_foot"] if scale else None
+        result = engine.extract(page["page"], page["segments"], ppf, (page["width"], page["height"]))
+        levels.append({"page": page, "polygon": result["polygon"], "points_per_foot": ppf})
+        expected.append(page_truth)
+
+    start = time.perf_counter()
+    found = openings.detect_openings(levels, schedule)
+    elapsed = time.perf_counter() - start
+
+    errors = []
+    for i, page_truth in enumerate(expected):
+        area = sum(o["width_ft"] * o["height_ft"] for o in found if o["level"] == i)
+        if page_truth["opening_sqft"]:
+            errors.append(abs(area - page_truth["opening_sqft"]) / page_truth["opening_sqft"])
+    return {
+        "seconds": elapsed,
+        "found": len(found),
+        "expected": sum(len(p["openings"]) for p in expected),
+        "scheduled": sum(o["source"] == "schedule" for o in found),
+        "mean_deduction_error": statistics.fmean(errors) if errors else None,
+    }
+
+
+def run_extraction_benchmarks(segment_counts, workdir, levels=3, scanned_dpi=None, vary_levels=False):
+    """
+    Generate plan sets with known ground truth, time segment/text
+    extraction and score what was recovered against the truth file.
+
+    With `scanned_dpi`, an image-only copy of each plan set is also run
+    through the tiled raster path.
+    """
+    import extraction
+    import plan_generator
+
+    results = []
+    for count in segment_counts:
+        path = os.path.join(workdir, f"plan_{count}.pdf")
+        truth = plan_generator.generate_plan_set(
+            path, levels=levels, shape="l_shape", vary_levels=vary_levels,
+            outline_segments=count, interior_segments=count // 10,
+            doors=OPENINGS_PER_LEVEL["door"], windows=OPENINGS_PER_LEVEL["window"],
+        )
+
+        start = time.perf_counter()
+        extracted = extraction.extract_pdf(path)
+        elapsed = time.perf_counter() - start
+
+        found = sum(len(page["segments"]) for page in extracted)
+        expected = sum(page["total_segments"] for page in truth["pages"])
+        notation = truth["scale"]["notation"].split()[0]
+        plan_pages = [p for p in truth["pages"] if p["type"] == "floor_plan"]
+        scale_found = sum(
+            1 for page in extracted
+            if page["page"] <= len(plan_pages)
+            and any(w["text"] == notation for w in page["words"])
+        )
+        results.append({
+            "segments_per_page": count,
+            "pages": len(truth["pages"]),
+            "file_bytes": os.path.getsize(path),
+            "seconds": elapsed,
+            "segments_per_second": found / elapsed if elapsed else None,
+            "segments_found": found,
+            "segments_expected": expected,
+            "segment_recall": found / expected if expected else None,
+            "scale_notation_recall": scale_found / len(plan_pages) if plan_pages else None,
+            "boundary": score_boundaries(extracted, truth),
+            "openings": score_openings(extracted, truth),
+        })
+
+        if scanned_dpi:
+            import resource
+
+            scanned_path = os.path.join(workdir, f"plan_{count}_scanned.pdf")
+            plan_generator.write_scanned_copy(path, scanned_path, dpi=scanned_dpi)
+            start = time.perf_counter()
+            scanned = extraction.extract_pdf(scanned_path)
+            results[-1]["scanned"] = {
+                "dpi": scanned_dpi,
+                "seconds": time.perf_counter() - start,
+                "segments_found": sum(len(page["segments"]) for page in scanned),
+                "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+            }
+    return results
+
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            cwd=BACKEND_DIR, check=True,
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(current, baseline, threshold):
+    """Print p50 deltas against a baseline; return the regressions found"""
+    regressions = []
+    for size, tier in current["api"].items():
+        base_tier = baseline.get("api", {}).get(size)
+        if not base_tier:
+            continue
+        for name, stats in tier["endpoints"].items():
+            base = base_tier["endpoints"].get(name)
+            if not base or not base["p50_ms"]:
+                continue
+            ratio = stats["p50_ms"] / base["p50_ms"]
+            flag = "REGRESSION" if ratio > threshold else ""
+            print(f"{size:>9} {name:<52} {base['p50_ms']:9.2f} -> {stats['p50_ms']:9.2f} ms  x{ratio:5.2f} {flag}")
+            if flag:
+                regressions.append({"size": size, "endpoint": name, "ratio": ratio})
+
+    base_extraction = {e["segments_per_page"]: e for e in baseline.get("extraction", [])}
+    for entry in current["extraction"]:
+        base = base_extraction.get(entry["segments_per_page"])
+        if not base or not base["seconds"]:
+            continue
+        ratio = entry["seconds"] / base["seconds"]
+        flag = "REGRESSION" if ratio > threshold else ""
+        print(f"extraction {entry['segments_per_page']:>7} segments/page  "
+              f"{base['seconds']:8.3f} -> {entry['seconds']:8.3f} s  x{ratio:5.2f} {flag}")
+        if flag:
+            regressions.append({"extraction": entry["segments_per_page"], "ratio": ratio})
+    return regressions
+
+
+def parse_sizes(value):
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="EcoSeal Takeoff benchmark suite")
+    parser.add_argument("--sizes", type=parse_sizes, default=DEFAULT_SIZES,
+                        help="Comma-separated takeoff counts to seed (default: 1000,100000,1000000)")
+    parser.add_argument("--segments", type=parse_sizes, default=DEFAULT_SEGMENTS,
+                        help="Comma-separated segments per page for extraction runs")
+    parser.add_argument("--levels", type=int, default=3, help="Floor plan pages per generated plan set")
+    parser.add_argument("--vary-levels", action="store_true",
+                        help="Give each level a different footprint (disables boundary reuse)")
+    parser.add_argument("--scanned-dpi", type=int,
+                        help="Also time the raster path on scanned copies at this DPI")
+    parser.add_argument("--iterations", type=int, default=20, help="Requests per endpoint per size")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Results JSON path (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument("--compare", help="Baseline results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25,
+                        help="Slowdown ratio reported as a regression (default: 1.25)")
+    parser.add_argument("--skip-api", action="store_true")
+    parser.add_argument("--skip-extraction", action="store_true")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--db", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        result = run_tier(args.sizes[0], args.db, args.iterations, args.seed)
+        with open(args.output, "w") as f:
+            json.dump(result, f)
+        return 0
+
+    report = {
+        "meta": {
+            "timestamp": datetime.utcnow().isoformat(),
+            "git_revision": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "seed": args.seed,
+        },
+        "api": {},
+        "extraction": [],
+    }
+
+    with tempfile.TemporaryDirectory(prefix="takeoff-bench-") as workdir:
+        if not args.skip_api:
+            for size in args.sizes:
+                print(f"Benchmarking API with {size:,} takeoffs...")
+                report["api"][str(size)] = run_tier_subprocess(size, args.iterations, args.seed, workdir)
+        if not args.skip_extraction:
+            print(f"Benchmarking extraction at {args.segments} segments/page...")
+            report["extraction"] = run_extraction_benchmarks(
+                args.segments, workdir, levels=args.levels,
+                scanned_dpi=args.scanned_dpi, vary_levels=args.vary_levels)
+
+    output = args.output
+    if not output:
+        os.makedirs(RESULTS_DIR, exist_ok=True)
+        output = os.path.join(RESULTS_DIR, f"bench-{datetime.utcnow():%Y%m%dT%H%M%S}.json")
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regression(s) above x{args.threshold}")
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
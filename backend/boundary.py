@@ -0,0 +1,300 @@
+"""
+EcoSeal Takeoff System - Boundary Extraction
+Traces the building outline from extracted plan segments and reuses
+boundaries across repeat floor plates
+
+Typical floors of a multi-storey job share one footprint. Every page gets a
+cheap geometric fingerprint: segments are quantised, hashed and bucketed
+into a coarse grid of cells. A page whose fingerprint matches an earlier
+page reuses that boundary outright; a page that differs in only a few cells
+is re-traced from just its segments along the earlier boundary and in the
+changed cells, instead of from every segment on the sheet.
+"""
+
+import logging
+import math
+import time
+
+import numpy as np
+
+import geometry
+
+logger = logging.getLogger(__name__)
+
+# Endpoints closer than this (points) are treated as the same node
+SNAP_PT = 0.5
+
+# Fingerprint grid cell size (points); 1" at plan scale
+CELL_PT = 72.0
+
+# Above this share of changed cells a full extraction is cheaper than diffing
+MAX_CHANGED_FRACTION = 0.25
+
+# Faces spanning more of the sheet than this are sheet borders, not buildings
+MAX_SHEET_SPAN = 0.9
+
+# An incremental trace whose area moves by more than this factor from the
+# reference boundary is distrusted and redone in full
+MAX_AREA_RATIO = 2.0
+
+# Cell keys pack (column, row) as column * CELL_STRIDE + row
+CELL_STRIDE = 1 << 32
+
+
+# ============================================================================
+# OUTLINE TRACING
+# ============================================================================
+
+def _clean_polygon(points, tolerance=1e-6):
+    """Drop out-and-back spikes, repeated vertices and collinear vertices"""
+    stack = []
+    for p in points:
+        if len(stack) >= 2 and stack[-2] == p:
+            stack.pop()
+        elif not stack or stack[-1] != p:
+            stack.append(p)
+    while len(stack) >= 3 and stack[0] == stack[-2]:
+        stack = stack[1:-1]
+
+    changed = True
+    while changed and len(stack) >= 3:
+        changed = False
+        kept = []
+        n = len(stack)
+        for i in range(n):
+            (ax, ay), (bx, by), (cx, cy) = stack[i - 1], stack[i], stack[(i + 1) % n]
+            cross = (bx - ax) * (cy - by) - (by - ay) * (cx - bx)
+            if abs(cross) <= tolerance * max(1.0, math.hypot(bx - ax, by - ay) * math.hypot(cx - bx, cy - by)):
+                changed = True
+                continue
+            kept.append(stack[i])
+        stack = kept
+    return stack
+
+
+def build_graph(segments, snap_pt=SNAP_PT):
+    """
+    Snap and node segments into a planar graph.
+
+    Endpoints within `snap_pt` of each other merge, dangling endpoints close
+    onto nearby walls and crossing segments are split at their intersection.
+    Returns a geometry.SegmentSet whose segments meet only at endpoints.
+    """
+    return geometry.SegmentSet(segments).snap(snap_pt).noded(snap_pt / 100)
+
+
+def trace_outline(segments, page_size=None, snap_pt=SNAP_PT):
+    """
+    Return the building outline as a list of (x, y) vertices in points.
+
+    The outline is the face of the segment graph with the largest enclosed
+    area, ignoring faces that span the whole sheet (borders). Returns an
+    empty list when nothing closes.
+    """
+    if len(segments) == 0:
+        return []
+    faces = build_graph(segments, snap_pt).polygonize()
+    area = np.abs(faces.area)
+    if page_size:
+        span = faces.bounds[:, 2:] - faces.bounds[:, :2]
+        area[(span[:, 0] > MAX_SHEET_SPAN * page_size[0]) | (span[:, 1] > MAX_SHEET_SPAN * page_size[1])] = 0.0
+    if not len(faces) or area.max() <= 0:
+        return []
+    return _clean_polygon(faces.polygon(int(np.argmax(area))))
+
+
+def outline_metrics(polygon, points_per_foot=None):
+    """Perimeter and area of an outline, in feet when a scale is known"""
+    if len(polygon) < 3:
+        return {"perimeter": 0.0, "area": 0.0, "units": "ft" if points_per_foot else "pt"}
+    perimeter = geometry.polygon_perimeter(polygon)
+    area = geometry.polygon_area(polygon)
+    if points_per_foot:
+        return {
+            "perimeter": perimeter / points_per_foot,
+            "area": area / points_per_foot ** 2,
+            "units": "ft",
+        }
+    return {"perimeter": perimeter, "area": area, "units": "pt"}
+
+
+# ============================================================================
+# FINGERPRINTS
+# ============================================================================
+
+def _mix64(values):
+    """splitmix64 finaliser, vectorized over a uint64 array"""
+    z = values.astype(np.uint64)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def _segment_cells(seg, cell_pt):
+    """
+    Map segments to the grid cells they pass through.
+
+    Returns (cell_keys, segment_indexes) sorted by cell, one pair per
+    segment per cell. Segments are sampled every half cell so long
+    segments register in every cell they cross.
+    """
+    lengths = np.hypot(seg[:, 2] - seg[:, 0], seg[:, 3] - seg[:, 1])
+    samples = np.maximum(2, np.ceil(lengths / (cell_pt / 2)).astype(np.int64) + 1)
+    index = np.repeat(np.arange(len(seg)), samples)
+    offsets = np.arange(len(index)) - np.repeat(np.cumsum(samples) - samples, samples)
+    t = offsets / np.repeat(samples - 1, samples)
+    xs = seg[index, 0] + (seg[index, 2] - seg[index, 0]) * t
+    ys = seg[index, 1] + (seg[index, 3] - seg[index, 1]) * t
+    keys = np.floor(xs / cell_pt).astype(np.int64) * CELL_STRIDE + np.floor(ys / cell_pt).astype(np.int64)
+    order = np.lexsort((index, keys))
+    keys, index = keys[order], index[order]
+    keep = np.r_[True, (keys[1:] != keys[:-1]) | (index[1:] != index[:-1])]
+    return keys[keep], index[keep]
+
+
+def page_fingerprint(segments, snap_pt=SNAP_PT, cell_pt=CELL_PT):
+    """
+    Compute a direction- and order-independent fingerprint of a page.
+
+    Returns {"hash": int, "cells": {cell_key: hash}, "count": n,
+    "segment_cells": (cell_keys, segment_indexes)}. Per-cell hashes are the
+    XOR of the hashes of every segment passing through that cell, so two
+    pages can be diffed cell by cell.
+    """
+    if len(segments) == 0:
+        empty = np.empty(0, dtype=np.int64)
+        return {"hash": 0, "cells": {}, "count": 0, "segment_cells": (empty, empty)}
+
+    seg = np.asarray(segments, dtype=float)[:, :4]
+    q = np.round(seg / snap_pt).astype(np.int64)
+    # Normalise direction so (a -> b) and (b -> a) hash the same
+    flip = (q[:, 0] > q[:, 2]) | ((q[:, 0] == q[:, 2]) & (q[:, 1] > q[:, 3]))
+    q[flip] = q[flip][:, [2, 3, 0, 1]]
+
+    h = _mix64(q[:, 0].astype(np.uint64))
+    for col in range(1, 4):
+        h = _mix64(h ^ q[:, col].astype(np.uint64))
+
+    cell_keys, index = _segment_cells(seg, cell_pt)
+    starts = np.flatnonzero(np.r_[True, cell_keys[1:] != cell_keys[:-1]])
+    cell_hashes = np.bitwise_xor.reduceat(h[index], starts)
+
+    return {
+        "hash": int(np.bitwise_xor.reduce(h)) ^ len(seg),
+        "cells": dict(zip(cell_keys[starts].tolist(), cell_hashes.tolist())),
+        "count": len(seg),
+        "segment_cells": (cell_keys, index),
+    }
+
+
+def changed_cells(fingerprint, reference):
+    """Cells whose contents differ between two fingerprints"""
+    a, b = fingerprint["cells"], reference["cells"]
+    return {key for key in a.keys() | b.keys() if a.get(key) != b.get(key)}
+
+
+def _expand(cells):
+    """Grow a set of cell keys by one cell in every direction"""
+    return {
+        key + dx * CELL_STRIDE + dy
+        for key in cells
+        for dx in (-1, 0, 1)
+        for dy in (-1, 0, 1)
+    }
+
+
+def _polygon_cells(polygon, cell_pt):
+    """Cells an outline passes through"""
+    edges = np.array([polygon[i] + polygon[(i + 1) % len(polygon)] for i in range(len(polygon))])
+    keys, _ = _segment_cells(edges, cell_pt)
+    return set(keys.tolist())
+
+
+def _segments_in_cells(segments, fingerprint, cells):
+    keys, index = fingerprint["segment_cells"]
+    selected = np.unique(index[np.isin(keys, np.fromiter(cells, dtype=np.int64))])
+    return [segments[i] for i in selected.tolist()]
+
+
+# ============================================================================
+# ENGINE
+# ============================================================================
+
+class BoundaryEngine:
+    """
+    Extracts building boundaries page by page, reusing earlier results for
+    repeat floor plates and re-tracing only changed regions otherwise.
+    """
+
+    def __init__(self, snap_pt=SNAP_PT, cell_pt=CELL_PT, max_changed_fraction=MAX_CHANGED_FRACTION):
+        self.snap_pt = snap_pt
+        self.cell_pt = cell_pt
+        self.max_changed_fraction = max_changed_fraction
+        self.by_hash = {}
+
+    def _closest(self, fingerprint):
+        """Earlier page with the fewest changed cells"""
+        best, best_changed = None, None
+        # Repeat floors share a fingerprint; diff each distinct one once
+        for entry in self.by_hash.values():
+            changed = changed_cells(fingerprint, entry["fingerprint"])
+            if best_changed is None or len(changed) < len(best_changed):
+                best, best_changed = entry, changed
+        return best, best_changed
+
+    def extract(self, page, segments, points_per_foot=None, page_size=None):
+        """
+        Extract the boundary for one page.
+
+        Returns a dict with the outline polygon (points), perimeter/area
+        (feet when `points_per_foot` is given) and how it was obtained:
+        "reused", "incremental" or "full".
+        """
+        start = time.perf_counter()
+        fingerprint = page_fingerprint(segments, self.snap_pt, self.cell_pt)
+        method, source, changed = "full", None, None
+
+        previous = self.by_hash.get(fingerprint["hash"])
+        if previous is not None:
+            polygon, method, source = previous["polygon"], "reused", previous["page"]
+        else:
+            polygon = None
+            reference, changed = self._closest(fingerprint)
+            total_cells = max(1, len(fingerprint["cells"]))
+            if reference is not None and reference["polygon"] and \
+                    len(changed) / total_cells <= self.max_changed_fraction:
+                # Only the corridor around the earlier boundary and the
+                # changed cells can hold this page's boundary
+                region = _expand(_polygon_cells(reference["polygon"], self.cell_pt)) | _expand(changed)
+                local = _segments_in_cells(segments, fingerprint, region)
+                polygon = trace_outline(local, page_size, self.snap_pt)
+                method, source = "incremental", reference["page"]
+                reference_area = geometry.polygon_area(reference["polygon"])
+                area = geometry.polygon_area(polygon)
+                if not area or not 1 / MAX_AREA_RATIO <= area / reference_area <= MAX_AREA_RATIO:
+                    polygon = None
+            if polygon is None:
+                polygon = trace_outline(segments, page_size, self.snap_pt)
+                method, source = "full", None
+
+        entry = {"page": page, "fingerprint": fingerprint, "polygon": polygon}
+        self.by_hash.setdefault(fingerprint["hash"], entry)
+
+        metrics = outline_metrics(polygon, points_per_foot)
+        result = {
+            "page": page,
+            "method": method,
+            "reused_from": source,
+            "changed_cells": len(changed) if method == "incremental" else 0,
+            "polygon": polygon,
+            "perimeter": metrics["perimeter"],
+            "area": metrics["area"],
+            "units": metrics["units"],
+            "seconds": time.perf_counter() - start,
+        }
+        logger.info(
+            f"Boundary page {page}: {method}"
+            + (f" from page {source}" if source else "")
+            + f", perimeter {metrics['perimeter']:.1f} {metrics['units']}"
+        )
+        return result
@@ -0,0 +1,198 @@
+"""
+EcoSeal Takeoff System - Response Encoding
+Compressed and MessagePack responses, chosen by content negotiation
+
+CompressionMiddleware compresses any response larger than MINIMUM_SIZE
+with brotli or gzip, whichever the client's Accept-Encoding prefers
+(brotli needs the `brotli` package). Each chunk the app sends is
+compressed and flushed as it arrives, so a streamed response goes out
+compressed as it is produced instead of being buffered first.
+
+Takeoff lists are also offered as MessagePack to clients that send
+`Accept: application/msgpack` (needs the `msgpack` package); JSON stays
+the default and is streamed in batches of rows.
+"""
+
+import json
+import os
+import zlib
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.responses import Response, StreamingResponse
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+# Responses smaller than this (bytes) are sent uncompressed
+MINIMUM_SIZE = int(os.getenv("COMPRESS_MIN_BYTES", "1024"))
+
+# Fast settings: responses are compressed on every request, not once
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 4
+
+# Media types worth compressing (prefix match)
+COMPRESSIBLE = ("application/json", "application/geo+json", "application/msgpack", "text/", "image/svg+xml")
+
+MSGPACK = "application/msgpack"
+
+# Rows serialized per chunk of a streamed JSON array
+STREAM_BATCH = 500
+
+
+def _qualities(header):
+    """{token: q} from an Accept or Accept-Encoding header"""
+    qualities = {}
+    for part in (header or "").split(","):
+        token, _, params = part.strip().partition(";")
+        if not token:
+            continue
+        q = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        qualities[token.strip().lower()] = q
+    return qualities
+
+
+def negotiate_encoding(accept_encoding):
+    """"br", "gzip" or None for an Accept-Encoding header"""
+    q = _qualities(accept_encoding)
+    wildcard = q.get("*", 0.0)
+    offers = [("br", q.get("br", wildcard))] if brotli is not None else []
+    offers.append(("gzip", q.get("gzip", wildcard)))
+    coding, best = max(offers, key=lambda offer: offer[1])
+    return coding if best > 0 else None
+
+
+def wants_msgpack(accept):
+    """Whether an Accept header prefers MessagePack to JSON (and we can send it)"""
+    if msgpack is None:
+        return False
+    q = _qualities(accept)
+    packed = max(q.get(MSGPACK, 0.0), q.get("application/x-msgpack", 0.0))
+    plain = max(q.get("application/json", 0.0), q.get("application/*", 0.0), q.get("*/*", 0.0))
+    return packed > 0 and packed >= plain
+
+
+class _Compressor:
+    def __init__(self, coding):
+        if coding == "br":
+            self._brotli = brotli.Compressor(quality=BROTLI_QUALITY)
+        else:
+            self._brotli = None
+            self._zlib = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip container
+
+    def chunk(self, data, last):
+        if self._brotli is not None:
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if last else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing response bodies with brotli or gzip.
+
+    The body is held only until MINIMUM_SIZE bytes have arrived (or the
+    response ends, in which case it goes out as is); after that every
+    chunk is compressed and sent straight on.
+    """
+
+    def __init__(self, app, minimum_size=MINIMUM_SIZE):
+        self.app = app
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        coding = negotiate_encoding(Headers(scope=scope).get("accept-encoding"))
+        if coding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start = None
+        pending = []
+        size = 0
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start, size, compressor, passthrough
+            if message["type"] == "http.response.start":
+                start = message
+                headers = Headers(raw=message["headers"])
+                content_type = headers.get("content-type", "")
+                passthrough = "content-encoding" in headers or not content_type.startswith(COMPRESSIBLE)
+                if passthrough:
+                    await send(start)
+                return
+            if message["type"] != "http.response.body" or passthrough:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more = message.get("more_body", False)
+            if compressor is None:
+                pending.append(body)
+                size += len(body)
+                if size < self.minimum_size:
+                    if more:
+                        return
+                    # Small response: send it as it is
+                    await send(start)
+                    await send({"type": "http.response.body", "body": b"".join(pending)})
+                    return
+                headers = MutableHeaders(raw=start["headers"])
+                headers["Content-Encoding"] = coding
+                headers.add_vary_header("Accept-Encoding")
+                if "content-length" in headers:
+                    del headers["content-length"]
+                compressor = _Compressor(coding)
+                await send(start)
+                body = b"".join(pending)
+            await send({"type": "http.response.body", "body": compressor.chunk(body, not more), "more_body": more})
+
+        await self.app(scope, receive, send_compressed)
+
+
+def _json_chunks(rows, batch):
+    """A JSON array of `rows`, serialized `batch` rows at a time"""
+    yield b"["
+    first = True
+    buffer = []
+    for row in rows:
+        buffer.append(row)
+        if len(buffer) == batch:
+            text = json.dumps(buffer, ensure_ascii=False, separators=(",", ":"))[1:-1]
+            yield (text if first else "," + text).encode("utf-8")
+            first = False
+            buffer = []
+    if buffer:
+        text = json.dumps(buffer, ensure_ascii=False, separators=(",", ":"))[1:-1]
+        yield (text if first else "," + text).encode("utf-8")
+    yield b"]"
+
+
+def list_response(accept, rows, batch=STREAM_BATCH):
+    """
+    A response for a list of JSON-ready dicts: MessagePack if the Accept
+    header asks for it, otherwise a JSON array streamed `batch` rows at a
+    time.
+    """
+    headers = {"Vary": "Accept"}
+    if wants_msgpack(accept):
+        return Response(msgpack.packb(list(rows), use_bin_type=True), media_type=MSGPACK, headers=headers)
+    return StreamingResponse(_json_chunks(rows, batch), media_type="application/json", headers=headers)
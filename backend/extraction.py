@@ -0,0 +1,167 @@
+"""
+EcoSeal Takeoff System - PDF Extraction
+Vector line and text extraction from plan pages (pdfplumber), with a tiled
+raster fallback for scanned sheets
+"""
+
+import logging
+import re
+
+import pdfplumber
+
+import raster
+
+logger = logging.getLogger(__name__)
+
+# A page is treated as scanned when images cover this much of it and it has
+# almost no vector strokes or text of its own
+SCANNED_IMAGE_COVERAGE = 0.5
+SCANNED_MAX_VECTORS = 20
+
+
+def page_segments(page):
+    """
+    Return every straight stroke on a page as (x0, y0, x1, y1) tuples.
+
+    Coordinates are in PDF points with pdfplumber's top-left origin.
+    Rectangles are exploded into their four edges.
+    """
+    segments = []
+    for line in page.lines:
+        pts = line["pts"]
+        for (ax, ay), (bx, by) in zip(pts, pts[1:]):
+            segments.append((ax, ay, bx, by))
+    for rect in page.rects:
+        x0, top, x1, bottom = rect["x0"], rect["top"], rect["x1"], rect["bottom"]
+        segments.extend([
+            (x0, top, x1, top),
+            (x1, top, x1, bottom),
+            (x1, bottom, x0, bottom),
+            (x0, bottom, x0, top),
+        ])
+    return segments
+
+
+# 1/8" = 1'-0", 3/16"=1', 1" = 20'-0" ... Standard PDF fonts often map
+# straight quotes to typographic ones, so accept those too.
+INCH_MARKS = "\"\u201d\u2033"
+FOOT_MARKS = "'\u2019\u2032"
+ARCH_SCALE = re.compile(
+    rf"(?P<paper>\d+/\d+|\d+(?:\.\d+)?)\s*[{INCH_MARKS}]\s*=\s*"
+    rf"(?P<feet>\d+(?:\.\d+)?)\s*[{FOOT_MARKS}](?:\s*-\s*0\s*[{INCH_MARKS}])?"
+)
+# 1:100, 1 : 50
+RATIO_SCALE = re.compile(r"\b1\s*:\s*(?P<ratio>\d{1,4})\b")
+
+
+def detect_scale(words):
+    """
+    Find a scale notation in a page's words.
+
+    Returns {"notation", "points_per_foot"} for the first architectural
+    (1/8" = 1'-0") or ratio (1:100) scale found, or None.
+    """
+    text = " ".join(w["text"] for w in words)
+    match = ARCH_SCALE.search(text)
+    if match:
+        paper = match.group("paper")
+        if "/" in paper:
+            num, den = paper.split("/")
+            inches = float(num) / float(den)
+        else:
+            inches = float(paper)
+        feet = float(match.group("feet"))
+        if inches > 0 and feet > 0:
+            return {"notation": match.group(0), "points_per_foot": 72 * inches / feet}
+    match = RATIO_SCALE.search(text)
+    if match and int(match.group("ratio")) > 0:
+        # 1 ft of building is 12 / ratio inches of paper
+        return {"notation": match.group(0), "points_per_foot": 72 * 12 / int(match.group("ratio"))}
+    return None
+
+
+def is_scanned(page):
+    """True when a page is essentially one big image with no vector content"""
+    if not page.images:
+        return False
+    page_area = float(page.width * page.height)
+    image_area = sum(float(im["width"] * im["height"]) for im in page.images)
+    vectors = len(page.lines) + len(page.rects) + len(page.chars)
+    return image_area / page_area >= SCANNED_IMAGE_COVERAGE and vectors <= SCANNED_MAX_VECTORS
+
+
+def extract_page(page, raster_document=None):
+    """
+    Extract vector segments and words from a single pdfplumber page.
+
+    Scanned pages are routed through the tiled raster path; they yield
+    segments but no words or curves. Curves (door swings and the like) are
+    kept as (x0, top, x1, bottom) bounding boxes.
+    """
+    if is_scanned(page):
+        segments = raster.extract_raster_page(
+            page.pdf.path,
+            page.page_number,
+            dpi=raster.native_dpi(page),
+            document=raster_document,
+        )
+        return {
+            "page": page.page_number,
+            "width": float(page.width),
+            "height": float(page.height),
+            "source": "raster",
+            "segments": segments,
+            "curves": [],
+            "words": [],
+        }
+    return {
+        "page": page.page_number,
+        "width": float(page.width),
+        "height": float(page.height),
+        "source": "vector",
+        "segments": page_segments(page),
+        "curves": [(c["x0"], c["top"], c["x1"], c["bottom"]) for c in page.curves],
+        "words": page.extract_words(),
+    }
+
+
+def failed_page(page_number, error):
+    """
+    Stand-in for a page that could not be extracted: no segments, words or
+    curves, so its scale and boundary are not found and its takeoff rows
+    come out RED rather than failing the plan set.
+    """
+    return {
+        "page": page_number,
+        "width": 0.0,
+        "height": 0.0,
+        "source": "failed",
+        "error": error,
+        "segments": [],
+        "curves": [],
+        "words": [],
+    }
+
+
+def extract_pdf(path, pages=None):
+    """
+    Extract segments and words from a PDF.
+
+    `pages` is an optional list of 1-based page numbers; all pages are
+    extracted when omitted.
+    """
+    results = []
+    raster_document = None
+    with pdfplumber.open(path) as pdf:
+        for page in pdf.pages:
+            if pages and page.page_number not in pages:
+                continue
+            if raster_document is None and is_scanned(page):
+                raster_document = raster.pdfium.PdfDocument(path)
+            results.append(extract_page(page, raster_document))
+            # pdfplumber caches parsed objects per page; release them eagerly
+            page.flush_cache()
+    if raster_document is not None:
+        raster_document.close()
+    logger.info(f"Extracted {len(results)} pages from {path}")
+    return results
@@ -0,0 +1,417 @@
+"""
+EcoSeal Takeoff System - Geometry Kernel
+Vectorized segment storage, spatial index and planar graph operations
+
+Wall segments live in one contiguous (n, 4) float64 array of
+(x0, y0, x1, y1). A uniform grid index (CSR layout: sorted cell keys plus
+item ids) turns nearest-segment, snapping and intersection queries into
+candidate-pair lookups, so work grows with the number of nearby pairs
+instead of n². Polygonization labels every face of the noded segment graph
+with NumPy pointer-jumping rather than walking edges one at a time.
+"""
+
+import math
+
+import numpy as np
+
+# Relative tolerance for treating nearly parallel segments as parallel
+PARALLEL_EPS = 1e-9
+
+
+# ============================================================================
+# POLYGONS
+# ============================================================================
+
+def polygon_area(vertices, signed=False):
+    """Area of a closed polygon given as an (n, 2) array-like (shoelace)"""
+    v = np.asarray(vertices, dtype=float)
+    if len(v) < 3:
+        return 0.0
+    x, y = v[:, 0], v[:, 1]
+    area = 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+    return area if signed else abs(area)
+
+
+def polygon_perimeter(vertices):
+    """Perimeter of a closed polygon given as an (n, 2) array-like"""
+    v = np.asarray(vertices, dtype=float)
+    if len(v) < 2:
+        return 0.0
+    return float(np.hypot(*(np.roll(v, -1, axis=0) - v).T).sum())
+
+
+# ============================================================================
+# SPATIAL INDEX
+# ============================================================================
+
+def _ranges(starts, counts):
+    """Concatenate arange(start, start + count) for every (start, count)"""
+    counts = np.asarray(counts, dtype=np.int64)
+    total = int(counts.sum())
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(np.asarray(starts, dtype=np.int64), counts) + offsets
+
+
+class GridIndex:
+    """
+    Uniform grid over axis-aligned boxes.
+
+    Every box is registered in each cell it touches; entries are stored
+    sorted by cell key so a cell's items are one contiguous slice.
+    """
+
+    def __init__(self, bounds, cell_size=None):
+        bounds = np.asarray(bounds, dtype=float).reshape(-1, 4)
+        self.bounds = bounds
+        self.size = len(bounds)
+        if self.size == 0:
+            self.origin = np.zeros(2)
+            self.cell = 1.0
+            self.shape = (1, 1)
+            self.keys = np.empty(0, dtype=np.int64)
+            self.items = np.empty(0, dtype=np.int64)
+            return
+
+        lo = bounds[:, :2].min(axis=0)
+        hi = bounds[:, 2:].max(axis=0)
+        if cell_size is None:
+            # About one item per cell on average; long items simply register
+            # in more cells
+            area = float(np.prod(np.maximum(hi - lo, 1e-9)))
+            cell_size = max(math.sqrt(area / self.size), 1e-9)
+        self.origin = lo
+        self.cell = float(cell_size)
+        self.shape = tuple((np.floor((hi - lo) / self.cell).astype(np.int64) + 1).tolist())
+
+        keys, items = self._expand(bounds)
+        order = np.lexsort((items, keys))
+        self.keys, self.items = keys[order], items[order]
+
+    def _cells(self, bounds):
+        """Clipped cell ranges covered by each box; empty boxes are flagged"""
+        ix0 = np.floor((bounds[:, 0] - self.origin[0]) / self.cell).astype(np.int64)
+        iy0 = np.floor((bounds[:, 1] - self.origin[1]) / self.cell).astype(np.int64)
+        ix1 = np.floor((bounds[:, 2] - self.origin[0]) / self.cell).astype(np.int64)
+        iy1 = np.floor((bounds[:, 3] - self.origin[1]) / self.cell).astype(np.int64)
+        inside = (ix1 >= 0) & (iy1 >= 0) & (ix0 < self.shape[0]) & (iy0 < self.shape[1])
+        ix0, ix1 = np.clip(ix0, 0, self.shape[0] - 1), np.clip(ix1, 0, self.shape[0] - 1)
+        iy0, iy1 = np.clip(iy0, 0, self.shape[1] - 1), np.clip(iy1, 0, self.shape[1] - 1)
+        return ix0, iy0, ix1, iy1, inside
+
+    def _expand(self, bounds):
+        """(cell_key, box_index) for every cell every box touches"""
+        ix0, iy0, ix1, iy1, inside = self._cells(bounds)
+        nx = np.where(inside, ix1 - ix0 + 1, 0)
+        ny = iy1 - iy0 + 1
+        counts = nx * ny
+        owner = np.repeat(np.arange(len(bounds)), counts)
+        local = _ranges(np.zeros(len(bounds), dtype=np.int64), counts)
+        dx, dy = np.divmod(local, np.repeat(ny, counts))
+        keys = (np.repeat(ix0, counts) + dx) * self.shape[1] + np.repeat(iy0, counts) + dy
+        return keys, owner
+
+    def query(self, bounds):
+        """
+        Candidate (query_index, item_index) pairs whose cells overlap.
+
+        Candidates are a superset of true overlaps; callers apply the exact
+        test on the much smaller candidate set.
+        """
+        bounds = np.asarray(bounds, dtype=float).reshape(-1, 4)
+        empty = np.empty(0, dtype=np.int64)
+        if self.size == 0 or len(bounds) == 0:
+            return empty, empty
+        keys, owner = self._expand(bounds)
+        lo = np.searchsorted(self.keys, keys, side="left")
+        hi = np.searchsorted(self.keys, keys, side="right")
+        counts = hi - lo
+        query = np.repeat(owner, counts)
+        items = self.items[_ranges(lo, counts)]
+        # Only queries spanning several cells can see an item twice
+        spans = np.bincount(owner, minlength=len(bounds))[query] > 1
+        if not spans.any():
+            return query, items
+        packed = np.unique(query[spans] * self.size + items[spans])
+        return (
+            np.concatenate([query[~spans], packed // self.size]),
+            np.concatenate([items[~spans], packed % self.size]),
+        )
+
+    def pairs(self):
+        """Unique (i, j) item pairs with i < j that share at least one cell"""
+        empty = np.empty(0, dtype=np.int64)
+        if self.size < 2:
+            return empty, empty
+        starts = np.flatnonzero(np.r_[True, self.keys[1:] != self.keys[:-1]])
+        counts = np.diff(np.r_[starts, len(self.keys)])
+        # Each entry pairs with the entries after it in the same cell
+        block_end = np.repeat(starts + counts, counts)
+        position = np.arange(len(self.keys))
+        partners = block_end - position - 1
+        first = np.repeat(position, partners)
+        second = _ranges(position + 1, partners)
+        i, j = self.items[first], self.items[second]
+        # Report each pair only from the cell holding the lower-left corner
+        # of the two boxes' overlap, so pairs sharing many cells appear once
+        corner = np.maximum(self.bounds[i, :2], self.bounds[j, :2])
+        cx, cy = np.floor((corner - self.origin) / self.cell).astype(np.int64).T
+        keep = (cx * self.shape[1] + cy == self.keys[first]) & (i != j)
+        i, j = i[keep], j[keep]
+        return np.minimum(i, j), np.maximum(i, j)
+
+
+# ============================================================================
+# SEGMENT SETS
+# ============================================================================
+
+class SegmentSet:
+    """An immutable set of 2-D line segments stored as an (n, 4) array"""
+
+    def __init__(self, segments):
+        coords = np.asarray(segments, dtype=float)
+        self.coords = np.ascontiguousarray(coords.reshape(-1, coords.shape[-1] if coords.size else 4)[:, :4])
+        self._index = None
+
+    def __len__(self):
+        return len(self.coords)
+
+    @property
+    def lengths(self):
+        c = self.coords
+        return np.hypot(c[:, 2] - c[:, 0], c[:, 3] - c[:, 1])
+
+    @property
+    def bounds(self):
+        c = self.coords
+        return np.column_stack([
+            np.minimum(c[:, 0], c[:, 2]), np.minimum(c[:, 1], c[:, 3]),
+            np.maximum(c[:, 0], c[:, 2]), np.maximum(c[:, 1], c[:, 3]),
+        ])
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = GridIndex(self.bounds)
+        return self._index
+
+    def tolist(self):
+        return [tuple(row) for row in self.coords.tolist()]
+
+    # ---------------------------------------------------------------- queries
+
+    def _project(self, points, candidates):
+        """Distance and parameter of each point's projection onto a segment"""
+        c = self.coords[candidates]
+        d = c[:, 2:] - c[:, :2]
+        length_sq = np.maximum((d ** 2).sum(axis=1), 1e-18)
+        t = np.clip(((points - c[:, :2]) * d).sum(axis=1) / length_sq, 0.0, 1.0)
+        foot = c[:, :2] + d * t[:, None]
+        return np.hypot(*(points - foot).T), t, foot
+
+    def nearest(self, points, max_distance, exclude=None):
+        """
+        Nearest segment to each point within `max_distance`.
+
+        Returns (segment_index, distance, foot_point) arrays; index is -1
+        where nothing is in range. `exclude` optionally gives, per point, a
+        segment id to ignore (its own segment).
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        n = len(points)
+        best = np.full(n, -1, dtype=np.int64)
+        distance = np.full(n, np.inf)
+        foot = points.copy()
+        if n == 0 or len(self) == 0:
+            return best, distance, foot
+
+        boxes = np.column_stack([points - max_distance, points + max_distance])
+        q, s = self.index.query(boxes)
+        if exclude is not None:
+            keep = s != np.asarray(exclude)[q]
+            q, s = q[keep], s[keep]
+        d, _, f = self._project(points[q], s)
+        keep = d <= max_distance
+        q, s, d, f = q[keep], s[keep], d[keep], f[keep]
+        order = np.lexsort((d, q))
+        q, s, d, f = q[order], s[order], d[order], f[order]
+        first = np.r_[True, q[1:] != q[:-1]]
+        best[q[first]] = s[first]
+        distance[q[first]] = d[first]
+        foot[q[first]] = f[first]
+        return best, distance, foot
+
+    def intersections(self, tolerance=1e-9):
+        """
+        All intersecting segment pairs.
+
+        Returns (i, j, t, u, x, y) arrays: the segments, the parameters
+        along each (0..1) and the intersection point. Parallel and collinear
+        pairs are skipped.
+        """
+        i, j = self.index.pairs()
+        a, b = self.coords[i], self.coords[j]
+        p, r = a[:, :2], a[:, 2:] - a[:, :2]
+        q, s = b[:, :2], b[:, 2:] - b[:, :2]
+        denom = r[:, 0] * s[:, 1] - r[:, 1] * s[:, 0]
+        scale = np.hypot(*r.T) * np.hypot(*s.T)
+        ok = np.abs(denom) > PARALLEL_EPS * np.maximum(scale, 1e-18)
+        i, j, p, r, q, s, denom = i[ok], j[ok], p[ok], r[ok], q[ok], s[ok], denom[ok]
+        qp = q - p
+        t = (qp[:, 0] * s[:, 1] - qp[:, 1] * s[:, 0]) / denom
+        u = (qp[:, 0] * r[:, 1] - qp[:, 1] * r[:, 0]) / denom
+        # Parameter slack equivalent to `tolerance` in distance
+        ta = tolerance / np.maximum(np.hypot(*r.T), 1e-18)
+        ub = tolerance / np.maximum(np.hypot(*s.T), 1e-18)
+        hit = (t >= -ta) & (t <= 1 + ta) & (u >= -ub) & (u <= 1 + ub)
+        i, j, t, u, p, r = i[hit], j[hit], np.clip(t[hit], 0, 1), np.clip(u[hit], 0, 1), p[hit], r[hit]
+        point = p + r * t[:, None]
+        return i, j, t, u, point[:, 0], point[:, 1]
+
+    # ------------------------------------------------------------- transforms
+
+    def snap(self, tolerance):
+        """
+        Snap nearly coincident endpoints together and pull dangling
+        endpoints onto segments passing within `tolerance` (closing
+        T-junctions and small gaps). Zero-length and duplicate segments are
+        dropped.
+        """
+        if len(self) == 0:
+            return self
+        points = self.coords.reshape(-1, 2).copy()
+
+        # Round endpoints onto a tolerance grid. Unlike distance clustering
+        # this never chains: a run of segments shorter than the tolerance
+        # stays a run instead of collapsing into one node.
+        keys = np.round(points / tolerance).astype(np.int64)
+        _, labels, counts = np.unique(keys, axis=0, return_inverse=True, return_counts=True)
+        points = keys * tolerance
+        labels = labels.reshape(-1)
+
+        # Endpoints that no other endpoint shares may land on a segment body
+        shared = counts[labels] > 1
+        clustered = SegmentSet(points.reshape(-1, 4))
+        loose = np.flatnonzero(~shared)
+        owner = loose // 2
+        hit, _, foot = clustered.nearest(points[loose], tolerance, exclude=owner)
+        moved = hit >= 0
+        points[loose[moved]] = foot[moved]
+
+        coords = points.reshape(-1, 4)
+        coords = coords[np.hypot(coords[:, 2] - coords[:, 0], coords[:, 3] - coords[:, 1]) > 0]
+        return SegmentSet(_dedupe(coords))
+
+    def noded(self, tolerance=1e-9):
+        """Split every segment at its intersections with other segments"""
+        if len(self) == 0:
+            return self
+        i, j, t, u, _, _ = self.intersections(tolerance)
+        n = len(self)
+        seg = np.concatenate([np.arange(n), np.arange(n), i, j])
+        param = np.concatenate([np.zeros(n), np.ones(n), t, u])
+        order = np.lexsort((param, seg))
+        seg, param = seg[order], param[order]
+        keep = np.r_[True, (seg[1:] != seg[:-1]) | (np.diff(param) > 1e-12)]
+        seg, param = seg[keep], param[keep]
+
+        same = seg[1:] == seg[:-1]
+        owner = seg[:-1][same]
+        t0, t1 = param[:-1][same], param[1:][same]
+        c = self.coords[owner]
+        d = c[:, 2:] - c[:, :2]
+        start = c[:, :2] + d * t0[:, None]
+        end = c[:, :2] + d * t1[:, None]
+        return SegmentSet(np.column_stack([start, end]))
+
+    def polygonize(self, decimals=6):
+        """Label every face of the segment graph; see Faces"""
+        return Faces(self.coords, decimals)
+
+
+def _dedupe(coords):
+    """Drop duplicate segments regardless of direction"""
+    flip = (coords[:, 0] > coords[:, 2]) | ((coords[:, 0] == coords[:, 2]) & (coords[:, 1] > coords[:, 3]))
+    norm = coords.copy()
+    norm[flip] = coords[flip][:, [2, 3, 0, 1]]
+    return np.unique(norm, axis=0)
+
+
+# ============================================================================
+# POLYGONIZATION
+# ============================================================================
+
+class Faces:
+    """
+    Faces of a planar segment graph.
+
+    Segments are turned into half-edges sorted counter-clockwise around
+    their origin node. Leaving each node on the half-edge just clockwise of
+    the one we arrived on traces faces; the resulting `next` permutation is
+    split into cycles by pointer-jumping, so labelling is O(E log E) in
+    NumPy. Face areas are signed: interior faces are positive
+    (counter-clockwise in a y-up frame), the unbounded face of each
+    component negative.
+    """
+
+    def __init__(self, coords, decimals=6):
+        coords = np.asarray(coords, dtype=float).reshape(-1, 4)
+        rounded = np.round(coords.reshape(-1, 2), decimals)
+        if len(rounded):
+            self.nodes, inverse = np.unique(rounded, axis=0, return_inverse=True)
+        else:
+            self.nodes, inverse = np.empty((0, 2)), np.empty(0, dtype=np.int64)
+        edges = inverse.reshape(-1, 2)
+        edges = edges[edges[:, 0] != edges[:, 1]]
+        edges = np.unique(np.sort(edges, axis=1), axis=0) if len(edges) else edges.reshape(0, 2)
+
+        # Half-edges 2k and 2k+1 are twins
+        origin = edges.reshape(-1)
+        dest = edges[:, ::-1].reshape(-1)
+        delta = self.nodes[dest] - self.nodes[origin] if len(origin) else np.empty((0, 2))
+        angle = np.arctan2(delta[:, 1], delta[:, 0]) if len(origin) else np.empty(0)
+
+        order = np.lexsort((angle, origin))
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        degree = np.bincount(origin, minlength=len(self.nodes))
+        block_start = np.cumsum(degree) - degree
+
+        # next(h) = half-edge leaving dest(h) just clockwise of twin(h)
+        twin_rank = rank[np.arange(len(origin)) ^ 1]
+        local = twin_rank - block_start[dest]
+        nxt = order[block_start[dest] + (local - 1) % np.maximum(degree[dest], 1)]
+
+        labels = np.arange(len(origin))
+        jump = nxt.copy()
+        for _ in range(max(1, int(math.ceil(math.log2(max(2, len(origin))))))):
+            labels = np.minimum(labels, labels[jump])
+            jump = jump[jump]
+
+        self.origin, self.dest, self.next = origin, dest, nxt
+        face_ids, self.face = np.unique(labels, return_inverse=True)
+        self.start = face_ids  # one half-edge on each face
+        p, q = self.nodes[origin], self.nodes[dest]
+        count = len(face_ids)
+        self.area = 0.5 * np.bincount(self.face, weights=p[:, 0] * q[:, 1] - q[:, 0] * p[:, 1], minlength=count)
+        self.perimeter = np.bincount(self.face, weights=np.hypot(*(q - p).T), minlength=count)
+        self.bounds = np.full((count, 4), [np.inf, np.inf, -np.inf, -np.inf])
+        if count:
+            np.minimum.at(self.bounds[:, 0], self.face, p[:, 0])
+            np.minimum.at(self.bounds[:, 1], self.face, p[:, 1])
+            np.maximum.at(self.bounds[:, 2], self.face, p[:, 0])
+            np.maximum.at(self.bounds[:, 3], self.face, p[:, 1])
+
+    def __len__(self):
+        return len(self.start)
+
+    def polygon(self, face):
+        """Vertices of one face, in traversal order"""
+        vertices = []
+        h = self.start[face]
+        while True:
+            vertices.append(tuple(self.nodes[self.origin[h]].tolist()))
+            h = self.next[h]
+            if h == self.start[face]:
+                return vertices
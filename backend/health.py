@@ -0,0 +1,171 @@
+"""
+EcoSeal Takeoff System - Health Checks
+Liveness, cached readiness and startup warmup
+
+Probes must be cheap and must not compete with real traffic, so the
+readiness endpoint never touches the database itself. A ReadinessMonitor
+thread runs every check (database, connection pool, extraction job
+queue, caches) every READINESS_INTERVAL_S and keeps the results; probes
+read that snapshot. A snapshot that stops being refreshed counts as not
+ready, so a wedged monitor is noticed too.
+
+Each check returns (state, details), where state is:
+
+    ok        working normally
+    degraded  working, but worth a look (pool exhausted, disk low)
+    starting  not ready yet (warmup still running)
+    error     not working
+
+The service is ready while no check is "starting" or "error".
+
+Warmup runs once at startup, in the background, to take first-request
+costs off real users: open pool connections, load settings and compile
+common queries, and exercise the PDF stack (parsing and rendering a
+blank page). Readiness reports "starting" until it has finished; a step
+that fails is logged and reported but does not hold readiness back.
+"""
+
+import io
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Seconds between readiness check runs
+READINESS_INTERVAL_S = float(os.getenv("READINESS_INTERVAL_S", "5"))
+
+# A snapshot older than this many intervals means the monitor is stuck
+STALE_INTERVALS = 3
+
+NOT_READY = ("starting", "error")
+
+
+# ============================================================================
+# READINESS
+# ============================================================================
+
+class ReadinessMonitor:
+    """Runs named checks in a background thread and caches their results"""
+
+    def __init__(self, checks, interval_s=READINESS_INTERVAL_S):
+        self.checks = checks  # name -> function returning (state, details)
+        self.interval_s = interval_s
+        self.results = {}
+        self.checked_at = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def refresh(self):
+        results = {}
+        for name, check in self.checks.items():
+            started = time.perf_counter()
+            try:
+                state, details = check()
+            except Exception as e:
+                state, details = "error", {"error": f"{type(e).__name__}: {e}"}
+            results[name] = {"state": state, "ms": round((time.perf_counter() - started) * 1000, 1), **details}
+            if state == "error" and self.results.get(name, {}).get("state") != "error":
+                logger.warning(f"Readiness check {name} failed: {details}")
+        self.results = results
+        self.checked_at = time.time()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.refresh()
+            self._stop.wait(self.interval_s)
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="readiness", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self):
+        """{"ready", "status", "checked_at", "age_s", "checks"} from the last run"""
+        if self.checked_at is None:
+            return {"ready": False, "status": "starting", "checked_at": None, "age_s": None, "checks": {}}
+        age = time.time() - self.checked_at
+        states = [result["state"] for result in self.results.values()]
+        if age > self.interval_s * STALE_INTERVALS:
+            status = "stale"
+        elif "error" in states:
+            status = "error"
+        elif "starting" in states:
+            status = "starting"
+        else:
+            status = "degraded" if "degraded" in states else "ok"
+        return {
+            "ready": status in ("ok", "degraded"),
+            "status": status,
+            "checked_at": datetime.utcfromtimestamp(self.checked_at).isoformat(),
+            "age_s": round(age, 1),
+            "checks": self.results,
+        }
+
+
+# ============================================================================
+# WARMUP
+# ============================================================================
+
+class Warmup:
+    """Named startup steps, run once in a background thread"""
+
+    def __init__(self, steps):
+        self.steps = steps  # [(name, function)]
+        self.state = "off"
+        self.results = {}
+
+    def _run(self):
+        self.state = "running"
+        started = time.perf_counter()
+        for name, step in self.steps:
+            step_started = time.perf_counter()
+            try:
+                detail = step()
+                self.results[name] = {"ms": round((time.perf_counter() - step_started) * 1000, 1)}
+                if detail is not None:
+                    self.results[name]["detail"] = detail
+            except Exception as e:
+                logger.warning(f"Warmup step {name} failed: {str(e)}")
+                self.results[name] = {"error": f"{type(e).__name__}: {e}"}
+        self.state = "done"
+        logger.info(f"Warmup finished in {time.perf_counter() - started:.2f}s")
+
+    def start(self):
+        self.state = "pending"
+        threading.Thread(target=self._run, name="warmup", daemon=True).start()
+
+    def check(self):
+        """Readiness check: "starting" until every step has run"""
+        return ("starting" if self.state in ("pending", "running") else "ok"), {
+            "warmup": self.state, "steps": self.results,
+        }
+
+
+def warm_pdf_stack():
+    """
+    Parse and render a blank page, loading what pdfplumber/pdfminer,
+    pdfium and the PNG encoder otherwise load on the first real request
+    """
+    import pdfplumber
+    import pypdfium2 as pdfium
+
+    document = pdfium.PdfDocument.new()
+    document.new_page(612, 792)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    document.close()
+
+    with pdfplumber.open(io.BytesIO(buffer.getvalue())) as pdf:
+        pdf.pages[0].extract_words()
+    document = pdfium.PdfDocument(buffer.getvalue())
+    try:
+        image = document[0].render(scale=0.25).to_pil()
+        image.save(io.BytesIO(), format="PNG")
+    finally:
+        document.close()
@@ -0,0 +1,295 @@
+"""
+EcoSeal Takeoff System - Bulk Import
+Streaming import of historical takeoffs from CSV or XLSX spreadsheets
+
+One spreadsheet row per takeoff, with the project it belongs to named on
+the row. Files are read a chunk of rows at a time, each chunk is
+validated column-wise with NumPy against the TakeoffItem / ProjectCreate
+rules, and valid rows are written with one bulk statement per chunk
+(COPY on PostgreSQL, executemany elsewhere). Invalid rows are reported
+with their line number and reasons and never stop the import.
+
+Usage:
+    python importer.py past_takeoffs.csv [--errors errors.csv]
+"""
+
+import argparse
+import csv
+import io
+import itertools
+import logging
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Rows validated and inserted per batch
+CHUNK_ROWS = 50_000
+
+# Spreadsheet column -> required?
+COLUMNS = {
+    "project": True,
+    "project_date": False,
+    "project_notes": False,
+    "level": True,
+    "wall_type": True,
+    "material_type": True,
+    "quantity": True,
+    "unit": False,
+    "assembly": False,
+    "r_value": False,
+    "perimeter_ft": True,
+    "height_ft": True,
+    "confidence": False,
+    "created_at": False,
+}
+
+NUMERIC = ("quantity", "perimeter_ft", "height_ft")
+CONFIDENCE = ("GREEN", "YELLOW", "RED")
+
+# Header spellings accepted for each column
+ALIASES = {
+    "project_name": "project",
+    "name": "project",
+    "date": "project_date",
+    "notes": "project_notes",
+    "material": "material_type",
+    "qty": "quantity",
+    "perimeter": "perimeter_ft",
+    "height": "height_ft",
+    "r-value": "r_value",
+    "rvalue": "r_value",
+}
+
+
+def _column_name(header):
+    name = (header or "").strip().lower().replace(" ", "_")
+    return ALIASES.get(name, name)
+
+
+# ============================================================================
+# READING
+# ============================================================================
+
+def _csv_rows(stream):
+    text = stream if isinstance(stream, io.TextIOBase) else io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    yield from csv.reader(text)
+
+
+def _xlsx_rows(stream):
+    try:
+        import openpyxl
+    except ImportError:
+        raise ValueError("XLSX import needs openpyxl (pip install openpyxl)")
+    try:
+        workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    except Exception as e:
+        raise ValueError(f"Could not read XLSX file: {e}")
+    try:
+        for row in workbook.worksheets[0].iter_rows(values_only=True):
+            yield ["" if value is None else value.isoformat() if isinstance(value, datetime) else str(value) for value in row]
+    finally:
+        workbook.close()
+
+
+def read_chunks(stream, filename, size=CHUNK_ROWS):
+    """
+    Yield (first_line, {column: array of str}) for each chunk of rows.
+
+    `first_line` is the spreadsheet line number of the chunk's first row
+    (the header is line 1). Unknown columns are ignored; missing required
+    columns raise ValueError before anything is read.
+    """
+    rows = _xlsx_rows(stream) if filename.lower().endswith((".xlsx", ".xlsm")) else _csv_rows(stream)
+    header = [_column_name(h) for h in next(rows, [])]
+    missing = [name for name, required in COLUMNS.items() if required and name not in header]
+    if missing:
+        raise ValueError(f"Missing required columns: {', '.join(missing)}")
+    positions = {name: header.index(name) for name in COLUMNS if name in header}
+    width = len(header)
+
+    line = 2
+    while True:
+        chunk = list(itertools.islice(rows, size))
+        if not chunk:
+            return
+        table = np.array([
+            row[:width] if len(row) >= width else row + [""] * (width - len(row)) for row in chunk
+        ], dtype=str).reshape(len(chunk), width)
+        columns = {
+            name: np.char.strip(table[:, positions[name]]) if name in positions
+            else np.full(len(chunk), "", dtype=str)
+            for name in COLUMNS
+        }
+        columns["_blank"] = ~(np.char.str_len(table) > 0).any(axis=1)
+        yield line, columns
+        line += len(chunk)
+
+
+# ============================================================================
+# VALIDATION
+# ============================================================================
+
+def _to_float(values):
+    """Float array and a mask of values that did not parse"""
+    try:
+        return values.astype(float), np.zeros(len(values), dtype=bool)
+    except ValueError:
+        # Parse each distinct value once
+        table, index = np.unique(values, return_inverse=True)
+        parsed = np.full(len(table), np.nan)
+        bad = np.zeros(len(table), dtype=bool)
+        for i, value in enumerate(table):
+            try:
+                parsed[i] = float(value)
+            except ValueError:
+                bad[i] = True
+        return parsed[index], bad[index]
+
+
+def _to_datetime(values):
+    """datetime64 array (NaT for blanks) and a mask of values that did not parse"""
+    filled = np.where(values == "", "NaT", values)
+    try:
+        return filled.astype("datetime64[s]"), np.zeros(len(values), dtype=bool)
+    except ValueError:
+        table, index = np.unique(filled, return_inverse=True)
+        parsed = np.full(len(table), np.datetime64("NaT"), dtype="datetime64[s]")
+        bad = np.zeros(len(table), dtype=bool)
+        for i, value in enumerate(table):
+            if value == "NaT":
+                continue
+            try:
+                parsed[i] = np.datetime64(datetime.fromisoformat(value), "s")
+            except ValueError:
+                bad[i] = True
+        return parsed[index], bad[index]
+
+
+def validate(first_line, columns):
+    """
+    Check a chunk against the takeoff rules.
+
+    Returns (valid, errors): `valid` holds the typed columns of the rows
+    that passed, plus "line"; `errors` is a list of {"line", "errors"} for
+    the rows that did not. Blank rows are skipped silently.
+    """
+    n = len(columns["project"])
+    skip = columns["_blank"]
+    problems = {}
+    failed = np.zeros(n, dtype=bool)
+
+    def flag(mask, message):
+        mask = mask & ~skip
+        for i in np.flatnonzero(mask):
+            problems.setdefault(i, []).append(message)
+        failed[mask] = True
+
+    for name, required in COLUMNS.items():
+        if required and name not in NUMERIC:
+            flag(columns[name] == "", f"{name} is required")
+    flag(np.char.str_len(columns["project"].astype(str)) > 255, "project name must be less than 255 characters")
+
+    typed = {}
+    for name in NUMERIC:
+        values, bad = _to_float(np.where(columns[name] == "", "nan", columns[name]))
+        flag(bad | np.isnan(values), f"{name} must be a number")
+        flag(values < 0, f"{name} must be positive")
+        typed[name] = values
+
+    confidence = np.char.upper(columns["confidence"].astype(str))
+    confidence = np.where(confidence == "", "GREEN", confidence)
+    flag(~np.isin(confidence, CONFIDENCE), f"confidence must be one of {list(CONFIDENCE)}")
+    typed["confidence"] = confidence
+
+    for name in ("project_date", "created_at"):
+        typed[name], bad = _to_datetime(columns[name])
+        flag(bad, f"{name} must be an ISO date (YYYY-MM-DD)")
+
+    keep = ~failed & ~skip
+    lines = first_line + np.arange(n)
+    errors = [{"line": int(lines[i]), "errors": problems[i]} for i in np.flatnonzero(failed)]
+
+    valid = {name: columns[name][keep] for name in COLUMNS}
+    valid.update({name: values[keep] for name, values in typed.items()})
+    valid["unit"] = np.where(valid["unit"] == "", "sqft", valid["unit"])
+    valid["line"] = lines[keep]
+    return valid, errors
+
+
+# ============================================================================
+# BULK INSERT
+# ============================================================================
+
+def timestamps(values):
+    """datetime64 array as 'YYYY-MM-DD HH:MM:SS.ffffff' strings, None for NaT"""
+    text = np.char.replace(np.datetime_as_string(values, unit="us"), "T", " ").astype(object)
+    text[np.isnat(values)] = None
+    return text
+
+
+def bulk_insert(connection, table, columns, rows):
+    """
+    Insert `rows` (tuples ordered like `columns`) into `table` with one
+    statement: COPY on PostgreSQL, executemany on the raw DBAPI cursor
+    elsewhere.
+    """
+    if not rows:
+        return
+    raw = connection.connection
+    cursor = raw.cursor()
+    try:
+        if connection.dialect.name == "postgresql":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerows(rows)
+            buffer.seek(0)
+            cursor.copy_expert(
+                f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)", buffer
+            )
+        else:
+            marks = ", ".join("?" if connection.dialect.paramstyle == "qmark" else "%s" for _ in columns)
+            cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({marks})", rows)
+    finally:
+        cursor.close()
+
+
+# ============================================================================
+# CLI
+# ============================================================================
+
+def main():
+    parser = argparse.ArgumentParser(description="Import historical takeoffs from CSV or XLSX")
+    parser.add_argument("path", help="CSV or XLSX file, one takeoff per row")
+    parser.add_argument("--errors", help="write rejected rows to this CSV file")
+    args = parser.parse_args()
+
+    from main import SessionLocal, import_takeoffs
+
+    started = time.perf_counter()
+    db = SessionLocal()
+    try:
+        with open(args.path, "rb") as stream:
+            result = import_takeoffs(db, stream, os.path.basename(args.path), max_errors=None)
+    finally:
+        db.close()
+
+    print(f"Imported {result['imported']:,} of {result['rows']:,} rows into "
+          f"{result['projects_created']:,} new projects in {time.perf_counter() - started:.1f}s")
+    if result["error_count"]:
+        print(f"{result['error_count']:,} rows rejected")
+        if args.errors:
+            with open(args.errors, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(["line", "errors"])
+                for error in result["errors"]:
+                    writer.writerow([error["line"], "; ".join(error["errors"])])
+            print(f"Rejected rows written to {args.errors}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
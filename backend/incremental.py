@@ -0,0 +1,116 @@
+"""
+EcoSeal Takeoff System - Incremental Computation
+A small pull-based dependency graph with early cutoff
+
+Nodes are either inputs (set from outside) or derived (a function of other
+nodes). Every node carries a version that only moves when its value
+actually changes. A derived node remembers the versions of its
+dependencies when it last ran, so reading it re-runs the function only if
+one of those moved; a node that recomputes to an equal value keeps its
+version and nothing downstream re-runs.
+"""
+
+import numpy as np
+
+
+def _equal(a, b):
+    """Structural equality that also understands NumPy arrays"""
+    if a is b:
+        return True
+    if isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+        return isinstance(a, np.ndarray) and isinstance(b, np.ndarray) and \
+            a.shape == b.shape and np.array_equal(a, b)
+    if isinstance(a, dict) and isinstance(b, dict):
+        return a.keys() == b.keys() and all(_equal(a[k], b[k]) for k in a)
+    if isinstance(a, (list, tuple)) and isinstance(b, (list, tuple)):
+        return type(a) is type(b) and len(a) == len(b) and all(_equal(x, y) for x, y in zip(a, b))
+    try:
+        return bool(a == b)
+    except (TypeError, ValueError):
+        return False
+
+
+class _Node:
+    __slots__ = ("compute", "deps", "value", "version", "seen")
+
+    def __init__(self, compute=None, deps=(), value=None):
+        self.compute = compute
+        self.deps = tuple(deps)
+        self.value = value
+        self.version = 0 if compute else 1
+        self.seen = None
+
+
+class Graph:
+    """
+    Incremental dependency graph.
+
+        graph.input("height", 10.0)
+        graph.define("area", lambda h: 520 * h, ["height"])
+        graph.get("area")        # computes
+        graph.input("height", 10.0)
+        graph.get("area")        # cached, nothing changed
+
+    `recomputed` lists the derived nodes that ran since it was last
+    cleared.
+    """
+
+    def __init__(self):
+        self._nodes = {}
+        self.recomputed = []
+
+    def __contains__(self, key):
+        return key in self._nodes
+
+    def input(self, key, value):
+        """Set an input node; its version moves only if the value changed"""
+        node = self._nodes.get(key)
+        if node is None or node.compute is not None:
+            self._nodes[key] = _Node(value=value)
+        elif not _equal(node.value, value):
+            node.value = value
+            node.version += 1
+
+    def define(self, key, compute, deps=()):
+        """
+        Declare a derived node. Redefining a node with the same
+        dependencies keeps its cached value; new dependencies force it to
+        recompute on next read.
+        """
+        node = self._nodes.get(key)
+        if node is not None and node.compute is not None and node.deps == tuple(deps):
+            node.compute = compute
+            return
+        replacement = _Node(compute, deps)
+        if node is not None:
+            # Keep the version moving forward so dependents notice
+            replacement.version = node.version
+            replacement.value = node.value
+        self._nodes[key] = replacement
+
+    def remove(self, key):
+        self._nodes.pop(key, None)
+
+    def keys(self, prefix):
+        """Keys of tuple-keyed nodes whose first element is `prefix`"""
+        return [k for k in self._nodes if isinstance(k, tuple) and k and k[0] == prefix]
+
+    def version(self, key):
+        self.get(key)
+        return self._nodes[key].version
+
+    def get(self, key):
+        """Current value of a node, recomputing only what is stale"""
+        node = self._nodes[key]
+        if node.compute is None:
+            return node.value
+        seen = tuple(self.version(dep) for dep in node.deps)
+        if node.seen == seen:
+            return node.value
+        value = node.compute(*(self._nodes[dep].value for dep in node.deps))
+        self.recomputed.append(key)
+        node.seen = seen
+        if node.version == 0 or not _equal(value, node.value):
+            node.value = value
+            node.version += 1
+        return node.value
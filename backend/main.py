@@ -3,16 +3,47 @@ EcoSeal Insulation Takeoff System - FastAPI Backend
 Real data, real API, real database
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Depends
+from fastapi import FastAPI, HTTPException, UploadFile, File, Depends, Header, Query, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from sqlalchemy import create_engine, Column, Integer, String, Float, DateTime, JSON
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import create_engine, event, inspect, text, case, Boolean, Column, Integer, String, Float, Date, DateTime, JSON, LargeBinary, UniqueConstraint, func
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.pool import NullPool
 from pydantic import BaseModel, validator
-from datetime import datetime
+from typing import Optional
+from datetime import date, datetime, timedelta
+import contextlib
+import hashlib
 import json
 import os
 import logging
+import shutil
+import tempfile
+import time
+
+import anyio
+import numpy as np
+
+import admission
+import analytics
+import assemblies
+import encoding
+import health
+import importer
+import materials
+import page_index
+import revisions
+import search
+import segment_store
+import sync
+import takeoff as takeoff_engine
+import tiles
+import workers
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
@@ -48,6 +79,9 @@ except Exception as db_error:
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 Base = declarative_base()
 
+# Uploaded plan sets are stored by content hash
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "/tmp/takeoff_uploads")
+
 # ============================================================================
 # DATABASE MODELS
 # ============================================================================
@@ -80,6 +114,37 @@ class TakeoffDB(Base):
     perimeter_ft = Column(Float)
     height_ft = Column(Float)
     confidence = Column(String, default="GREEN")
+    deductions = Column(JSON, nullable=True)  # opening deduction breakdown
+    assembly_id = Column(Integer, index=True, nullable=True)  # parsed assembly, set on every write
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class AssemblyDB(Base):
+    """A distinct assembly description and R-value text, parsed into numbers (see assemblies.py)"""
+    __tablename__ = "assemblies"
+    __table_args__ = (UniqueConstraint("assembly", "r_value"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    assembly = Column(String)
+    r_value = Column(String)
+    framing = Column(String, nullable=True)        # 2x4, 2x6, steel_stud, cmu
+    framing_depth_in = Column(Float, nullable=True)
+    insulation = Column(String, nullable=True)     # first insulation layer: ccSPF, ocSPF, batt...
+    thickness_in = Column(Float, nullable=True)    # all insulation layers
+    vapour_barrier = Column(String, nullable=True)
+    vapour_barrier_mil = Column(Float, nullable=True)
+    r_value_number = Column(Float, nullable=True)
+    r_value_estimated = Column(Boolean, default=False)  # from thickness, no R-value stated
+    layers = Column(JSON)
+
+class TakeoffSegmentsDB(Base):
+    """Per-edge geometry behind a takeoff row, packed as columnar arrays"""
+    __tablename__ = "takeoff_segments"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    takeoff_id = Column(Integer, unique=True, index=True)
+    project_id = Column(Integer, index=True)
+    count = Column(Integer)
+    data = Column(LargeBinary)  # see segment_store
     created_at = Column(DateTime, default=datetime.utcnow)
 
 class SettingsDB(Base):
@@ -91,8 +156,261 @@ class SettingsDB(Base):
     value = Column(String)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
+class PlanPageDB(Base):
+    """Page index for an uploaded plan set (one row per PDF page)"""
+    __tablename__ = "plan_pages"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, index=True)
+    file_hash = Column(String, index=True)
+    file_name = Column(String)
+    page_number = Column(Integer)
+    sheet_number = Column(String, nullable=True)
+    page_type = Column(String, index=True)  # floor_plan, section, elevation, schedule, detail, other
+    level = Column(String, nullable=True)
+    title = Column(String, nullable=True)
+    confidence = Column(String, default="GREEN")
+    features = Column(JSON, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ProjectRevisionDB(Base):
+    """A snapshot of a project and its takeoffs (one per drawing issue)"""
+    __tablename__ = "project_revisions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, index=True)
+    number = Column(Integer)
+    parent_id = Column(Integer, nullable=True)
+    label = Column(String, nullable=True)  # e.g. "Bulletin 2", "Addendum 1"
+    name = Column(String)
+    notes = Column(String, nullable=True)
+    status = Column(String)
+    takeoff_count = Column(Integer, default=0)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class TakeoffVersionDB(Base):
+    """Immutable takeoff values shared by every revision that contains them"""
+    __tablename__ = "takeoff_versions"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    fingerprint = Column(String, unique=True, index=True)
+    data = Column(JSON)  # see revisions.FIELDS
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class RevisionTakeoffDB(Base):
+    """Takeoff versions added (+) or removed (-) by a revision relative to its parent"""
+    __tablename__ = "revision_takeoffs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    revision_id = Column(Integer, index=True)
+    version_id = Column(Integer)
+    count = Column(Integer)
+
+class TakeoffRollupDB(Base):
+    """Daily takeoff sums per material, maintained on every takeoff write"""
+    __tablename__ = "takeoff_rollups"
+    __table_args__ = (UniqueConstraint("day", "material_type"),)
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, index=True)
+    material_type = Column(String)
+    takeoffs = Column(Integer, default=0)
+    sqft = Column(Float, default=0.0)
+    r_weighted = Column(Float, default=0.0)  # sum of R-value x sqft
+    r_sqft = Column(Float, default=0.0)      # sqft with a known R-value
+    red = Column(Integer, default=0)
+
+class ProjectRollupDB(Base):
+    """Projects per day (by project date), maintained on every project write"""
+    __tablename__ = "project_rollups"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    day = Column(Date, unique=True, index=True)
+    projects = Column(Integer, default=0)
+
+class IdempotencyKeyDB(Base):
+    """Response of a write made under an Idempotency-Key, replayed to retries until it expires"""
+    __tablename__ = "idempotency_keys"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    key = Column(String(64), unique=True, index=True)  # sha256 of method, path and key
+    request_hash = Column(String(64))                   # sha256 of the request body
+    status_code = Column(Integer)
+    response = Column(JSON)
+    expires_at = Column(DateTime, index=True)
+
 # Create tables
 Base.metadata.create_all(bind=engine)
+search.install(engine)
+sync.install(engine)
+
+# ============================================================================
+# ANALYTICS ROLLUPS
+# ============================================================================
+
+ROLLUP_FIELDS = ("created_at", "material_type", "quantity", "r_value", "confidence")
+
+# Values per IN (...) lookup, under every database's bind parameter limit
+LOOKUP_BATCH = 500
+
+def rollup_values(takeoff: TakeoffDB, previous: bool = False):
+    """A takeoff's rollup fields, as they are or as they were before this flush"""
+    state = inspect(takeoff)
+    values = {}
+    for name in ROLLUP_FIELDS:
+        history = state.attrs[name].history
+        values[name] = history.deleted[0] if previous and history.deleted else getattr(takeoff, name)
+    return values
+
+def apply_rollups(session: Session, model, key_columns, deltas):
+    """
+    Add measure deltas to rollup rows, creating rows for new keys. The
+    addition happens in the database (sqft = sqft + excluded.sqft) in one
+    upsert, so concurrent writers add to each other's totals instead of
+    overwriting them.
+    """
+    if not deltas:
+        return
+    table = model.__table__
+    insert = (sqlite_insert if session.get_bind().dialect.name == "sqlite" else postgresql_insert)(table)
+    names = sorted({name for measures in deltas.values() for name in measures})
+    statement = insert.on_conflict_do_update(
+        index_elements=list(key_columns),
+        set_={name: table.c[name] + insert.excluded[name] for name in names}
+    )
+    # Keys in a fixed order, so two writers never lock the same rows in opposite orders
+    keys = sorted(deltas, key=lambda key: tuple(str(part) for part in key))
+    with session.no_autoflush:
+        session.execute(statement, [
+            dict(zip(key_columns, key), **{name: deltas[key].get(name, 0) for name in names}) for key in keys
+        ])
+
+@event.listens_for(SessionLocal, "before_flush")
+def maintain_rollups(session, flush_context, instances):
+    """Fold every ORM write to takeoffs and projects into the daily rollups"""
+    takeoffs, projects = [], []
+    for obj in session.new:
+        if isinstance(obj, TakeoffDB):
+            obj.created_at = obj.created_at or datetime.utcnow()
+            takeoffs.append(analytics.takeoff_contribution(rollup_values(obj)))
+        elif isinstance(obj, ProjectDB):
+            obj.date = obj.date or datetime.utcnow()
+            projects.append(analytics.project_contribution(obj.date))
+    for obj in session.deleted:
+        if isinstance(obj, TakeoffDB):
+            takeoffs.append(analytics.takeoff_contribution(rollup_values(obj, previous=True), -1))
+        elif isinstance(obj, ProjectDB):
+            projects.append(analytics.project_contribution(obj.date, -1))
+    for obj in session.dirty:
+        if isinstance(obj, TakeoffDB) and obj not in session.deleted:
+            old, new = rollup_values(obj, previous=True), rollup_values(obj)
+            if old != new:
+                takeoffs += [analytics.takeoff_contribution(old, -1), analytics.takeoff_contribution(new)]
+        elif isinstance(obj, ProjectDB) and obj not in session.deleted:
+            history = inspect(obj).attrs.date.history
+            if history.deleted and history.deleted[0] != obj.date:
+                projects += [analytics.project_contribution(history.deleted[0], -1), analytics.project_contribution(obj.date)]
+    if takeoffs:
+        apply_rollups(session, TakeoffRollupDB, ("day", "material_type"), analytics.combine(takeoffs))
+    if projects:
+        apply_rollups(session, ProjectRollupDB, ("day",), analytics.combine(projects))
+
+def backfill_rollups():
+    """Build the rollups from existing rows the first time they are created"""
+    db = SessionLocal()
+    try:
+        if db.query(TakeoffRollupDB.id).first() or db.query(ProjectRollupDB.id).first():
+            return
+        takeoffs = analytics.combine(
+            analytics.takeoff_contribution(dict(zip(ROLLUP_FIELDS, row)))
+            for row in db.query(*[getattr(TakeoffDB, name) for name in ROLLUP_FIELDS]).yield_per(10000)
+        )
+        projects = analytics.combine(
+            analytics.project_contribution(project_date) for (project_date,) in db.query(ProjectDB.date).yield_per(10000)
+        )
+        db.add_all([TakeoffRollupDB(day=key[0], material_type=key[1], **m) for key, m in takeoffs.items()])
+        db.add_all([ProjectRollupDB(day=key[0], **m) for key, m in projects.items()])
+        db.commit()
+        if takeoffs or projects:
+            logger.info(f"Backfilled analytics rollups: {len(takeoffs)} takeoff days, {len(projects)} project days")
+    finally:
+        db.close()
+
+backfill_rollups()
+
+# ============================================================================
+# ASSEMBLIES
+# ============================================================================
+
+# (assembly, r_value) -> assemblies.id, for committed rows only
+_assembly_ids = {}
+
+def assembly_ids(session: Session, pairs):
+    """
+    {(assembly, r_value): id} for assembly/R-value text pairs, parsing and
+    inserting rows for the ones not in the table yet. Blank values count
+    as "".
+    """
+    pending = session.info.setdefault("assembly_ids", {})
+    wanted = {(a or "", r or "") for a, r in pairs}
+    missing = [pair for pair in wanted if pair not in _assembly_ids and pair not in pending]
+    if missing:
+        insert = sqlite_insert if session.get_bind().dialect.name == "sqlite" else postgresql_insert
+        with session.no_autoflush:
+            session.execute(
+                insert(AssemblyDB.__table__).on_conflict_do_nothing(index_elements=["assembly", "r_value"]),
+                [dict(assemblies.parse(a, r), assembly=a, r_value=r) for a, r in missing]
+            )
+            names = sorted({a for a, _ in missing})
+            for i in range(0, len(names), LOOKUP_BATCH):
+                for assembly_id, a, r in session.query(AssemblyDB.id, AssemblyDB.assembly, AssemblyDB.r_value).filter(
+                    AssemblyDB.assembly.in_(names[i:i + LOOKUP_BATCH])
+                ):
+                    pending[(a, r)] = assembly_id
+    return {pair: _assembly_ids.get(pair) or pending[pair] for pair in wanted}
+
+@event.listens_for(SessionLocal, "before_flush")
+def link_assemblies(session, flush_context, instances):
+    """Point every new or re-specified takeoff at its parsed assembly row"""
+    takeoffs = [obj for obj in session.new if isinstance(obj, TakeoffDB)]
+    for obj in session.dirty:
+        if isinstance(obj, TakeoffDB) and obj not in session.deleted:
+            state = inspect(obj)
+            if state.attrs.assembly.history.has_changes() or state.attrs.r_value.history.has_changes():
+                takeoffs.append(obj)
+    if takeoffs:
+        ids = assembly_ids(session, [(t.assembly, t.r_value) for t in takeoffs])
+        for t in takeoffs:
+            t.assembly_id = ids[(t.assembly or "", t.r_value or "")]
+
+# Ids created in a transaction are shared only once it commits
+@event.listens_for(SessionLocal, "after_commit")
+def keep_assembly_ids(session):
+    _assembly_ids.update(session.info.pop("assembly_ids", {}))
+
+@event.listens_for(SessionLocal, "after_rollback")
+def drop_assembly_ids(session):
+    session.info.pop("assembly_ids", None)
+
+def backfill_assemblies():
+    """Link takeoffs without an assembly row (older rows) to theirs"""
+    db = SessionLocal()
+    try:
+        pairs = db.query(TakeoffDB.assembly, TakeoffDB.r_value).filter(TakeoffDB.assembly_id.is_(None)).distinct().all()
+        if not pairs:
+            return
+        for (a, r), assembly_id in assembly_ids(db, pairs).items():
+            db.query(TakeoffDB).filter(
+                TakeoffDB.assembly_id.is_(None),
+                func.coalesce(TakeoffDB.assembly, "") == a,
+                func.coalesce(TakeoffDB.r_value, "") == r
+            ).update({TakeoffDB.assembly_id: assembly_id}, synchronize_session=False)
+        db.commit()
+        logger.info(f"Linked takeoffs to {len(pairs)} parsed assemblies")
+    finally:
+        db.close()
+
+backfill_assemblies()
 
 # ============================================================================
 # PYDANTIC MODELS (API request/response)
@@ -132,6 +450,21 @@ class ProjectResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class ProjectListItem(ProjectResponse):
+    takeoff_count: int
+    materials: dict[str, float]  # total quantity per material type
+    avg_r_value: Optional[float] = None  # area-weighted over takeoffs with a known R-value
+
+class ProjectSearchHit(ProjectResponse):
+    score: float
+
+class ProjectSearchResponse(BaseModel):
+    query: str
+    total: int
+    limit: int
+    offset: int
+    results: list[ProjectSearchHit]
+
 class TakeoffItem(BaseModel):
     level: str
     wall_type: str
@@ -143,6 +476,7 @@ class TakeoffItem(BaseModel):
     perimeter_ft: float
     height_ft: float
     confidence: str = "GREEN"
+    deductions: Optional[dict] = None
     
     @validator('quantity', 'perimeter_ft', 'height_ft')
     def positive_numbers(cls, v):
@@ -170,15 +504,119 @@ class TakeoffResponse(BaseModel):
     perimeter_ft: float
     height_ft: float
     confidence: str
+    deductions: Optional[dict] = None
+    assembly_id: Optional[int] = None
+    created_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class FloorSpec(BaseModel):
+    level: str
+    height_ft: float
+    wall_type: str
+    assembly: str
+    r_value: str
+    material_type: str = "ccSPF"
+    page_number: Optional[int] = None
+    
+    @validator('height_ft')
+    def positive_height(cls, v):
+        if v <= 0:
+            raise ValueError('Floor height must be positive')
+        return v
+
+class TakeoffCalculation(BaseModel):
+    file_hash: str
+    floors: list[FloorSpec]
+
+class TakeoffCalculationResponse(BaseModel):
+    takeoffs: list[TakeoffResponse]
+    summary: dict
+    recalculated: list[str]  # levels whose rows were recomputed
+    changed: list[str]       # levels whose stored rows were written
+    failed_pages: dict[int, str] = {}  # plan page -> why extraction failed (its floors are RED)
+    seconds: float
+
+class ProjectDetailResponse(BaseModel):
+    project: ProjectResponse
+    takeoffs: list[TakeoffResponse]
+    summary: dict
+
+class RevisionCreate(BaseModel):
+    label: Optional[str] = None
+
+class RevisionResponse(BaseModel):
+    id: int
+    project_id: int
+    number: int
+    parent_id: Optional[int] = None
+    label: Optional[str] = None
+    name: str
+    notes: Optional[str] = None
+    status: str
+    takeoff_count: int
     created_at: datetime
     
     class Config:
         from_attributes = True
 
+class PlanPageResponse(BaseModel):
+    id: int
+    project_id: int
+    file_hash: str
+    page_number: int
+    sheet_number: Optional[str] = None
+    page_type: str
+    level: Optional[str] = None
+    title: Optional[str] = None
+    confidence: str
+    
+    class Config:
+        from_attributes = True
+
+class PlanIndexResponse(BaseModel):
+    file_hash: str
+    file_name: str
+    page_count: int
+    pages: list[PlanPageResponse]
+
 class SettingUpdate(BaseModel):
     key: str
     value: str
 
+class SettingResponse(BaseModel):
+    id: int
+    key: str
+    value: str
+    updated_at: datetime
+    
+    class Config:
+        from_attributes = True
+
+class AssemblyResponse(BaseModel):
+    id: int
+    assembly: str
+    r_value: str
+    framing: Optional[str] = None
+    framing_depth_in: Optional[float] = None
+    insulation: Optional[str] = None
+    thickness_in: Optional[float] = None
+    vapour_barrier: Optional[str] = None
+    vapour_barrier_mil: Optional[float] = None
+    r_value_number: Optional[float] = None
+    r_value_estimated: bool
+    layers: list[dict]
+    takeoffs: int
+    sqft: float
+
+class SyncResponse(BaseModel):
+    since: int
+    seq: int    # pass as `since` on the next sync
+    more: bool  # further changes are waiting; sync again right away
+    changes: dict[str, list[dict]]  # table -> current values of inserted/updated rows
+    deleted: dict[str, list[int]]   # table -> ids of deleted rows (tombstones)
+
 # ============================================================================
 # FASTAPI APP
 # ============================================================================
@@ -189,6 +627,17 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Admission control: per-route-class concurrency, queues and rate limits.
+# Added before CORS so shed requests still carry CORS headers
+admission_control = admission.AdmissionController()
+app.add_middleware(admission.AdmissionMiddleware, controller=admission_control)
+
+@app.on_event("startup")
+async def reserve_endpoint_threads():
+    """Make room in the sync endpoint thread pool for every route class's limit"""
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = max(limiter.total_tokens, admission_control.thread_demand())
+
 # CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -198,6 +647,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large responses (brotli or gzip, by Accept-Encoding)
+app.add_middleware(encoding.CompressionMiddleware, minimum_size=encoding.MINIMUM_SIZE)
+
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request, call_next):
@@ -217,13 +669,117 @@ def get_db():
     finally:
         db.close()
 
+# ============================================================================
+# IDEMPOTENCY KEYS
+# ============================================================================
+
+# Hours a write's response is replayed for retries with the same Idempotency-Key
+IDEMPOTENCY_TTL_HOURS = float(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+
+# Expired keys are purged at most this often (seconds)
+IDEMPOTENCY_PURGE_SECONDS = 300
+
+_last_idempotency_purge = 0.0
+
+class IdempotentWrite:
+    """
+    A write request that may carry an Idempotency-Key header.
+    
+        write = IdempotentWrite(request, idempotency_key, payload)
+        replay = write.replay(db)
+        if replay:
+            return replay
+        ...add rows and db.flush()...
+        write.remember(db, ProjectResponse, db_project)
+        replay = write.commit(db)
+    
+    The key row is committed in the same transaction as the write, so a
+    retry either replays the stored response or repeats a write that never
+    happened. Keys are scoped to the method and path; reusing one with a
+    different body is rejected with 422. Without a header every method is
+    a no-op and the write behaves as before.
+    """
+    
+    def __init__(self, request: Request, key: Optional[str], payload):
+        self.key = None
+        if key:
+            scope = f"{request.method} {request.url.path}\n{key}"
+            body = json.dumps(jsonable_encoder(payload), sort_keys=True, separators=(",", ":"))
+            self.key = hashlib.sha256(scope.encode()).hexdigest()
+            self.request_hash = hashlib.sha256(body.encode()).hexdigest()
+    
+    def replay(self, db: Session):
+        """The stored response for a retried key, or None"""
+        if not self.key:
+            return None
+        stored = db.query(IdempotencyKeyDB).filter(
+            IdempotencyKeyDB.key == self.key,
+            IdempotencyKeyDB.expires_at > datetime.utcnow()
+        ).first()
+        if stored is None:
+            return None
+        if stored.request_hash != self.request_hash:
+            raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+        logger.info(f"Replaying stored response for idempotency key {self.key[:12]}")
+        return JSONResponse(stored.response, status_code=stored.status_code, headers={"Idempotent-Replayed": "true"})
+    
+    def remember(self, db: Session, response_model, result, status_code=200):
+        """Store the response for `result` (flushed rows) alongside the write"""
+        global _last_idempotency_purge
+        if not self.key:
+            return
+        now = datetime.utcnow()
+        if isinstance(result, list):
+            response = [response_model.model_validate(item).model_dump(mode="json") for item in result]
+        else:
+            response = response_model.model_validate(result).model_dump(mode="json")
+        
+        expired = db.query(IdempotencyKeyDB).filter(IdempotencyKeyDB.expires_at <= now)
+        if time.monotonic() - _last_idempotency_purge > IDEMPOTENCY_PURGE_SECONDS:
+            _last_idempotency_purge = time.monotonic()
+            expired.delete(synchronize_session=False)
+        else:
+            expired.filter(IdempotencyKeyDB.key == self.key).delete(synchronize_session=False)
+        db.add(IdempotencyKeyDB(
+            key=self.key,
+            request_hash=self.request_hash,
+            status_code=status_code,
+            response=response,
+            expires_at=now + timedelta(hours=IDEMPOTENCY_TTL_HOURS)
+        ))
+    
+    def commit(self, db: Session):
+        """
+        Commit the write. If a concurrent request with the same key
+        committed first, roll back and return its response instead.
+        """
+        try:
+            db.commit()
+        except IntegrityError:
+            db.rollback()
+            replay = self.replay(db)
+            if replay is None:
+                raise
+            return replay
+        return None
+
 # ============================================================================
 # PROJECT ENDPOINTS
 # ============================================================================
 
 @app.post("/api/projects", response_model=ProjectResponse)
-def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
-    """Create a new project"""
+def create_project(
+    project: ProjectCreate,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Create a new project (retries with the same Idempotency-Key header replay the first response)"""
+    write = IdempotentWrite(request, idempotency_key, project)
+    replay = write.replay(db)
+    if replay:
+        return replay
+    
     try:
         db_project = ProjectDB(
             name=project.name,
@@ -232,7 +788,11 @@ def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
             status="draft"
         )
         db.add(db_project)
-        db.commit()
+        db.flush()
+        write.remember(db, ProjectResponse, db_project)
+        replay = write.commit(db)
+        if replay:
+            return replay
         db.refresh(db_project)
         logger.info(f"Created project: {db_project.id} - {db_project.name}")
         return db_project
@@ -241,11 +801,62 @@ def create_project(project: ProjectCreate, db: Session = Depends(get_db)):
         logger.error(f"Failed to create project: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to create project: {str(e)}")
 
-@app.get("/api/projects", response_model=list[ProjectResponse])
+@app.get("/api/projects", response_model=list[ProjectListItem])
 def list_projects(db: Session = Depends(get_db)):
-    """List all projects"""
-    projects = db.query(ProjectDB).order_by(ProjectDB.created_at.desc()).all()
-    return projects
+    """
+    List all projects with their takeoff count, quantity per material and
+    area-weighted R-value (numeric, from the parsed assemblies)
+    """
+    rated = AssemblyDB.r_value_number.isnot(None)
+    rows = db.query(
+        ProjectDB,
+        TakeoffDB.material_type,
+        func.count(TakeoffDB.id),
+        func.sum(TakeoffDB.quantity),
+        func.sum(case((rated, TakeoffDB.quantity * AssemblyDB.r_value_number), else_=0.0)),
+        func.sum(case((rated, TakeoffDB.quantity), else_=0.0))
+    ).outerjoin(TakeoffDB, TakeoffDB.project_id == ProjectDB.id).outerjoin(
+        AssemblyDB, AssemblyDB.id == TakeoffDB.assembly_id
+    ).group_by(
+        ProjectDB.id, TakeoffDB.material_type
+    ).order_by(ProjectDB.created_at.desc(), ProjectDB.id.desc()).all()
+    
+    # One row per (project, material); projects without takeoffs get one row of NULLs
+    listing = {}
+    for project, material_type, count, quantity, r_weighted, r_sqft in rows:
+        item = listing.setdefault(project.id, {"project": project, "takeoff_count": 0, "materials": {}, "r": [0.0, 0.0]})
+        item["takeoff_count"] += count
+        if count and material_type:
+            item["materials"][material_type] = round(quantity or 0.0, 1)
+        item["r"][0] += r_weighted or 0.0
+        item["r"][1] += r_sqft or 0.0
+    return [
+        ProjectListItem(
+            **ProjectResponse.model_validate(item["project"]).model_dump(),
+            takeoff_count=item["takeoff_count"],
+            materials=item["materials"],
+            avg_r_value=round(item["r"][0] / item["r"][1], 1) if item["r"][1] else None
+        )
+        for item in listing.values()
+    ]
+
+@app.get("/api/projects/search", response_model=ProjectSearchResponse)
+def search_projects(q: str, limit: int = Query(20, ge=1, le=100), offset: int = Query(0, ge=0),
+                    db: Session = Depends(get_db)):
+    """
+    Full-text search over project names, notes and takeoff levels, wall
+    types, materials and assemblies, best match first
+    """
+    total, hits = search.search(db, q, limit=limit, offset=offset)
+    projects = {
+        project.id: project
+        for project in db.query(ProjectDB).filter(ProjectDB.id.in_([project_id for project_id, _ in hits]))
+    } if hits else {}
+    results = [
+        ProjectSearchHit(**ProjectResponse.model_validate(projects[project_id]).model_dump(), score=round(score, 4))
+        for project_id, score in hits if project_id in projects
+    ]
+    return {"query": q, "total": total, "limit": limit, "offset": offset, "results": results}
 
 @app.get("/api/projects/{project_id}", response_model=ProjectResponse)
 def get_project(project_id: int, db: Session = Depends(get_db)):
@@ -255,6 +866,23 @@ def get_project(project_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Project not found")
     return project
 
+@app.get("/api/projects/{project_id}/full", response_model=ProjectDetailResponse)
+def get_project_full(project_id: int, db: Session = Depends(get_db)):
+    """A project, its takeoffs and their summary, loaded with one query"""
+    rows = db.query(ProjectDB, TakeoffDB).outerjoin(
+        TakeoffDB, TakeoffDB.project_id == ProjectDB.id
+    ).filter(ProjectDB.id == project_id).order_by(TakeoffDB.id).all()
+    if not rows:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    project = rows[0][0]
+    takeoffs = [t for _, t in rows if t is not None]
+    summary = takeoff_engine.summarize(*(
+        {name: getattr(t, name) for name in ("material_type", "quantity", "r_value", "confidence", "deductions")}
+        for t in takeoffs
+    ))
+    return {"project": project, "takeoffs": takeoffs, "summary": summary}
+
 @app.put("/api/projects/{project_id}", response_model=ProjectResponse)
 def update_project(project_id: int, project: ProjectCreate, db: Session = Depends(get_db)):
     """Update a project"""
@@ -288,8 +916,19 @@ def delete_project(project_id: int, db: Session = Depends(get_db)):
 # ============================================================================
 
 @app.post("/api/projects/{project_id}/takeoffs", response_model=TakeoffResponse)
-def create_takeoff(project_id: int, takeoff: TakeoffItem, db: Session = Depends(get_db)):
-    """Create a takeoff item for a project"""
+def create_takeoff(
+    project_id: int,
+    takeoff: TakeoffItem,
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Create a takeoff item for a project (retries with the same Idempotency-Key header replay the first response)"""
+    write = IdempotentWrite(request, idempotency_key, takeoff)
+    replay = write.replay(db)
+    if replay:
+        return replay
+    
     try:
         # Verify project exists
         project = db.query(ProjectDB).filter(ProjectDB.id == project_id).first()
@@ -308,10 +947,15 @@ def create_takeoff(project_id: int, takeoff: TakeoffItem, db: Session = Depends(
             r_value=takeoff.r_value,
             perimeter_ft=takeoff.perimeter_ft,
             height_ft=takeoff.height_ft,
-            confidence=takeoff.confidence
+            confidence=takeoff.confidence,
+            deductions=takeoff.deductions
         )
         db.add(db_takeoff)
-        db.commit()
+        db.flush()
+        write.remember(db, TakeoffResponse, db_takeoff)
+        replay = write.commit(db)
+        if replay:
+            return replay
         db.refresh(db_takeoff)
         logger.info(f"Created takeoff {db_takeoff.id} for project {project_id}")
         return db_takeoff
@@ -322,11 +966,143 @@ def create_takeoff(project_id: int, takeoff: TakeoffItem, db: Session = Depends(
         logger.error(f"Failed to create takeoff for project {project_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to create takeoff: {str(e)}")
 
+@app.post("/api/projects/{project_id}/takeoffs/batch", response_model=list[TakeoffResponse])
+def create_takeoffs(
+    project_id: int,
+    takeoffs: list[TakeoffItem],
+    request: Request,
+    idempotency_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """
+    Create several takeoff items for a project in one request and transaction.
+    Retries with the same Idempotency-Key header replay the first response.
+    """
+    write = IdempotentWrite(request, idempotency_key, takeoffs)
+    replay = write.replay(db)
+    if replay:
+        return replay
+    
+    project = db.query(ProjectDB).filter(ProjectDB.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    try:
+        db_takeoffs = [TakeoffDB(project_id=project_id, **takeoff.dict()) for takeoff in takeoffs]
+        db.add_all(db_takeoffs)
+        db.flush()
+        write.remember(db, TakeoffResponse, db_takeoffs)
+        replay = write.commit(db)
+        if replay:
+            return replay
+        for db_takeoff in db_takeoffs:
+            db.refresh(db_takeoff)
+        logger.info(f"Created {len(db_takeoffs)} takeoffs for project {project_id}")
+        return db_takeoffs
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Failed to create takeoffs for project {project_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to create takeoffs: {str(e)}")
+
+@app.post("/api/projects/{project_id}/takeoffs/calculate", response_model=TakeoffCalculationResponse)
+def calculate_takeoffs(project_id: int, calculation: TakeoffCalculation, db: Session = Depends(get_db)):
+    """
+    Calculate takeoffs for each floor from an uploaded plan set.
+    
+    Wall area is boundary perimeter x floor height less detected door and
+    window openings; the deduction breakdown is stored on each row.
+    Calculation is incremental: the plan set's extraction and boundaries
+    are cached, only floors whose inputs changed are recomputed, and only
+    rows whose values changed are written back. A calculated row replaces
+    the takeoff with the same level, wall type and material; other
+    takeoffs on the level (entered by hand or imported) are left alone.
+    """
+    started = time.perf_counter()
+    project = db.query(ProjectDB).filter(ProjectDB.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    plan_pages = db.query(PlanPageDB).filter(
+        PlanPageDB.project_id == project_id,
+        PlanPageDB.file_hash == calculation.file_hash
+    ).all()
+    path = os.path.join(UPLOAD_DIR, f"{calculation.file_hash}.pdf")
+    if not plan_pages or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Plan set not found")
+    
+    graph = plan_graph(project_id, calculation.file_hash, path, plan_pages)
+    try:
+        with graph.lock:
+            result = graph.update([floor.dict() for floor in calculation.floors])
+    except Exception as e:
+        logger.error(f"Takeoff calculation failed for project {project_id}: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Takeoff calculation failed: {str(e)}")
+    
+    existing = {}
+    for db_takeoff in db.query(TakeoffDB).filter(
+        TakeoffDB.project_id == project_id,
+        TakeoffDB.level.in_([floor.level for floor in calculation.floors])
+    ).order_by(TakeoffDB.id):
+        key = (db_takeoff.level, db_takeoff.wall_type, db_takeoff.material_type)
+        existing.setdefault(key, db_takeoff)
+    
+    db_takeoffs, changed = [], []
+    for row in result["takeoffs"]:
+        row = dict(row)
+        blob = row.pop("segments")
+        # JSON round trip so tuples and numpy scalars compare like stored values
+        row["deductions"] = json.loads(json.dumps(row["deductions"], default=float))
+        key = (row["level"], row["wall_type"], row["material_type"])
+        db_takeoff = existing.get(key) or TakeoffDB(project_id=project_id)
+        if db_takeoff.id is None or any(getattr(db_takeoff, k) != v for k, v in row.items()):
+            for key, value in row.items():
+                setattr(db_takeoff, key, value)
+            db.add(db_takeoff)
+            changed.append((db_takeoff, blob))
+        db_takeoffs.append(db_takeoff)
+    
+    rewritten = [db_takeoff.id for db_takeoff, _ in changed if db_takeoff.id is not None]
+    if rewritten:
+        db.query(TakeoffSegmentsDB).filter(TakeoffSegmentsDB.takeoff_id.in_(rewritten)).delete(synchronize_session=False)
+    db.flush()
+    db.add_all([
+        TakeoffSegmentsDB(
+            takeoff_id=db_takeoff.id,
+            project_id=project_id,
+            count=segment_store.unpack(blob)[1]["count"],
+            data=blob
+        )
+        for db_takeoff, blob in changed if blob
+    ])
+    db.commit()
+    for db_takeoff, _ in changed:
+        db.refresh(db_takeoff)
+    
+    seconds = time.perf_counter() - started
+    logger.info(
+        f"Calculated takeoffs for project {project_id}: {len(result['recalculated'])} recomputed, "
+        f"{len(changed)} written in {seconds * 1000:.0f}ms"
+    )
+    return TakeoffCalculationResponse(
+        takeoffs=db_takeoffs,
+        summary=result["summary"],
+        recalculated=result["recalculated"],
+        failed_pages=result["failed_pages"],
+        changed=[db_takeoff.level for db_takeoff, _ in changed],
+        seconds=round(seconds, 4)
+    )
+
 @app.get("/api/projects/{project_id}/takeoffs", response_model=list[TakeoffResponse])
-def list_takeoffs(project_id: int, db: Session = Depends(get_db)):
-    """List all takeoff items for a project"""
+def list_takeoffs(project_id: int, request: Request, db: Session = Depends(get_db)):
+    """
+    List all takeoff items for a project, as a streamed JSON array or, with
+    Accept: application/msgpack, as MessagePack
+    """
     takeoffs = db.query(TakeoffDB).filter(TakeoffDB.project_id == project_id).all()
-    return takeoffs
+    return encoding.list_response(
+        request.headers.get("accept"),
+        (TakeoffResponse.model_validate(t).model_dump(mode="json") for t in takeoffs)
+    )
 
 @app.delete("/api/projects/{project_id}/takeoffs/{takeoff_id}")
 def delete_takeoff(project_id: int, takeoff_id: int, db: Session = Depends(get_db)):
@@ -338,10 +1114,552 @@ def delete_takeoff(project_id: int, takeoff_id: int, db: Session = Depends(get_d
     if not db_takeoff:
         raise HTTPException(status_code=404, detail="Takeoff not found")
     
+    db.query(TakeoffSegmentsDB).filter(TakeoffSegmentsDB.takeoff_id == takeoff_id).delete()
     db.delete(db_takeoff)
     db.commit()
     return {"status": "deleted"}
 
+@app.get("/api/projects/{project_id}/segments")
+def list_takeoff_segments(project_id: int, takeoff_id: Optional[int] = None, db: Session = Depends(get_db)):
+    """
+    Per-edge geometry for a project's calculated takeoffs, as columns.
+    
+    Each column is a list with one entry per boundary edge; `takeoff_id`
+    says which takeoff row the edge belongs to.
+    """
+    query = db.query(TakeoffSegmentsDB.takeoff_id, TakeoffSegmentsDB.data).filter(
+        TakeoffSegmentsDB.project_id == project_id
+    )
+    if takeoff_id is not None:
+        query = query.filter(TakeoffSegmentsDB.takeoff_id == takeoff_id)
+    columns = segment_store.load(query.all())
+    columns["takeoff_id"] = columns.pop("owner")
+    return {
+        "count": len(columns["takeoff_id"]),
+        "columns": {name: values.tolist() for name, values in columns.items()}
+    }
+
+# ============================================================================
+# ASSEMBLY ENDPOINTS
+# ============================================================================
+
+@app.get("/api/assemblies", response_model=list[AssemblyResponse])
+def list_assemblies(project_id: Optional[int] = None, db: Session = Depends(get_db)):
+    """Parsed assemblies in use, with their takeoff count and square footage"""
+    query = db.query(AssemblyDB, func.count(TakeoffDB.id), func.coalesce(func.sum(TakeoffDB.quantity), 0.0)).join(
+        TakeoffDB, TakeoffDB.assembly_id == AssemblyDB.id
+    )
+    if project_id is not None:
+        query = query.filter(TakeoffDB.project_id == project_id)
+    rows = query.group_by(AssemblyDB.id).order_by(func.sum(TakeoffDB.quantity).desc()).all()
+    return [
+        {**{c.key: getattr(a, c.key) for c in AssemblyDB.__table__.columns}, "takeoffs": count, "sqft": round(sqft, 1)}
+        for a, count, sqft in rows
+    ]
+
+# ============================================================================
+# MATERIAL ORDER ENDPOINTS
+# ============================================================================
+
+# Takeoff columns behind material orders, with each row's parsed assembly
+ORDER_COLUMNS = [
+    TakeoffDB.project_id, TakeoffDB.level, TakeoffDB.material_type, TakeoffDB.quantity, TakeoffDB.perimeter_ft,
+    TakeoffDB.assembly_id, AssemblyDB.insulation, AssemblyDB.layers, AssemblyDB.r_value_number,
+    AssemblyDB.vapour_barrier, AssemblyDB.vapour_barrier_mil,
+]
+
+def material_orders(db: Session, projects, delivery_drums: int):
+    """Material roll-up for a project query, read in one pass over their takeoffs"""
+    names = dict(projects.with_entities(ProjectDB.id, ProjectDB.name).all())
+    rows = db.query(*ORDER_COLUMNS).outerjoin(AssemblyDB, AssemblyDB.id == TakeoffDB.assembly_id).filter(
+        TakeoffDB.project_id.in_(projects.with_entities(ProjectDB.id))
+    ).all()
+    columns = {column.key: [row[i] for row in rows] for i, column in enumerate(ORDER_COLUMNS)}
+    return materials.rollup(columns, names, delivery_drums)
+
+@app.get("/api/orders")
+def get_orders(status: list[str] = Query(["draft", "in_progress"]),
+               delivery_drums: int = Query(materials.DELIVERY_DRUMS, gt=0), db: Session = Depends(get_db)):
+    """
+    Purchasing roll-up: foam sets and drums, sealant tubes and poly rolls
+    for every project with one of the given statuses, phased per project
+    into deliveries of at most `delivery_drums` drums, with totals.
+    """
+    return material_orders(db, db.query(ProjectDB).filter(ProjectDB.status.in_(status)), delivery_drums)
+
+@app.get("/api/projects/{project_id}/orders")
+def get_project_orders(project_id: int, delivery_drums: int = Query(materials.DELIVERY_DRUMS, gt=0),
+                       db: Session = Depends(get_db)):
+    """Material orders for one project, per delivery phase (levels bottom to top)"""
+    projects = db.query(ProjectDB).filter(ProjectDB.id == project_id)
+    project = projects.first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    result = material_orders(db, projects, delivery_drums)
+    if result["projects"]:
+        return {"delivery_drums": delivery_drums, **result["projects"][0]}
+    return {"delivery_drums": delivery_drums, "project_id": project_id, "name": project.name,
+            "phases": [], "items": {}, "drums": 0, "loads": 0, "unsized": 0}
+
+# ============================================================================
+# REVISION ENDPOINTS
+# ============================================================================
+
+def revision_takeoffs(db: Session, revision: ProjectRevisionDB):
+    """
+    Takeoff snapshots in a revision: the signed counts along its chain,
+    summed in one grouped query.
+    """
+    chain = db.query(ProjectRevisionDB.id).filter(
+        ProjectRevisionDB.project_id == revision.project_id,
+        ProjectRevisionDB.number <= revision.number
+    )
+    counts = db.query(
+        RevisionTakeoffDB.version_id,
+        func.sum(RevisionTakeoffDB.count)
+    ).filter(
+        RevisionTakeoffDB.revision_id.in_(chain)
+    ).group_by(RevisionTakeoffDB.version_id).having(func.sum(RevisionTakeoffDB.count) > 0).all()
+    if not counts:
+        return {}
+    versions = db.query(TakeoffVersionDB).filter(TakeoffVersionDB.id.in_([v for v, _ in counts])).all()
+    by_id = {version.id: version for version in versions}
+    return {by_id[v].fingerprint: (by_id[v].data, int(n)) for v, n in counts}
+
+def get_revision(db: Session, project_id: int, number: int):
+    revision = db.query(ProjectRevisionDB).filter(
+        ProjectRevisionDB.project_id == project_id,
+        ProjectRevisionDB.number == number
+    ).first()
+    if not revision:
+        raise HTTPException(status_code=404, detail=f"Revision {number} not found")
+    return revision
+
+def expand(takeoffs):
+    """Snapshot list from {fingerprint: (data, count)}, ordered by level"""
+    rows = [data for data, count in takeoffs.values() for _ in range(count)]
+    return sorted(rows, key=lambda row: (row["level"] or "", row["wall_type"] or ""))
+
+@app.post("/api/projects/{project_id}/revisions", response_model=RevisionResponse)
+def create_revision(project_id: int, revision: RevisionCreate, db: Session = Depends(get_db)):
+    """
+    Snapshot the project and its current takeoffs as a new revision.
+    
+    Only takeoff rows that differ from the previous revision are stored.
+    """
+    project = db.query(ProjectDB).filter(ProjectDB.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    parent = db.query(ProjectRevisionDB).filter(
+        ProjectRevisionDB.project_id == project_id
+    ).order_by(ProjectRevisionDB.number.desc()).first()
+    previous = revision_takeoffs(db, parent) if parent else {}
+    
+    current = {}
+    for takeoff in db.query(TakeoffDB).filter(TakeoffDB.project_id == project_id):
+        values = revisions.snapshot(takeoff)
+        key = revisions.fingerprint(values)
+        current[key] = (values, current[key][1] + 1 if key in current else 1)
+    delta = revisions.changes(
+        {key: count for key, (_, count) in previous.items()},
+        {key: count for key, (_, count) in current.items()}
+    )
+    
+    version_ids = dict(db.query(TakeoffVersionDB.fingerprint, TakeoffVersionDB.id).filter(
+        TakeoffVersionDB.fingerprint.in_(list(delta))
+    ).all()) if delta else {}
+    new_versions = [
+        TakeoffVersionDB(fingerprint=key, data=current[key][0])
+        for key in delta if key not in version_ids
+    ]
+    db.add_all(new_versions)
+    db.flush()
+    version_ids.update({version.fingerprint: version.id for version in new_versions})
+    
+    db_revision = ProjectRevisionDB(
+        project_id=project_id,
+        number=parent.number + 1 if parent else 1,
+        parent_id=parent.id if parent else None,
+        label=revision.label,
+        name=project.name,
+        notes=project.notes,
+        status=project.status,
+        takeoff_count=sum(count for _, count in current.values())
+    )
+    db.add(db_revision)
+    db.flush()
+    db.add_all([
+        RevisionTakeoffDB(revision_id=db_revision.id, version_id=version_ids[key], count=count)
+        for key, count in delta.items()
+    ])
+    db.commit()
+    db.refresh(db_revision)
+    logger.info(
+        f"Created revision {db_revision.number} for project {project_id}: "
+        f"{db_revision.takeoff_count} takeoffs, {len(delta)} changed, {len(new_versions)} new versions"
+    )
+    return db_revision
+
+@app.get("/api/projects/{project_id}/revisions", response_model=list[RevisionResponse])
+def list_revisions(project_id: int, db: Session = Depends(get_db)):
+    """List a project's revisions, oldest first"""
+    return db.query(ProjectRevisionDB).filter(
+        ProjectRevisionDB.project_id == project_id
+    ).order_by(ProjectRevisionDB.number).all()
+
+@app.get("/api/projects/{project_id}/revisions/diff")
+def diff_revisions(project_id: int, base: int, head: Optional[int] = None, db: Session = Depends(get_db)):
+    """
+    Quantity deltas between two revisions by level and material.
+    
+    Without `head`, the base revision is compared with the project's
+    current takeoffs.
+    """
+    base_rows = expand(revision_takeoffs(db, get_revision(db, project_id, base)))
+    if head is None:
+        head_rows = [
+            revisions.snapshot(takeoff)
+            for takeoff in db.query(TakeoffDB).filter(TakeoffDB.project_id == project_id)
+        ]
+    else:
+        head_rows = expand(revision_takeoffs(db, get_revision(db, project_id, head)))
+    return {"base": base, "head": head, **revisions.diff(base_rows, head_rows)}
+
+@app.get("/api/projects/{project_id}/revisions/{number}/takeoffs")
+def list_revision_takeoffs(project_id: int, number: int, request: Request, db: Session = Depends(get_db)):
+    """Takeoff rows as they stood in a revision (JSON, or MessagePack by Accept header)"""
+    rows = expand(revision_takeoffs(db, get_revision(db, project_id, number)))
+    return encoding.list_response(request.headers.get("accept"), jsonable_encoder(rows))
+
+# ============================================================================
+# PLAN SET ENDPOINTS
+# ============================================================================
+
+# PDF parsing runs in supervised worker processes, never in the API process
+extraction_pool = workers.WorkerPool()
+
+@app.on_event("shutdown")
+def stop_extraction_workers():
+    extraction_pool.shutdown()
+
+def save_upload(upload: UploadFile):
+    """
+    Stream an upload into UPLOAD_DIR, named by its SHA-256; returns (hash,
+    path, created), where created is False if the same file was already
+    stored
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    digest = hashlib.sha256()
+    with tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, suffix=".part", delete=False) as tmp:
+        for chunk in iter(lambda: upload.file.read(1024 * 1024), b""):
+            digest.update(chunk)
+            tmp.write(chunk)
+    file_hash = digest.hexdigest()
+    path = os.path.join(UPLOAD_DIR, f"{file_hash}.pdf")
+    created = not os.path.exists(path)
+    os.replace(tmp.name, path)
+    return file_hash, path, created
+
+@app.post("/api/projects/{project_id}/plans", response_model=PlanIndexResponse)
+def upload_plans(project_id: int, file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """Upload a plan set PDF and build its page index"""
+    project = db.query(ProjectDB).filter(ProjectDB.id == project_id).first()
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    file_hash, path, created = save_upload(file)
+    
+    # Re-uploading the same file reuses the stored index
+    pages = db.query(PlanPageDB).filter(
+        PlanPageDB.project_id == project_id,
+        PlanPageDB.file_hash == file_hash
+    ).order_by(PlanPageDB.page_number).all()
+    
+    if not pages:
+        try:
+            index = extraction_pool.run(page_index.build_index, path, description=f"index {file.filename}")
+        except Exception as e:
+            # The file is shared by hash: remove it only if this request added it and nothing uses it
+            if created and not db.query(PlanPageDB.id).filter(PlanPageDB.file_hash == file_hash).first():
+                with contextlib.suppress(FileNotFoundError):
+                    os.remove(path)
+            logger.error(f"Failed to index plan set for project {project_id}: {str(e)}")
+            raise HTTPException(status_code=400, detail=f"Could not read PDF: {str(e)}")
+        
+        pages = [
+            PlanPageDB(
+                project_id=project_id,
+                file_hash=file_hash,
+                file_name=file.filename,
+                page_number=entry["page_number"],
+                sheet_number=entry["sheet_number"],
+                page_type=entry["page_type"],
+                level=entry["level"],
+                title=entry["title"],
+                confidence=entry["confidence"],
+                features=entry["features"]
+            )
+            for entry in index
+        ]
+        db.add_all(pages)
+        db.commit()
+        logger.info(f"Indexed {len(pages)} pages of {file.filename} for project {project_id}")
+    
+    return {
+        "file_hash": file_hash,
+        "file_name": file.filename,
+        "page_count": len(pages),
+        "pages": pages
+    }
+
+@app.get("/api/projects/{project_id}/pages", response_model=list[PlanPageResponse])
+def list_plan_pages(project_id: int, page_type: Optional[str] = None, file_hash: Optional[str] = None,
+                    db: Session = Depends(get_db)):
+    """List indexed plan pages for a project, optionally filtered by type or file"""
+    query = db.query(PlanPageDB).filter(PlanPageDB.project_id == project_id)
+    if page_type:
+        query = query.filter(PlanPageDB.page_type == page_type)
+    if file_hash:
+        query = query.filter(PlanPageDB.file_hash == file_hash)
+    return query.order_by(PlanPageDB.file_hash, PlanPageDB.page_number).all()
+
+# Rendered plan tiles, cached next to the uploads
+tile_cache = tiles.TileCache(os.path.join(UPLOAD_DIR, "tiles"))
+
+def plan_graph(project_id: int, file_hash: str, path: str, plan_pages):
+    """The cached takeoff graph for a project's plan set"""
+    return takeoff_engine.graph_for(
+        (project_id, file_hash),
+        path,
+        [{"page_number": p.page_number, "page_type": p.page_type, "level": p.level} for p in plan_pages],
+        extraction_pool
+    )
+
+def plan_page(db: Session, project_id: int, file_hash: str, page_number: int):
+    """(indexed pages of the plan set, PDF path) for one of its pages; 404 if any is missing"""
+    plan_pages = db.query(PlanPageDB).filter(
+        PlanPageDB.project_id == project_id,
+        PlanPageDB.file_hash == file_hash
+    ).all()
+    path = os.path.join(UPLOAD_DIR, f"{file_hash}.pdf")
+    if not plan_pages or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Plan set not found")
+    if page_number not in {p.page_number for p in plan_pages}:
+        raise HTTPException(status_code=404, detail="Page not found")
+    return plan_pages, path
+
+@app.get("/api/projects/{project_id}/plans/{file_hash}/pages/{page_number}/tiles")
+def get_tile_pyramid(project_id: int, file_hash: str, page_number: int, db: Session = Depends(get_db)):
+    """Page size (points) and the zoom levels and tile grid of its tile pyramid"""
+    _, path = plan_page(db, project_id, file_hash, page_number)
+    width, height = tiles.page_size(path, page_number)
+    return tiles.pyramid(width, height)
+
+@app.get("/api/projects/{project_id}/plans/{file_hash}/pages/{page_number}/tiles/{zoom}/{x}/{y}.png")
+def get_tile(project_id: int, file_hash: str, page_number: int, zoom: int, x: int, y: int,
+             db: Session = Depends(get_db)):
+    """
+    One TILE_PX square PNG tile of a plan page, rendered on first request
+    and served from the disk cache after that
+    """
+    _, path = plan_page(db, project_id, file_hash, page_number)
+    try:
+        data = tile_cache.tile(path, file_hash, page_number, zoom, x, y)
+    except ValueError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    # A plan set is stored by content hash, so its tiles never change
+    return Response(data, media_type="image/png", headers={"Cache-Control": "public, max-age=31536000, immutable"})
+
+def page_boundary(db: Session, project_id: int, file_hash: str, page_number: int):
+    """(extracted page, boundary) for a plan page, from the plan set's takeoff graph"""
+    plan_pages, path = plan_page(db, project_id, file_hash, page_number)
+    graph = plan_graph(project_id, file_hash, path, plan_pages)
+    try:
+        with graph.lock:
+            return graph.boundary(page_number)
+    except Exception as e:
+        logger.error(f"Boundary extraction failed for {file_hash} page {page_number}: {str(e)}")
+        raise HTTPException(status_code=400, detail=f"Boundary extraction failed: {str(e)}")
+
+@app.get("/api/projects/{project_id}/plans/{file_hash}/pages/{page_number}/boundary.geojson")
+def get_boundary_geojson(project_id: int, file_hash: str, page_number: int, db: Session = Depends(get_db)):
+    """The page's traced building boundary as GeoJSON in page points (top-left origin)"""
+    page, result = page_boundary(db, project_id, file_hash, page_number)
+    return JSONResponse(
+        tiles.boundary_geojson(page_number, page["width"], page["height"], result),
+        media_type="application/geo+json"
+    )
+
+@app.get("/api/projects/{project_id}/plans/{file_hash}/pages/{page_number}/boundary.svg")
+def get_boundary_svg(project_id: int, file_hash: str, page_number: int, db: Session = Depends(get_db)):
+    """The page's traced building boundary as an SVG layer the size of the page"""
+    page, result = page_boundary(db, project_id, file_hash, page_number)
+    return Response(tiles.boundary_svg(page["width"], page["height"], result), media_type="image/svg+xml")
+
+@app.get("/api/extraction/status")
+def extraction_status():
+    """
+    Extraction worker pool: each worker's state, task count and current
+    and peak resident memory, queue length, completed/failed/recycled
+    counts, tasks killed for memory or time, and recent failures.
+    """
+    return extraction_pool.status()
+
+# ============================================================================
+# IMPORT ENDPOINTS
+# ============================================================================
+
+# Rejected rows listed in an import response (all of them are counted)
+MAX_IMPORT_ERRORS = 1000
+
+def project_ids_by_name(db: Session, names):
+    ids = {}
+    for i in range(0, len(names), LOOKUP_BATCH):
+        batch = names[i:i + LOOKUP_BATCH]
+        for project_id, name in db.query(ProjectDB.id, ProjectDB.name).filter(ProjectDB.name.in_(batch)).order_by(ProjectDB.id):
+            ids.setdefault(name, project_id)
+    return ids
+
+def import_takeoffs(db: Session, stream, filename: str, max_errors: Optional[int] = MAX_IMPORT_ERRORS):
+    """
+    Import a spreadsheet of takeoffs (see importer.py), one committed
+    bulk insert per chunk of rows.
+    
+    Rows name their project; a name that matches an existing project adds
+    to it, otherwise the project is created from its first row's date and
+    notes. Takeoffs without a created_at are dated with their project date
+    so analytics place them where they happened. Rollups and the search
+    index are brought up to date once per chunk rather than per row.
+    """
+    result = {"rows": 0, "imported": 0, "projects_created": 0, "error_count": 0, "errors": []}
+    known = {}
+    
+    for first_line, columns in importer.read_chunks(stream, filename):
+        valid, errors = importer.validate(first_line, columns)
+        result["rows"] += int((~columns["_blank"]).sum())
+        result["error_count"] += len(errors)
+        room = len(errors) if max_errors is None else max(0, max_errors - len(result["errors"]))
+        result["errors"].extend(errors[:room])
+        if not len(valid["line"]):
+            continue
+        
+        with search.deferred(db.connection()) as touched:
+            now = np.datetime64(datetime.utcnow(), "s")
+            names, first, inverse = np.unique(valid["project"], return_index=True, return_inverse=True)
+            unknown = [name for name in names.tolist() if name not in known]
+            known.update(project_ids_by_name(db, unknown))
+            new = [i for name, i in zip(names.tolist(), first) if name not in known]
+            if new:
+                new = np.array(new)
+                dates = valid["project_date"][new]
+                dates = np.where(np.isnat(dates), now, dates)
+                stamp = importer.timestamps(np.full(len(new), now))
+                importer.bulk_insert(db.connection(), "projects", ("name", "date", "notes", "status", "created_at", "updated_at"), list(zip(
+                    valid["project"][new].tolist(), importer.timestamps(dates).tolist(),
+                    valid["project_notes"][new].tolist(), ["complete"] * len(new), stamp.tolist(), stamp.tolist()
+                )))
+                known.update(project_ids_by_name(db, valid["project"][new].tolist()))
+                apply_rollups(db, ProjectRollupDB, ("day",), analytics.combine(
+                    analytics.project_contribution(d) for d in dates.astype("datetime64[D]").tolist()
+                ))
+                result["projects_created"] += len(new)
+            
+            created = np.where(np.isnat(valid["created_at"]), valid["project_date"], valid["created_at"])
+            created = np.where(np.isnat(created), now, created)
+            project_id = np.array([known[name] for name in names.tolist()])[inverse]
+            pairs, pair_index = np.unique(
+                np.char.add(np.char.add(valid["assembly"].astype(str), "\x1f"), valid["r_value"].astype(str)),
+                return_inverse=True
+            )
+            pairs = [tuple(pair.split("\x1f", 1)) for pair in pairs.tolist()]
+            ids = assembly_ids(db, pairs)
+            assembly_id = np.array([ids[pair] for pair in pairs])[pair_index]
+            importer.bulk_insert(db.connection(), "takeoffs", (
+                "project_id", "level", "wall_type", "material_type", "quantity", "unit", "assembly",
+                "r_value", "perimeter_ft", "height_ft", "confidence", "assembly_id", "created_at"
+            ), list(zip(
+                project_id.tolist(), valid["level"].tolist(), valid["wall_type"].tolist(),
+                valid["material_type"].tolist(), valid["quantity"].tolist(), valid["unit"].tolist(),
+                valid["assembly"].tolist(), valid["r_value"].tolist(), valid["perimeter_ft"].tolist(),
+                valid["height_ft"].tolist(), valid["confidence"].tolist(), assembly_id.tolist(),
+                importer.timestamps(created).tolist()
+            )))
+            apply_rollups(db, TakeoffRollupDB, ("day", "material_type"), analytics.takeoff_rollups(
+                created, valid["material_type"], valid["quantity"], valid["r_value"], valid["confidence"]
+            ))
+            touched.update(project_id.tolist())
+        db.commit()
+        result["imported"] += len(valid["line"])
+        logger.info(f"Imported {result['imported']} of {result['rows']} rows from {filename}")
+    
+    return result
+
+@app.post("/api/import")
+def import_spreadsheet(file: UploadFile = File(...), db: Session = Depends(get_db)):
+    """
+    Import historical takeoffs from a CSV or XLSX file (one takeoff per
+    row). Invalid rows are skipped and reported by line number.
+    """
+    try:
+        return import_takeoffs(db, file.file, file.filename or "")
+    except ValueError as e:
+        db.rollback()
+        raise HTTPException(status_code=400, detail=str(e))
+
+def store_plan_set(db: Session, path: str, file_hash: str, index, rows, name: str, notes: str = ""):
+    """
+    Write a plan set processed outside the API (see batch.py) as a new
+    project: its page index and one takeoff per floor with the floor's
+    segments, each table in one multi-row insert, committed together. The
+    PDF is copied into UPLOAD_DIR so tiles and recalculation work as for
+    an upload. Returns the project id.
+    """
+    stored = os.path.join(UPLOAD_DIR, f"{file_hash}.pdf")
+    if not os.path.exists(stored):
+        os.makedirs(UPLOAD_DIR, exist_ok=True)
+        with tempfile.NamedTemporaryFile(dir=UPLOAD_DIR, suffix=".part", delete=False) as tmp:
+            with open(path, "rb") as source:
+                shutil.copyfileobj(source, tmp)
+        os.replace(tmp.name, stored)
+    
+    now = datetime.utcnow()
+    project = ProjectDB(name=name, notes=notes, date=now)
+    db.add(project)
+    db.flush()
+    with search.deferred(db.connection()) as touched:
+        db.execute(PlanPageDB.__table__.insert(), [
+            dict(project_id=project.id, file_hash=file_hash, file_name=os.path.basename(path),
+                 created_at=now, **{key: entry[key] for key in (
+                     "page_number", "sheet_number", "page_type", "level", "title", "confidence", "features"
+                 )})
+            for entry in index
+        ])
+        if rows:
+            ids = assembly_ids(db, [(row["assembly"], row["r_value"]) for row in rows])
+            takeoff_ids = db.execute(TakeoffDB.__table__.insert().returning(
+                TakeoffDB.id, sort_by_parameter_order=True
+            ), [
+                dict({key: value for key, value in row.items() if key != "segments"}, project_id=project.id,
+                     assembly_id=ids[(row["assembly"] or "", row["r_value"] or "")], created_at=now)
+                for row in rows
+            ]).scalars().all()
+            segments = [
+                dict(takeoff_id=takeoff_id, project_id=project.id, data=row["segments"], created_at=now,
+                     count=segment_store.unpack(row["segments"])[1]["count"])
+                for takeoff_id, row in zip(takeoff_ids, rows) if row["segments"]
+            ]
+            if segments:
+                db.execute(TakeoffSegmentsDB.__table__.insert(), segments)
+            apply_rollups(db, TakeoffRollupDB, ("day", "material_type"), analytics.takeoff_rollups(
+                np.full(len(rows), np.datetime64(now, "s")), [row["material_type"] for row in rows],
+                np.array([row["quantity"] for row in rows], dtype=float),
+                [row["r_value"] for row in rows], [row["confidence"] for row in rows]
+            ))
+        touched.add(project.id)
+    db.commit()
+    return project.id
+
 # ============================================================================
 # SETTINGS ENDPOINTS
 # ============================================================================
@@ -369,6 +1687,55 @@ def get_setting(key: str, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Setting not found")
     return {"key": setting.key, "value": setting.value}
 
+# ============================================================================
+# SYNC ENDPOINTS
+# ============================================================================
+
+# Synced table -> (model, response schema)
+SYNC_MODELS = {
+    "projects": (ProjectDB, ProjectResponse),
+    "takeoffs": (TakeoffDB, TakeoffResponse),
+    "settings": (SettingsDB, SettingResponse),
+}
+
+@app.get("/api/sync", response_model=SyncResponse)
+def sync_changes(
+    since: int = Query(0, ge=0),
+    limit: int = Query(sync.MAX_CHANGES, ge=1, le=sync.MAX_CHANGES),
+    db: Session = Depends(get_db)
+):
+    """
+    Projects, takeoffs and settings inserted, updated or deleted after
+    sequence number `since`.
+    
+    Start with since=0 for a full copy, then pass back the returned `seq`
+    each time. Each changed row appears once with its current values,
+    however often it changed; deleted rows appear only as ids in `deleted`.
+    While `more` is true, sync again from the new `seq`.
+    """
+    entries, more = sync.changes(db, since, limit)
+    changed = {table: [] for table in sync.TABLES}
+    deleted = {table: [] for table in sync.TABLES}
+    for _, table, row_id, is_deleted in entries:
+        (deleted if is_deleted else changed)[table].append(row_id)
+    
+    changes = {}
+    for table, (model, schema) in SYNC_MODELS.items():
+        ids = changed[table]
+        rows = []
+        for i in range(0, len(ids), LOOKUP_BATCH):
+            rows += db.query(model).filter(model.id.in_(ids[i:i + LOOKUP_BATCH])).all()
+        # A row deleted after the log was read is skipped; its tombstone comes next sync
+        changes[table] = [schema.model_validate(row).model_dump(mode="json") for row in rows]
+    
+    return {
+        "since": since,
+        "seq": entries[-1][0] if entries else since,
+        "more": more,
+        "changes": changes,
+        "deleted": deleted
+    }
+
 # ============================================================================
 # STATS ENDPOINTS (Real data from database)
 # ============================================================================
@@ -414,29 +1781,165 @@ def get_stats(db: Session = Depends(get_db)):
         logger.error(f"Failed to retrieve stats: {str(e)}")
         raise HTTPException(status_code=500, detail="Failed to retrieve stats")
 
+@app.get("/api/analytics")
+def get_analytics(period: str = "month", start: Optional[date] = None, end: Optional[date] = None,
+                  material: Optional[str] = None, db: Session = Depends(get_db)):
+    """
+    Takeoff square footage, average R-value (area weighted), RED-confidence
+    rate and project counts per day, week or month, read from the daily
+    rollups. Takeoffs are bucketed by creation date, projects by project
+    date. With `material`, takeoff figures cover that material only.
+    """
+    if period not in analytics.PERIODS:
+        raise HTTPException(status_code=400, detail=f"Period must be one of {list(analytics.PERIODS)}")
+    
+    takeoff_rows = db.query(
+        TakeoffRollupDB.day, TakeoffRollupDB.material_type, TakeoffRollupDB.takeoffs, TakeoffRollupDB.sqft,
+        TakeoffRollupDB.r_weighted, TakeoffRollupDB.r_sqft, TakeoffRollupDB.red
+    )
+    project_rows = db.query(ProjectRollupDB.day, ProjectRollupDB.projects)
+    if start:
+        takeoff_rows = takeoff_rows.filter(TakeoffRollupDB.day >= start)
+        project_rows = project_rows.filter(ProjectRollupDB.day >= start)
+    if end:
+        takeoff_rows = takeoff_rows.filter(TakeoffRollupDB.day <= end)
+        project_rows = project_rows.filter(ProjectRollupDB.day <= end)
+    
+    buckets, totals = analytics.series(takeoff_rows.all(), project_rows.all(), period, material)
+    return {
+        "period": period,
+        "material": material,
+        "buckets": buckets,
+        "totals": totals
+    }
+
 # ============================================================================
 # HEALTH CHECK
 # ============================================================================
 
-@app.get("/health")
-def health_check(db: Session = Depends(get_db)):
-    """Health check endpoint with database verification"""
+# Run warmup at startup: pool connections, settings, the PDF stack
+WARMUP = os.getenv("WARMUP", "1") == "1"
+
+# Also start the extraction workers during warmup (they otherwise start on first use)
+WARMUP_EXTRACTION = os.getenv("WARMUP_EXTRACTION", "0") == "1"
+
+# Pool connections opened by warmup
+WARMUP_CONNECTIONS = int(os.getenv("WARMUP_CONNECTIONS", "5"))
+
+# Free space (MB) under UPLOAD_DIR below which caches report degraded
+MIN_FREE_DISK_MB = int(os.getenv("MIN_FREE_DISK_MB", "1024"))
+
+# Database checks use their own unpooled connection, never one real traffic is waiting for
+probe_engine = create_engine(engine.url, poolclass=NullPool)
+
+def check_database():
+    with probe_engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+    return "ok", {"dialect": engine.dialect.name}
+
+def check_pool():
+    pool = engine.pool
+    if not hasattr(pool, "checkedout"):
+        return "ok", {"pool": pool.status()}
+    details = {"size": pool.size(), "checked_out": pool.checkedout(), "idle": pool.checkedin(),
+               "overflow": max(0, pool.overflow())}
+    # Every connection in use and overflow in play: requests may be waiting for one
+    exhausted = details["idle"] == 0 and details["checked_out"] >= details["size"] and details["overflow"] > 0
+    return ("degraded" if exhausted else "ok"), details
+
+def check_jobs():
+    status = extraction_pool.status()
+    details = {key: status[key] for key in ("queued", "busy", "completed", "failed", "killed_memory",
+                                            "killed_timeout", "crashed", "peak_rss_mb")}
+    details["workers"] = len(status["workers"])
+    # A backlog with every worker busy means extraction requests are waiting
+    backlogged = status["queued"] > 0 and status["busy"] == len(status["workers"])
+    return ("degraded" if backlogged else "ok"), details
+
+def check_caches():
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    free_mb = shutil.disk_usage(UPLOAD_DIR).free / 2 ** 20
+    details = {"tiles": tile_cache.status(), "takeoff_graphs": takeoff_engine.cache_status(),
+               "free_disk_mb": round(free_mb)}
+    return ("degraded" if free_mb < MIN_FREE_DISK_MB else "ok"), details
+
+def warm_connections():
+    connections = [engine.connect() for _ in range(WARMUP_CONNECTIONS)]
+    for connection in connections:
+        connection.execute(text("SELECT 1"))
+        connection.close()  # back to the pool, still open
+    return f"{len(connections)} connections"
+
+def warm_queries():
+    db = SessionLocal()
     try:
-        # Verify database connection
-        db.execute("SELECT 1")
+        settings = db.query(SettingsDB).all()
+        db.query(ProjectDB).order_by(ProjectDB.created_at.desc()).limit(1).all()
+        db.query(TakeoffDB).filter(TakeoffDB.project_id == 0).all()
+    finally:
+        db.close()
+    return f"{len(settings)} settings"
+
+warmup_steps = [("connections", warm_connections), ("queries", warm_queries), ("pdf", health.warm_pdf_stack)]
+if WARMUP_EXTRACTION:
+    warmup_steps.append(("extraction_workers", extraction_pool.start))
+warmup = health.Warmup(warmup_steps)
+
+readiness = health.ReadinessMonitor({
+    "database": check_database,
+    "pool": check_pool,
+    "jobs": check_jobs,
+    "caches": check_caches,
+    "warmup": warmup.check,
+})
+
+@app.on_event("startup")
+def start_health_checks():
+    if WARMUP:
+        warmup.start()
+    readiness.start()
+
+@app.on_event("shutdown")
+def stop_health_checks():
+    readiness.stop()
+
+@app.get("/health/live")
+def liveness():
+    """The process is up and serving requests; checks nothing else"""
+    return {"status": "alive"}
+
+@app.get("/health/ready")
+def readiness_check():
+    """Cached readiness (see health.ReadinessMonitor); 503 until ready"""
+    snapshot = readiness.snapshot()
+    return JSONResponse(jsonable_encoder(snapshot), status_code=200 if snapshot["ready"] else 503)
+
+@app.get("/health")
+def health_check():
+    """Health check with the database state from the last readiness run"""
+    snapshot = readiness.snapshot()
+    database = snapshot["checks"].get("database")
+    if database is None:
+        db_status = "unknown"
+    elif database["state"] == "ok":
         db_status = "connected"
-    except Exception as e:
-        logger.error(f"Database health check failed: {str(e)}")
-        db_status = f"error: {str(e)}"
+    else:
+        db_status = f"error: {database.get('error')}"
     
     return {
         "status": "healthy",
+        "ready": snapshot["ready"],
         "timestamp": datetime.utcnow().isoformat(),
         "service": "EcoSeal Takeoff API",
         "database": db_status,
         "version": "1.0.0"
     }
 
+@app.get("/health/admission")
+def admission_status():
+    """Per route class: limits, requests active and waiting, smoothed latency, and shed counts"""
+    return admission_control.status()
+
 # ============================================================================
 # ROOT
 # ============================================================================
@@ -0,0 +1,267 @@
+"""
+EcoSeal Takeoff System - Material Orders
+Purchase quantities per delivery phase from takeoff square footage
+
+Takeoff rows become material demand through yield tables: spray foam in
+sets (an A and a B drum) from board-feet at the pass thickness it is
+sprayed in, sealant tubes from the plate lines of walls behind a vapour
+barrier, and poly rolls from barrier area plus lap. Demand is summed per
+project and level in one vectorized pass over every row in the roll-up,
+so a weekly order across hundreds of projects is a handful of numpy
+operations plus a short loop per project.
+
+Levels are delivered bottom to top in phases. A phase takes consecutive
+levels while its drums fit on one delivery; whole units are ordered
+against cumulative demand, so part-used drums, tubes and rolls carry on
+to the next phase instead of being rounded up on every level.
+"""
+
+import math
+import os
+import re
+
+import numpy as np
+
+from assemblies import INSULATION
+
+# Spray foam yield: board-feet per set (one A + one B drum) by pass
+# thickness in inches; thin passes run cooler and yield less
+SPF_YIELD = {
+    "ccSPF": ((0.5, 1.0, 1.5, 2.0), (3600.0, 4200.0, 4500.0, 4700.0)),
+    "ocSPF": ((2.0, 3.5, 5.5), (14000.0, 16000.0, 17000.0)),
+}
+
+# Thickest single pass per foam, in inches; thicker layers take several passes
+SPF_MAX_PASS_IN = {"ccSPF": 2.0, "ocSPF": 5.5}
+
+DRUMS_PER_SET = 2
+
+# Overspray and trimming
+SPF_WASTE = 0.10
+
+# Beads of sealant per wall (top and bottom plate) behind a vapour barrier
+SEALANT_LINES = 2
+
+# Linear feet per 28 oz tube at a 3/8" bead
+SEALANT_LF_PER_TUBE = 30.0
+
+# Poly roll coverage (10' x 100') and lap allowance at seams and edges
+POLY_ROLL_SQFT = 1000.0
+POLY_LAP = 0.10
+
+# Drums one delivery can carry
+DELIVERY_DRUMS = int(os.getenv("DELIVERY_DRUMS", "24"))
+
+# Whole-unit rounding tolerance, so 2.0000000001 sets is 2
+_EPSILON = 1e-6
+
+_LEVEL_NUMBER = re.compile(r"(-?\d+(?:\.\d+)?)")
+
+# Named levels that sort around the numbered floors
+_NAMED_LEVELS = {"BASEMENT": -1.0, "CELLAR": -1.0, "GROUND": 0.0, "MAIN": 1.0, "MEZZANINE": 1.5,
+                 "ROOF": 1e6, "PARAPET": 1e6 + 1, "PENTHOUSE": 1e6 - 1}
+
+
+def level_rank(level):
+    """
+    Sort key putting levels in build order: basements (B1, P2), ground,
+    numbered floors (L1, 'Level 3', 3RD FLOOR), mezzanine, then roof and
+    parapet. Unrecognized names sort last, by name.
+    """
+    text = (level or "").upper().replace(" ", "")
+    for name, rank in _NAMED_LEVELS.items():
+        if name in text:
+            return (rank, text)
+    number = _LEVEL_NUMBER.search(text)
+    if number:
+        value = float(number.group(1))
+        below = text.startswith(("B", "P", "SB")) and not text.startswith("PH")
+        return (-value if below else value, text)
+    return (2e6, text)
+
+
+def _units(material):
+    if material in SPF_YIELD:
+        return "set"
+    return "tube" if material == "sealant" else "roll"
+
+
+def _spf_thickness(layers, material):
+    """Total thickness of one foam in an assembly's layers, or NaN"""
+    thicknesses = [layer["thickness_in"] for layer in layers or () if layer["material"] == material]
+    if not thicknesses or None in thicknesses:
+        return np.nan
+    return sum(thicknesses)
+
+
+def demand(columns):
+    """
+    Material demand per (project, level) from takeoff column arrays:
+    project_id, level, material_type, quantity (sqft), perimeter_ft,
+    assembly_id and the parsed assembly's insulation, layers,
+    r_value_number, vapour_barrier and vapour_barrier_mil (None where a
+    takeoff has no assembly).
+
+    Returns (keys [(project_id, level)], items [name], matrix of demand
+    in order units per key and item, unsized count per key). Foam rows
+    without a thickness, stated or derivable from their R-value, are
+    counted as unsized and left out.
+    """
+    n = len(columns["project_id"])
+    if n == 0:
+        return [], [], np.zeros((0, 0)), np.zeros(0, dtype=np.int64)
+    project_ids = np.asarray(columns["project_id"], dtype=np.int64)
+    levels = np.asarray([level or "" for level in columns["level"]], dtype=object)
+    quantity = np.nan_to_num(np.asarray(columns["quantity"], dtype=float))
+    perimeter = np.nan_to_num(np.asarray(columns["perimeter_ft"], dtype=float))
+    material = np.asarray([
+        m if m in SPF_YIELD else insulation
+        for m, insulation in zip(columns["material_type"], columns["insulation"])
+    ], dtype=object)
+
+    level_table, level_index = np.unique(levels.astype(str), return_inverse=True)
+    keys, key_index = np.unique(project_ids * len(level_table) + level_index, return_inverse=True)
+
+    item_names, item_rows, amounts = [], [], []
+
+    # Spray foam: board-feet -> sets at the yield for its pass thickness.
+    # Layer thickness is read once per distinct assembly, not per row
+    assembly_ids = np.asarray([-1 if a is None else a for a in columns["assembly_id"]], dtype=np.int64)
+    _, first_row, assembly_index = np.unique(assembly_ids, return_index=True, return_inverse=True)
+    r_values = np.asarray([np.nan if r is None else r for r in columns["r_value_number"]], dtype=float)
+    unsized = np.zeros(len(keys), dtype=np.int64)
+    for name, (pass_in, yield_bf) in SPF_YIELD.items():
+        rows = np.flatnonzero(material == name)
+        if not len(rows):
+            continue
+        layer_thickness = np.array([_spf_thickness(columns["layers"][i], name) for i in first_row], dtype=float)
+        thickness = layer_thickness[assembly_index[rows]]
+        thickness = np.where(np.isnan(thickness), r_values[rows] / INSULATION[name][1], thickness)
+        sized = thickness > 0  # False for NaN
+        unsized += np.bincount(key_index[rows[~sized]], minlength=len(keys))
+        rows, thickness = rows[sized], thickness[sized]
+        passes = np.ceil(thickness / SPF_MAX_PASS_IN[name] - _EPSILON)
+        yields = np.interp(thickness / passes, pass_in, yield_bf)
+        item_names.append(name)
+        item_rows.append(rows)
+        amounts.append(quantity[rows] * thickness / yields * (1 + SPF_WASTE))
+
+    # Vapour barrier: poly rolls by area plus lap, sealant tubes by plate length
+    barrier = np.asarray([b is not None for b in columns["vapour_barrier"]])
+    poly_names = np.asarray([f"poly_{m:g}mil" if m else "poly" for m in columns["vapour_barrier_mil"]], dtype=object)
+    for name in sorted(set(poly_names[barrier])):
+        rows = np.flatnonzero(barrier & (poly_names == name))
+        item_names.append(name)
+        item_rows.append(rows)
+        amounts.append(quantity[rows] * (1 + POLY_LAP) / POLY_ROLL_SQFT)
+    rows = np.flatnonzero(barrier)
+    if len(rows):
+        item_names.append("sealant")
+        item_rows.append(rows)
+        amounts.append(perimeter[rows] * SEALANT_LINES / SEALANT_LF_PER_TUBE)
+
+    matrix = np.zeros((len(keys), len(item_names)))
+    for column, (rows, amount) in enumerate(zip(item_rows, amounts)):
+        matrix[:, column] = np.bincount(key_index[rows], weights=amount, minlength=len(keys))
+
+    key_list = [(int(k // len(level_table)), str(level_table[k % len(level_table)])) for k in keys]
+    return key_list, item_names, matrix, unsized
+
+
+def phases(levels, matrix, items, capacity=DELIVERY_DRUMS):
+    """
+    Group one project's levels into delivery phases.
+
+    Levels are taken in build order and added to the current phase until
+    its drums would exceed `capacity`; a level needing more than a full
+    delivery on its own becomes a phase of several loads. With levels
+    kept contiguous, closing a phase only when the next level will not fit
+    gives the fewest phases. Orders are whole units of cumulative demand,
+    so each phase orders what its levels need beyond the previous
+    phases' leftovers.
+    """
+    order = sorted(range(len(levels)), key=lambda i: level_rank(levels[i]))
+    drums_per_unit = np.array([DRUMS_PER_SET if item in SPF_YIELD else 0 for item in items])
+    ordered_through = np.ceil(np.cumsum(matrix[order], axis=0) - _EPSILON)
+
+    result = []
+    start, before = 0, np.zeros(len(items))
+
+    def close(end):
+        quantities = ordered_through[end - 1] - before
+        drums = int(quantities @ drums_per_unit)
+        result.append({
+            "phase": len(result) + 1,
+            "levels": [levels[i] for i in order[start:end]],
+            "items": {item: int(q) for item, q in zip(items, quantities) if q > 0},
+            "drums": drums,
+            "loads": max(1, math.ceil(drums / capacity)) if capacity > 0 else 1,
+        })
+        return ordered_through[end - 1]
+
+    for position in range(len(order)):
+        drums = (ordered_through[position] - before) @ drums_per_unit
+        if position > start and drums > capacity:
+            before = close(position)
+            start = position
+    if order:
+        close(len(order))
+    return result
+
+
+def _item_totals(items, required, ordered):
+    return {
+        item: {
+            "unit": _units(item),
+            "required": round(float(r), 2),
+            "order": int(o),
+            "surplus": round(float(o - r), 2),
+            **({"drums": int(o) * DRUMS_PER_SET} if item in SPF_YIELD else {}),
+        }
+        for item, r, o in zip(items, required, ordered)
+    }
+
+
+def rollup(columns, names=None, capacity=DELIVERY_DRUMS):
+    """
+    Material orders for every project in `columns` (see demand), phased
+    per project, with totals across projects. `names` maps project id to
+    name for the listing.
+    """
+    keys, items, matrix, unsized = demand(columns)
+    projects = []
+    required_total = np.zeros(len(items))
+    ordered_total = np.zeros(len(items))
+
+    # Keys are sorted by project, so each project's levels are one span
+    project_of = np.asarray([project_id for project_id, _ in keys], dtype=np.int64)
+    spans = np.split(np.arange(len(keys)), np.flatnonzero(np.diff(project_of)) + 1) if keys else []
+    for span in spans:
+        project_id = int(project_of[span[0]])
+        levels = [keys[i][1] for i in span]
+        project_phases = phases(levels, matrix[span], items, capacity)
+        required = matrix[span].sum(axis=0)
+        ordered = np.ceil(required - _EPSILON)
+        required_total += required
+        ordered_total += ordered
+        projects.append({
+            "project_id": project_id,
+            "name": (names or {}).get(project_id),
+            "phases": project_phases,
+            "items": {k: v for k, v in _item_totals(items, required, ordered).items() if v["order"]},
+            "drums": sum(phase["drums"] for phase in project_phases),
+            "loads": sum(phase["loads"] for phase in project_phases if phase["drums"]),
+            "unsized": int(unsized[span].sum()),
+        })
+
+    return {
+        "delivery_drums": capacity,
+        "projects": projects,
+        "totals": {
+            "projects": len(projects),
+            "items": {k: v for k, v in _item_totals(items, required_total, ordered_total).items() if v["order"]},
+            "drums": sum(p["drums"] for p in projects),
+            "loads": sum(p["loads"] for p in projects),
+            "unsized": int(unsized.sum()),
+        },
+    }
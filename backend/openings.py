@@ -0,0 +1,382 @@
+"""
+EcoSeal Takeoff System - Opening Deductions
+Finds doors and windows along extracted boundaries and deducts their area
+from wall quantities
+
+Doors are recognised by their swing arcs: a quarter-circle curve whose
+bounding square has one side lying on the wall. Windows are pairs of short
+glazing lines running parallel to a wall just inside it. Each opening takes
+the nearest mark (D1, W2...) and, when the door/window schedule lists that
+mark, its scheduled width and height.
+
+Detection and deduction are batched over every level at once: the boundary
+edges of all levels go into one geometry.SegmentSet (each level shifted
+clear of the others) so every candidate is matched to its wall in a single
+vectorized query, and areas are rolled up per level and wall type with
+bincount.
+"""
+
+import logging
+import re
+
+import numpy as np
+
+import geometry
+from extraction import FOOT_MARKS, INCH_MARKS
+
+logger = logging.getLogger(__name__)
+
+OPENING_KINDS = ["door", "window"]
+
+# Plausible opening widths (feet)
+DOOR_WIDTH_FT = (2.0, 8.0)
+WINDOW_WIDTH_FT = (1.5, 16.0)
+
+# A swing arc's bounding box must be square to within this fraction
+ARC_SQUARENESS = 0.15
+
+# Geometry within this distance (feet) of a boundary edge lies on the wall
+ON_WALL_FT = 0.25
+
+# Glazing lines sit within this distance (feet) inside the wall line
+WINDOW_MAX_OFFSET_FT = 1.0
+
+# Glazing lines are parallel to the wall to within this sine
+PARALLEL_SINE = 0.02
+
+# Opening marks are searched for within this distance (feet)
+TAG_RADIUS_FT = 12.0
+
+# Heights used for openings without a schedule entry
+DEFAULT_HEIGHT_FT = {"door": 7.0, "window": 4.0}
+
+# Offset between levels when they share one spatial index (points)
+LEVEL_STRIDE_PT = 1e6
+
+MARK = re.compile(r"^([DW])-?(\d{1,3}[A-Z]?)$")
+_DIMENSION = rf"(\d+)\s*[{FOOT_MARKS}]\s*-?\s*(\d+(?:\.\d+)?)\s*[{INCH_MARKS}]"
+SCHEDULE_ROW = re.compile(rf"\b([DW])-?(\d{{1,3}}[A-Z]?)\b.*?{_DIMENSION}\s+{_DIMENSION}")
+
+
+def normalise_mark(text):
+    """'D-1' and 'd1' both become 'D1'; returns None for non-marks"""
+    match = MARK.match(text.strip().upper())
+    return f"{match.group(1)}{match.group(2)}" if match else None
+
+
+def parse_schedule(words):
+    """
+    Read door/window schedule rows from a page's words.
+
+    Words are regrouped into text lines; any line starting with a mark and
+    followed by two feet-inches dimensions (width, height) is a row.
+    Returns {mark: {"kind", "width_ft", "height_ft"}}.
+    """
+    lines = {}
+    for w in words:
+        lines.setdefault(round(w["top"]), []).append(w)
+    schedule = {}
+    for _, line in sorted(lines.items()):
+        text = " ".join(w["text"] for w in sorted(line, key=lambda w: w["x0"]))
+        match = SCHEDULE_ROW.search(text)
+        if not match:
+            continue
+        prefix, number, wf, wi, hf, hi = match.groups()
+        schedule[prefix + number] = {
+            "kind": "door" if prefix == "D" else "window",
+            "width_ft": int(wf) + float(wi) / 12,
+            "height_ft": int(hf) + float(hi) / 12,
+        }
+    return schedule
+
+
+def _boundary_edges(levels):
+    """Edges of every level's polygon, shifted apart into one SegmentSet"""
+    coords, level_of, local = [], [], []
+    for i, level in enumerate(levels):
+        polygon = np.asarray(level["polygon"], dtype=float).reshape(-1, 2)
+        if len(polygon) < 3:
+            continue
+        edges = np.column_stack([polygon, np.roll(polygon, -1, axis=0)])
+        edges[:, [0, 2]] += i * LEVEL_STRIDE_PT
+        coords.append(edges)
+        level_of.append(np.full(len(edges), i))
+        local.append(np.arange(len(edges)))
+    if not coords:
+        return geometry.SegmentSet(np.empty((0, 4))), np.empty(0, dtype=int), np.empty(0, dtype=int)
+    return geometry.SegmentSet(np.vstack(coords)), np.concatenate(level_of), np.concatenate(local)
+
+
+def _gather(levels, key, width):
+    """Stack one per-page array from every level, shifted like the edges"""
+    rows, owner = [], []
+    for i, level in enumerate(levels):
+        items = np.asarray(level["page"].get(key, []), dtype=float).reshape(-1, width)
+        items[:, [0, 2]] += i * LEVEL_STRIDE_PT
+        rows.append(items)
+        owner.append(np.full(len(items), i))
+    return np.vstack(rows), np.concatenate(owner)
+
+
+def _doors(edges, edge_level, curves, curve_level, ppf):
+    """Swing arcs whose bounding square has one side on a wall"""
+    x0, top, x1, bottom = curves.T
+    side = ((x1 - x0) + (bottom - top)) / 2
+    scale = ppf[curve_level]
+    square = np.abs((x1 - x0) - (bottom - top)) <= ARC_SQUARENESS * np.maximum(side, 1e-9)
+    sized = (side / scale >= DOOR_WIDTH_FT[0]) & (side / scale <= DOOR_WIDTH_FT[1])
+    keep = np.flatnonzero(square & sized)
+    if len(keep) == 0:
+        return []
+
+    # Midpoints of the four sides: top, bottom, left, right
+    cx, cy = (x0 + x1) / 2, (top + bottom) / 2
+    mids = np.stack([
+        np.column_stack([cx, top]), np.column_stack([cx, bottom]),
+        np.column_stack([x0, cy]), np.column_stack([x1, cy]),
+    ], axis=1)[keep].reshape(-1, 2)
+    horizontal_side = np.tile([True, True, False, False], len(keep))
+    owner = np.repeat(keep, 4)
+
+    hit, distance, _ = edges.nearest(mids, ON_WALL_FT * ppf.max())
+    valid = (hit >= 0) & (distance <= ON_WALL_FT * scale[owner])
+    valid &= edge_level[np.maximum(hit, 0)] == curve_level[owner]
+    c = edges.coords[np.maximum(hit, 0)]
+    edge_horizontal = np.abs(c[:, 3] - c[:, 1]) <= np.abs(c[:, 2] - c[:, 0])
+    valid &= edge_horizontal == horizontal_side
+    distance = np.where(valid, distance, np.inf)
+
+    best = distance.reshape(-1, 4).argmin(axis=1)
+    rows = np.arange(len(keep)) * 4 + best
+    found = np.isfinite(distance[rows])
+    return [
+        {"kind": "door", "level": int(curve_level[i]), "edge_id": int(hit[r]),
+         "center": mids[r], "width_ft": float(side[i] / scale[i])}
+        for i, r in zip(keep[found], rows[found])
+    ]
+
+
+def _windows(edges, edge_level, segments, segment_level, ppf):
+    """Pairs of matching glazing lines parallel to and just inside a wall"""
+    if len(segments) == 0:
+        return []
+    scale = ppf[segment_level]
+    d = segments[:, 2:] - segments[:, :2]
+    length = np.hypot(d[:, 0], d[:, 1])
+    sized = (length / scale >= WINDOW_WIDTH_FT[0]) & (length / scale <= WINDOW_WIDTH_FT[1])
+    keep = np.flatnonzero(sized)
+    if len(keep) == 0:
+        return []
+
+    mids = (segments[keep, :2] + segments[keep, 2:]) / 2
+    hit, distance, _ = edges.nearest(mids, WINDOW_MAX_OFFSET_FT * ppf.max())
+    s = scale[keep]
+    valid = (hit >= 0) & (distance > ON_WALL_FT * s / 2) & (distance <= WINDOW_MAX_OFFSET_FT * s)
+    valid &= edge_level[np.maximum(hit, 0)] == segment_level[keep]
+    e = edges.coords[np.maximum(hit, 0)]
+    ed = e[:, 2:] - e[:, :2]
+    edge_length = np.maximum(np.hypot(ed[:, 0], ed[:, 1]), 1e-9)
+    sine = np.abs(ed[:, 0] * d[keep, 1] - ed[:, 1] * d[keep, 0]) / (edge_length * length[keep])
+    valid &= sine <= PARALLEL_SINE
+    keep, hit, s, e, ed, edge_length = keep[valid], hit[valid], s[valid], e[valid], ed[valid], edge_length[valid]
+    if len(keep) == 0:
+        return []
+
+    # Extent of each line along its wall
+    u = ed / edge_length[:, None]
+    a = ((segments[keep, :2] - e[:, :2]) * u).sum(axis=1)
+    b = ((segments[keep, 2:] - e[:, :2]) * u).sum(axis=1)
+    lo, hi = np.minimum(a, b), np.maximum(a, b)
+
+    # Lines on the same wall covering the same extent form one window
+    order = np.lexsort((lo, hit))
+    hit, lo, hi, s, keep, e, u = hit[order], lo[order], hi[order], s[order], keep[order], e[order], u[order]
+    tolerance = ON_WALL_FT * s
+    breaks = np.r_[True, (hit[1:] != hit[:-1])
+                   | (np.abs(np.diff(lo)) > tolerance[1:])
+                   | (np.abs(np.diff(hi)) > tolerance[1:])]
+    group = np.cumsum(breaks) - 1
+    counts = np.bincount(group)
+    first = np.flatnonzero(breaks)
+    windows = []
+    for g in np.flatnonzero(counts >= 2):
+        i = first[g]
+        centre = e[i, :2] + u[i] * (lo[i] + hi[i]) / 2
+        windows.append({
+            "kind": "window", "level": int(segment_level[keep[i]]), "edge_id": int(hit[i]),
+            "center": centre, "width_ft": float((hi[i] - lo[i]) / s[i]),
+        })
+    return windows
+
+
+def _tag(openings, levels, ppf, schedule):
+    """Attach the nearest mark of the right kind and schedule dimensions"""
+    tags, owner = [], []
+    for i, level in enumerate(levels):
+        for w in level["page"].get("words", []):
+            mark = normalise_mark(w["text"])
+            if mark:
+                x = (w["x0"] + w["x1"]) / 2 + i * LEVEL_STRIDE_PT
+                tags.append((mark, x, (w["top"] + w["bottom"]) / 2))
+                owner.append(i)
+    for kind in OPENING_KINDS:
+        subset = [o for o in openings if o["kind"] == kind]
+        marks = [t for t in tags if t[0][0] == kind[0].upper()]
+        if not subset or not marks:
+            continue
+        points = geometry.SegmentSet([(x, y, x, y) for _, x, y in marks])
+        centres = np.array([o["center"] for o in subset])
+        hit, distance, _ = points.nearest(centres, TAG_RADIUS_FT * ppf.max())
+        for opening, h, dist in zip(subset, hit, distance):
+            if h >= 0 and dist <= TAG_RADIUS_FT * ppf[opening["level"]]:
+                opening["mark"] = marks[h][0]
+
+    for opening in openings:
+        entry = schedule.get(opening.get("mark"))
+        if entry and entry["kind"] == opening["kind"]:
+            opening["width_ft"] = entry["width_ft"]
+            opening["height_ft"] = entry["height_ft"]
+            opening["source"] = "schedule"
+        else:
+            opening["height_ft"] = DEFAULT_HEIGHT_FT[opening["kind"]]
+            opening["source"] = "default"
+        opening.setdefault("mark", None)
+
+
+def detect_openings(levels, schedule=None):
+    """
+    Find door and window openings on every level in one batched pass.
+
+    `levels` is a list of dicts with "page" (from extraction.extract_page),
+    "polygon" (boundary in page points) and "points_per_foot". Returns one
+    dict per opening with kind, mark, level index, boundary edge index,
+    centre (points), width/height in feet and whether the size came from
+    the schedule or defaults.
+    """
+    schedule = schedule or {}
+    ppf = np.array([level.get("points_per_foot") or 0.0 for level in levels], dtype=float)
+    usable = [
+        dict(level, polygon=level["polygon"] if ppf[i] > 0 else [])
+        for i, level in enumerate(levels)
+    ]
+    edges, edge_level, edge_local = _boundary_edges(usable)
+    if len(edges) == 0:
+        return []
+
+    curves, curve_level = _gather(usable, "curves", 4)
+    segments, segment_level = _gather(usable, "segments", 4)
+    openings = (
+        _doors(edges, edge_level, curves, curve_level, ppf)
+        + _windows(edges, edge_level, segments, segment_level, ppf)
+    )
+    _tag(openings, levels, ppf, schedule)
+    for opening in openings:
+        opening["edge"] = int(edge_local[opening.pop("edge_id")])
+        x, y = opening["center"]
+        opening["center"] = [float(x - opening["level"] * LEVEL_STRIDE_PT), float(y)]
+    logger.info(
+        f"Detected {sum(o['kind'] == 'door' for o in openings)} doors and "
+        f"{sum(o['kind'] == 'window' for o in openings)} windows on {len(levels)} levels"
+    )
+    return openings
+
+
+def deduct(levels, openings):
+    """
+    Wall areas per level and wall type, less openings.
+
+    Each level dict carries "polygon", "points_per_foot", "height_ft" and
+    "wall_type": either one type for the whole level or a list giving the
+    type of each boundary edge. Openings come from detect_openings; each
+    deducts width x height, capped at the wall height. Returns one row per
+    (level, wall type) with perimeter, gross, deducted and net area, a
+    breakdown by opening kind and mark, and per-edge arrays under "edges"
+    (page coordinates, length and door/window deductions of every boundary
+    edge in the group). Levels without a scale give no rows: their lengths
+    are in points, not feet.
+    """
+    scaled = [bool(level.get("points_per_foot")) for level in levels]
+    edges, edge_level, edge_local = _boundary_edges([
+        dict(level, polygon=level["polygon"] if scaled[i] else []) for i, level in enumerate(levels)
+    ])
+    openings = [o for o in openings if scaled[o["level"]]]
+    edge_types = np.array([
+        level["wall_type"] if isinstance(level["wall_type"], str) else level["wall_type"][local]
+        for level, local in zip((levels[i] for i in edge_level), edge_local)
+    ], dtype=object)
+    ppf = np.array([level.get("points_per_foot") or np.nan for level in levels], dtype=float)
+    height = np.array([level["height_ft"] for level in levels], dtype=float)
+
+    keys = list(zip(edge_level.tolist(), edge_types.tolist()))
+    groups = sorted(set(keys))
+    group_of = {key: g for g, key in enumerate(groups)}
+    edge_group = np.array([group_of[k] for k in keys], dtype=int)
+    perimeter = np.bincount(edge_group, weights=edges.lengths / ppf[edge_level], minlength=len(groups))
+
+    # Openings land in the group of the edge they sit on
+    edge_index = {key: e for e, key in enumerate(zip(edge_level.tolist(), edge_local.tolist()))}
+    opening_edge = np.array([edge_index[(o["level"], o["edge"])] for o in openings], dtype=int)
+    opening_group = edge_group[opening_edge]
+    area = np.array([
+        o["width_ft"] * min(o["height_ft"], height[o["level"]]) for o in openings
+    ], dtype=float)
+    is_door = np.array([o["kind"] == "door" for o in openings], dtype=bool)
+    deducted = {
+        kind: np.bincount(opening_group[mask], weights=area[mask], minlength=len(groups))
+        for kind, mask in (("door", is_door), ("window", ~is_door))
+    }
+    counted = {
+        kind: np.bincount(opening_group[mask], minlength=len(groups))
+        for kind, mask in (("door", is_door), ("window", ~is_door))
+    }
+    edge_deducted = {
+        kind: np.bincount(opening_edge[mask], weights=area[mask], minlength=len(edges))
+        for kind, mask in (("door", is_door), ("window", ~is_door))
+    }
+    coords = edges.coords.copy()
+    coords[:, [0, 2]] -= edge_level[:, None] * LEVEL_STRIDE_PT
+    length_ft = edges.lengths / ppf[edge_level]
+    order = np.argsort(edge_group, kind="stable")
+    bounds = np.searchsorted(edge_group[order], np.arange(len(groups) + 1))
+
+    marks = [{} for _ in groups]
+    unscheduled = np.zeros(len(groups), dtype=int)
+    for o, g, a in zip(openings, opening_group.tolist(), area.tolist()):
+        if o["source"] != "schedule":
+            unscheduled[g] += 1
+        if o["mark"]:
+            entry = marks[g].setdefault(o["mark"], {"count": 0, "sqft": 0.0})
+            entry["count"] += 1
+            entry["sqft"] += a
+
+    rows = []
+    for g, (level, wall_type) in enumerate(groups):
+        members = order[bounds[g]:bounds[g + 1]]
+        gross = perimeter[g] * height[level]
+        total = deducted["door"][g] + deducted["window"][g]
+        net = max(0.0, gross - total)
+        rows.append({
+            "level": level,
+            "wall_type": wall_type,
+            "perimeter_ft": float(perimeter[g]),
+            "height_ft": float(height[level]),
+            "gross_sqft": float(gross),
+            "deduction_sqft": float(min(total, gross)),
+            "net_sqft": float(net),
+            "deductions": {
+                "gross_sqft": round(float(gross), 2),
+                "net_sqft": round(float(net), 2),
+                "doors": {"count": int(counted["door"][g]), "sqft": round(float(deducted["door"][g]), 2)},
+                "windows": {"count": int(counted["window"][g]), "sqft": round(float(deducted["window"][g]), 2)},
+                "marks": {mark: dict(v, sqft=round(v["sqft"], 2)) for mark, v in sorted(marks[g].items())},
+                "unscheduled": int(unscheduled[g]),
+            },
+            "edges": {
+                "index": edge_local[members],
+                "coords": coords[members],
+                "length_ft": length_ft[members],
+                "door_sqft": edge_deducted["door"][members],
+                "window_sqft": edge_deducted["window"][members],
+            },
+        })
+    return rows
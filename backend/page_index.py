@@ -0,0 +1,184 @@
+"""
+EcoSeal Takeoff System - Page Index
+Fast page classification for large plan sets
+
+Each page is classified from cheap features only: the sheet number in the
+title block (A-101, A-501...), keyword density in the page text and vector
+density (drawing objects per square inch). Text and object counts come
+straight from pdfium, so a 200-page set indexes in seconds without parsing
+any geometry.
+"""
+
+import logging
+import re
+
+import pypdfium2 as pdfium
+import pypdfium2.raw as pdfium_c
+
+logger = logging.getLogger(__name__)
+
+PAGE_TYPES = ["floor_plan", "section", "elevation", "schedule", "detail", "other"]
+
+# A-101, A1.01, A-501.1, S-201 ...
+SHEET_NUMBER = re.compile(r"\b([A-Z]{1,2})\s?[-.]?\s?(\d)\.?(\d{2})(?:\.\d+)?\b")
+
+# Architectural sheet series (first digit after the discipline letter)
+SHEET_SERIES = {
+    1: "floor_plan",
+    2: "elevation",
+    3: "section",
+    4: "floor_plan",  # enlarged plans
+    5: "detail",
+    6: "schedule",
+}
+
+KEYWORDS = {
+    "floor_plan": ["FLOOR PLAN", "LEVEL", "PLAN"],
+    "section": ["SECTION", "BUILDING SECTION", "WALL SECTION"],
+    "elevation": ["ELEVATION"],
+    "schedule": ["SCHEDULE", "WALL TYPE", "ASSEMBLY", "R-VALUE"],
+    "detail": ["DETAIL", "TYP."],
+}
+
+LEVEL_PATTERNS = [
+    re.compile(r"\bLEVEL\s+(L?\d+(?:\s*-\s*\d+)?)\b"),
+    re.compile(r"\b(\d+)(?:ST|ND|RD|TH)\s+FLOOR\b"),
+    re.compile(r"\b(GROUND|BASEMENT|ROOF|PARAPET|MEZZANINE)\b(?:\s+(?:FLOOR|LEVEL|PLAN))?"),
+]
+
+# Title blocks sit in the bottom-right corner of the sheet
+TITLE_BLOCK_WIDTH = 0.3
+TITLE_BLOCK_HEIGHT = 0.35
+
+# Drawing objects per square inch above which a page is a drawing, not text
+DENSE_OBJECTS_PER_SQIN = 0.2
+
+# Sparse pages with at least this many words read as tables / notes
+TEXT_HEAVY_WORDS = 20
+
+SHEET_WEIGHT = 1.5
+KEYWORD_WEIGHT = 2.0
+DENSITY_WEIGHT = 1.0
+
+
+def _sheet_number(title_text, page_text):
+    """Prefer a sheet number from the title block, else the last on the page"""
+    match = SHEET_NUMBER.search(title_text)
+    if match:
+        return match
+    matches = list(SHEET_NUMBER.finditer(page_text))
+    return matches[-1] if matches else None
+
+
+def _title(title_text, sheet):
+    """The title block line just above the sheet number"""
+    lines = [line.strip() for line in title_text.splitlines() if line.strip()]
+    for i, line in enumerate(lines):
+        if sheet and sheet.group(0) in line:
+            return lines[i - 1] if i else None
+    return None
+
+
+def _level(text):
+    for pattern in LEVEL_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            return re.sub(r"\s+", "", match.group(1))
+    return None
+
+
+def page_features(page):
+    """Extract the cheap classification features from a pdfium page"""
+    width, height = page.get_size()
+    textpage = page.get_textpage()
+    try:
+        text = textpage.get_text_range().upper()
+        title_text = textpage.get_text_bounded(
+            left=width * (1 - TITLE_BLOCK_WIDTH), bottom=0,
+            right=width, top=height * TITLE_BLOCK_HEIGHT,
+        ).upper()
+    finally:
+        textpage.close()
+
+    words = len(text.split())
+    keyword_density = {
+        page_type: sum(text.count(k) for k in keywords) / max(1, words)
+        for page_type, keywords in KEYWORDS.items()
+    }
+    objects = pdfium_c.FPDFPage_CountObjects(page.raw)
+    area_sqin = (width / 72) * (height / 72)
+    sheet = _sheet_number(title_text, text)
+    return {
+        "sheet_number": f"{sheet.group(1)}-{sheet.group(2)}{sheet.group(3)}" if sheet else None,
+        "discipline": sheet.group(1) if sheet else None,
+        "series": int(sheet.group(2)) if sheet else None,
+        "level": _level(title_text) or _level(text),
+        "title": _title(title_text, sheet),
+        "words": words,
+        "objects": objects,
+        "objects_per_sqin": objects / area_sqin if area_sqin else 0.0,
+        "keyword_density": keyword_density,
+    }
+
+
+def classify(features):
+    """
+    Score each page type from a page's features.
+
+    Returns (page_type, confidence) where confidence is GREEN when the
+    winner clearly leads, YELLOW when it is close and RED when nothing
+    scored at all.
+    """
+    scores = dict.fromkeys(PAGE_TYPES, 0.0)
+    if features["discipline"] == "A" and features["series"] in SHEET_SERIES:
+        scores[SHEET_SERIES[features["series"]]] += SHEET_WEIGHT
+
+    density = features["keyword_density"]
+    top = max(density.values()) or 1.0
+    for page_type, value in density.items():
+        scores[page_type] += KEYWORD_WEIGHT * value / top
+
+    if features["objects_per_sqin"] >= DENSE_OBJECTS_PER_SQIN:
+        for page_type in ("floor_plan", "section", "elevation"):
+            scores[page_type] += DENSITY_WEIGHT
+    elif features["words"] >= TEXT_HEAVY_WORDS:
+        scores["schedule"] += DENSITY_WEIGHT / 2
+
+    ranked = sorted(scores.items(), key=lambda kv: -kv[1])
+    (best, best_score), (_, runner_up) = ranked[0], ranked[1]
+    if best_score <= 0:
+        return "other", "RED"
+    confidence = "GREEN" if best_score - runner_up >= 1.0 else "YELLOW"
+    return best, confidence
+
+
+def build_index(source):
+    """
+    Classify every page of a PDF.
+
+    `source` is a path or bytes. Returns one dict per page with page number,
+    sheet number, page type, level, title, confidence and raw features.
+    """
+    document = pdfium.PdfDocument(source)
+    index = []
+    try:
+        for number in range(len(document)):
+            page = document[number]
+            try:
+                features = page_features(page)
+            finally:
+                page.close()
+            page_type, confidence = classify(features)
+            index.append({
+                "page_number": number + 1,
+                "sheet_number": features["sheet_number"],
+                "page_type": page_type,
+                "level": features["level"] if page_type == "floor_plan" else None,
+                "title": features["title"],
+                "confidence": confidence,
+                "features": features,
+            })
+    finally:
+        document.close()
+    logger.info(f"Indexed {len(index)} pages")
+    return index
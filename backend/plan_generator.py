@@ -0,0 +1,636 @@
+"""
+EcoSeal Takeoff System - Synthetic Plan Generator
+Writes vector floor-plan PDFs with known ground truth for benchmarking
+boundary extraction and scale detection
+
+Usage (from the backend directory):
+    python plan_generator.py /tmp/plans/tower.pdf --levels 20 --shape l_shape
+    python plan_generator.py /tmp/plans/dense.pdf --outline-segments 500000
+"""
+
+import argparse
+import json
+import math
+import random
+import zlib
+
+# ARCH D sheet, landscape (24" x 36"), in PDF points
+SHEET_SIZE = (36 * 72, 24 * 72)
+
+# Architectural scale notations -> points per foot
+SCALES = {
+    '1/16" = 1\'-0"': 72 / 16,
+    '1/8" = 1\'-0"': 72 / 8,
+    '3/16" = 1\'-0"': 72 * 3 / 16,
+    '1/4" = 1\'-0"': 72 / 4,
+}
+
+SHAPES = ["rectangle", "l_shape", "u_shape", "chamfered"]
+
+DEFAULT_SCHEDULE = [
+    {"wall_type": "EW-1", "description": "Exterior Wall",
+     "assembly": '2x4 studs, 1.5" ccSPF, 6mil poly', "r_value": "R-24"},
+    {"wall_type": "EW-2", "description": "Parapet",
+     "assembly": '2x6 studs, 3.5" ccSPF, 6mil poly', "r_value": "R-30"},
+    {"wall_type": "IW-1", "description": "Interior Wall",
+     "assembly": '3.5" batt + 6mil poly', "r_value": "R-13"},
+]
+
+DEFAULT_OPENING_SCHEDULE = [
+    {"mark": "D1", "kind": "door", "width_ft": 3.0, "height_ft": 7.0},
+    {"mark": "D2", "kind": "door", "width_ft": 3.5, "height_ft": 8.0},
+    {"mark": "W1", "kind": "window", "width_ft": 4.0, "height_ft": 5.0},
+    {"mark": "W2", "kind": "window", "width_ft": 6.0, "height_ft": 4.5},
+]
+
+# Margin between the sheet edge and the drawing area, in points
+MARGIN = 72
+
+# Openings keep this far (feet) from outline corners and from each other
+OPENING_CLEARANCE_FT = 2.0
+
+# Bezier control distance for a quarter circle of radius 1
+QUARTER_ARC_K = 0.5523
+
+
+# ============================================================================
+# PDF WRITER
+# ============================================================================
+
+def _escape(text):
+    """Escape a string for use as a PDF literal"""
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _content_stream(page):
+    """Build the drawing operators for one page"""
+    parts = ["0 G 1 w"]
+    parts.extend(
+        f"{x0:.2f} {y0:.2f} m {x1:.2f} {y1:.2f} l S"
+        for x0, y0, x1, y1 in page.get("segments", [])
+    )
+    parts.extend(
+        f"{x0:.2f} {y0:.2f} m {ax:.2f} {ay:.2f} {bx:.2f} {by:.2f} {x1:.2f} {y1:.2f} c S"
+        for x0, y0, ax, ay, bx, by, x1, y1 in page.get("curves", [])
+    )
+    for x, y, size, text in page.get("text", []):
+        parts.append(f"BT /F1 {size} Tf {x:.2f} {y:.2f} Td ({_escape(text)}) Tj ET")
+    return "\n".join(parts).encode("latin-1")
+
+
+def write_pdf(path, pages):
+    """
+    Write a multi-page vector PDF.
+
+    Each page is a dict with an optional "size" (width, height) in points,
+    "segments" as (x0, y0, x1, y1) tuples, "curves" as cubic Beziers
+    (x0, y0, cx0, cy0, cx1, cy1, x1, y1) and "text" as (x, y, size, string)
+    tuples. Coordinates use the PDF origin (bottom-left). A page may also
+    carry an "image" dict (width_px, height_px and Flate-compressed 8-bit
+    grayscale "data") drawn over the full page, as a scanner would produce.
+    """
+    objects = []
+
+    def add(body):
+        objects.append(body)
+        return len(objects)
+
+    catalog_id = add(None)
+    pages_id = add(None)
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+
+    page_ids = []
+    for page in pages:
+        width, height = page.get("size", SHEET_SIZE)
+        content = _content_stream(page)
+        resources = f"/Font << /F1 {font_id} 0 R >>"
+        image = page.get("image")
+        if image:
+            image_id = add(
+                b"<< /Type /XObject /Subtype /Image /Width %d /Height %d /ColorSpace /DeviceGray "
+                b"/BitsPerComponent 8 /Filter /FlateDecode /Length %d >>\nstream\n"
+                % (image["width_px"], image["height_px"], len(image["data"]))
+                + image["data"]
+                + b"\nendstream"
+            )
+            resources += f" /XObject << /Im1 {image_id} 0 R >>"
+            content = f"q {width:.2f} 0 0 {height:.2f} 0 0 cm /Im1 Do Q\n".encode() + content
+        stream = zlib.compress(content, 6)
+        content_id = add(
+            b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(stream)
+            + stream
+            + b"\nendstream"
+        )
+        page_ids.append(add(
+            f"<< /Type /Page /Parent {pages_id} 0 R /MediaBox [0 0 {width:.2f} {height:.2f}] "
+            f"/Resources << {resources} >> /Contents {content_id} 0 R >>".encode()
+        ))
+
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects[catalog_id - 1] = f"<< /Type /Catalog /Pages {pages_id} 0 R >>".encode()
+    objects[pages_id - 1] = f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode()
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref_offset = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, catalog_id, xref_offset)
+        )
+
+
+# ============================================================================
+# GEOMETRY
+# ============================================================================
+
+def outline_vertices(shape, width_ft, depth_ft):
+    """Return the closed outline of a footprint shape in feet (counter-clockwise)"""
+    w, d = width_ft, depth_ft
+    if shape == "rectangle":
+        return [(0, 0), (w, 0), (w, d), (0, d)]
+    if shape == "l_shape":
+        return [(0, 0), (w, 0), (w, d / 2), (w / 2, d / 2), (w / 2, d), (0, d)]
+    if shape == "u_shape":
+        return [(0, 0), (w, 0), (w, d), (2 * w / 3, d), (2 * w / 3, d / 3),
+                (w / 3, d / 3), (w / 3, d), (0, d)]
+    if shape == "chamfered":
+        c = min(w, d) / 5
+        return [(c, 0), (w - c, 0), (w, c), (w, d - c), (w - c, d), (c, d), (0, d - c), (0, c)]
+    raise ValueError(f"Unknown shape '{shape}'. Use one of {SHAPES}")
+
+
+def polygon_perimeter(vertices):
+    """Perimeter of a closed polygon"""
+    return sum(
+        math.dist(vertices[i], vertices[(i + 1) % len(vertices)])
+        for i in range(len(vertices))
+    )
+
+
+def polygon_area(vertices):
+    """Area of a closed simple polygon (shoelace formula)"""
+    total = 0.0
+    for i, (x0, y0) in enumerate(vertices):
+        x1, y1 = vertices[(i + 1) % len(vertices)]
+        total += x0 * y1 - x1 * y0
+    return abs(total) / 2
+
+
+def point_in_polygon(x, y, vertices):
+    """Even-odd point-in-polygon test"""
+    inside = False
+    j = len(vertices) - 1
+    for i, (xi, yi) in enumerate(vertices):
+        xj, yj = vertices[j]
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+def subdivide(vertices, segment_count):
+    """
+    Split a closed polygon into `segment_count` collinear segments,
+    distributed across edges in proportion to edge length (at least one
+    segment per edge).
+    """
+    n = len(vertices)
+    edges = [(vertices[i], vertices[(i + 1) % n]) for i in range(n)]
+    lengths = [math.dist(a, b) for a, b in edges]
+    perimeter = sum(lengths)
+
+    segment_count = max(n, segment_count)
+    pieces = [max(1, int(segment_count * length / perimeter)) for length in lengths]
+    # Hand out the rounding remainder to the longest edges first
+    for i in sorted(range(n), key=lambda k: -lengths[k])[:max(0, segment_count - sum(pieces))]:
+        pieces[i] += 1
+
+    segments = []
+    for ((ax, ay), (bx, by)), count in zip(edges, pieces):
+        for k in range(count):
+            t0, t1 = k / count, (k + 1) / count
+            segments.append((
+                ax + (bx - ax) * t0, ay + (by - ay) * t0,
+                ax + (bx - ax) * t1, ay + (by - ay) * t1,
+            ))
+    return segments
+
+
+def interior_segments(vertices, count, rng, max_length_ft=8.0):
+    """Short axis-aligned partition stubs that stay inside the outline"""
+    xs = [x for x, _ in vertices]
+    ys = [y for _, y in vertices]
+    segments = []
+    attempts = 0
+    while len(segments) < count and attempts < count * 20:
+        attempts += 1
+        x = rng.uniform(min(xs), max(xs))
+        y = rng.uniform(min(ys), max(ys))
+        length = rng.uniform(1.0, max_length_ft)
+        if rng.random() < 0.5:
+            x1, y1 = x + length, y
+        else:
+            x1, y1 = x, y + length
+        if point_in_polygon(x, y, vertices) and point_in_polygon(x1, y1, vertices):
+            segments.append((x, y, x1, y1))
+    return segments
+
+
+def place_openings(vertices, counts, schedule, rng):
+    """
+    Place door and window openings along a counter-clockwise outline.
+
+    `counts` maps kind ("door", "window") to how many to place; each
+    opening takes a random mark of that kind from the schedule. Openings
+    keep OPENING_CLEARANCE_FT from corners and from each other. Returns
+    dicts with mark, kind, width/height, edge index and centre (feet).
+    """
+    n = len(vertices)
+    edges = [(vertices[i], vertices[(i + 1) % n]) for i in range(n)]
+    lengths = [math.dist(a, b) for a, b in edges]
+    taken = [[] for _ in edges]
+    openings = []
+    for kind in ("door", "window"):
+        marks = [row for row in schedule if row["kind"] == kind]
+        placed = attempts = 0
+        while marks and placed < counts.get(kind, 0) and attempts < 200:
+            attempts += 1
+            row = rng.choice(marks)
+            edge = rng.choices(range(n), weights=lengths)[0]
+            half = row["width_ft"] / 2 + OPENING_CLEARANCE_FT
+            if lengths[edge] < 2 * half:
+                continue
+            s = rng.uniform(half, lengths[edge] - half)
+            if any(abs(s - other) < half + other_half for other, other_half in taken[edge]):
+                continue
+            taken[edge].append((s, half))
+            (ax, ay), (bx, by) = edges[edge]
+            t = s / lengths[edge]
+            openings.append(dict(row, edge=edge, center_ft=[ax + (bx - ax) * t, ay + (by - ay) * t]))
+            placed += 1
+    return openings
+
+
+def opening_symbol(opening, vertices, to_pt):
+    """
+    Draw one opening in plan: a door as a leaf plus a quarter swing arc
+    hinged on the wall, a window as two glazing lines just inside it.
+    Returns (segments, curves, text) in points.
+    """
+    (ax, ay), (bx, by) = vertices[opening["edge"]], vertices[(opening["edge"] + 1) % len(vertices)]
+    length = math.dist((ax, ay), (bx, by))
+    ux, uy = (bx - ax) / length, (by - ay) / length
+    nx, ny = -uy, ux  # inward for a counter-clockwise outline
+    cx, cy = opening["center_ft"]
+    w = opening["width_ft"]
+
+    if opening["kind"] == "door":
+        hx, hy = cx - ux * w / 2, cy - uy * w / 2
+        tip = (hx + nx * w, hy + ny * w)
+        jamb = (hx + ux * w, hy + uy * w)
+        k = QUARTER_ARC_K * w
+        segments = [to_pt(hx, hy) + to_pt(*tip)]
+        curves = [to_pt(*tip) + to_pt(tip[0] + ux * k, tip[1] + uy * k)
+                  + to_pt(jamb[0] + nx * k, jamb[1] + ny * k) + to_pt(*jamb)]
+        tag = (cx + nx * (w + 1.0), cy + ny * (w + 1.0))
+    else:
+        segments = [
+            to_pt(cx - ux * w / 2 + nx * d, cy - uy * w / 2 + ny * d)
+            + to_pt(cx + ux * w / 2 + nx * d, cy + uy * w / 2 + ny * d)
+            for d in (0.25, 0.5)
+        ]
+        curves = []
+        tag = (cx + nx * 1.5, cy + ny * 1.5)
+    x, y = to_pt(*tag)
+    return segments, curves, [(x - 6, y - 4, 8, opening["mark"])]
+
+
+# ============================================================================
+# SHEET ANNOTATIONS
+# ============================================================================
+
+def title_block(sheet_number, title, width=SHEET_SIZE[0]):
+    """Title block border and labels along the right edge of the sheet"""
+    x0 = width - MARGIN - 216
+    segments = [
+        (x0, MARGIN, x0 + 216, MARGIN),
+        (x0 + 216, MARGIN, x0 + 216, MARGIN + 144),
+        (x0 + 216, MARGIN + 144, x0, MARGIN + 144),
+        (x0, MARGIN + 144, x0, MARGIN),
+    ]
+    text = [
+        (x0 + 12, MARGIN + 110, 14, "ECOSEAL INSULATION"),
+        (x0 + 12, MARGIN + 80, 12, title),
+        (x0 + 12, MARGIN + 24, 28, sheet_number),
+    ]
+    return segments, text
+
+
+def scale_bar(x, y, points_per_foot, label):
+    """A four-division scale bar with tick labels, sized to a round length"""
+    # Pick the largest round division that keeps the bar under 4 inches
+    division_ft = max(
+        (ft for ft in (1, 2, 4, 5, 8, 10, 16, 20, 25, 50) if ft * 4 * points_per_foot <= 288),
+        default=1,
+    )
+    step = division_ft * points_per_foot
+    segments = [(x, y, x + 4 * step, y), (x, y + 6, x + 4 * step, y + 6)]
+    text = [(x, y + 30, 10, f"SCALE: {label}")]
+    for i in range(5):
+        segments.append((x + i * step, y, x + i * step, y + 6))
+        text.append((x + i * step - 3, y + 12, 8, f"{i * division_ft}'"))
+    return segments, text, {"division_ft": division_ft, "length_pt": 4 * step,
+                            "origin_pt": [x, y]}
+
+
+def schedule_table(rows, x, y, col_widths=(72, 144, 288, 72), row_height=24):
+    """A ruled wall schedule table; (x, y) is the top-left corner in points"""
+    headers = ["WALL TYPE", "DESCRIPTION", "ASSEMBLY", "R-VALUE"]
+    keys = ["wall_type", "description", "assembly", "r_value"]
+    table_width = sum(col_widths)
+    n_rows = len(rows) + 1
+
+    segments = []
+    for r in range(n_rows + 1):
+        segments.append((x, y - r * row_height, x + table_width, y - r * row_height))
+    cx = x
+    for width in (0,) + tuple(col_widths):
+        cx += width
+        segments.append((cx, y, cx, y - n_rows * row_height))
+
+    text = [(x, y + 12, 14, "WALL SCHEDULE")]
+    for r, values in enumerate([dict(zip(keys, headers))] + rows):
+        cx = x
+        for key, width in zip(keys, col_widths):
+            text.append((cx + 4, y - (r + 1) * row_height + 8, 9, values[key]))
+            cx += width
+    return segments, text
+
+
+def _feet_inches(feet):
+    whole = int(feet)
+    return f"{whole}'-{round((feet - whole) * 12)}\""
+
+
+def opening_schedule_table(rows, x, y, col_widths=(72, 96, 96, 96), row_height=24):
+    """A ruled door/window schedule table; (x, y) is the top-left corner"""
+    headers = ["MARK", "TYPE", "WIDTH", "HEIGHT"]
+    table_width = sum(col_widths)
+    n_rows = len(rows) + 1
+
+    segments = []
+    for r in range(n_rows + 1):
+        segments.append((x, y - r * row_height, x + table_width, y - r * row_height))
+    cx = x
+    for width in (0,) + tuple(col_widths):
+        cx += width
+        segments.append((cx, y, cx, y - n_rows * row_height))
+
+    values = [headers] + [
+        [row["mark"], row["kind"].upper(), _feet_inches(row["width_ft"]), _feet_inches(row["height_ft"])]
+        for row in rows
+    ]
+    text = [(x, y + 12, 14, "DOOR AND WINDOW SCHEDULE")]
+    for r, cells in enumerate(values):
+        cx = x
+        for value, width in zip(cells, col_widths):
+            text.append((cx + 4, y - (r + 1) * row_height + 8, 9, value))
+            cx += width
+    return segments, text
+
+
+# ============================================================================
+# PLAN SETS
+# ============================================================================
+
+def _level_name(index):
+    return f"L{index + 2}-{index + 3}"
+
+
+def floor_plan_page(vertices_ft, outline_count, interior_count, points_per_foot,
+                    scale_label, sheet_number, level, rng, opening_counts=None,
+                    opening_schedule=DEFAULT_OPENING_SCHEDULE):
+    """Build one floor plan page and its ground truth"""
+    xs = [x for x, _ in vertices_ft]
+    ys = [y for _, y in vertices_ft]
+    plan_w = (max(xs) - min(xs)) * points_per_foot
+    plan_h = (max(ys) - min(ys)) * points_per_foot
+    sheet_w, sheet_h = SHEET_SIZE
+    if plan_w > sheet_w - 2 * MARGIN - 240 or plan_h > sheet_h - 2 * MARGIN - 96:
+        raise ValueError("Footprint does not fit on the sheet at this scale")
+
+    # Centre the footprint in the drawing area (left of the title block)
+    ox = MARGIN + (sheet_w - 2 * MARGIN - 240 - plan_w) / 2
+    oy = MARGIN + 96 + (sheet_h - 2 * MARGIN - 96 - plan_h) / 2
+
+    def to_pt(x, y):
+        return ox + (x - min(xs)) * points_per_foot, oy + (y - min(ys)) * points_per_foot
+
+    vertices_pt = [to_pt(x, y) for x, y in vertices_ft]
+    outline = subdivide(vertices_pt, outline_count)
+    interior = [
+        to_pt(x0, y0) + to_pt(x1, y1)
+        for x0, y0, x1, y1 in interior_segments(vertices_ft, interior_count, rng)
+    ]
+    openings = place_openings(vertices_ft, opening_counts or {}, opening_schedule, rng)
+    opening_segments, opening_curves, opening_text = [], [], []
+    for opening in openings:
+        segments, curves, text = opening_symbol(opening, vertices_ft, to_pt)
+        opening_segments += segments
+        opening_curves += curves
+        opening_text += text
+    bar_segments, bar_text, bar_truth = scale_bar(MARGIN, MARGIN, points_per_foot, scale_label)
+    tb_segments, tb_text = title_block(sheet_number, f"FLOOR PLAN - LEVEL {level}")
+
+    page = {
+        "segments": outline + interior + opening_segments + bar_segments + tb_segments,
+        "curves": opening_curves,
+        "text": [(MARGIN, sheet_h - MARGIN, 18, f"FLOOR PLAN - LEVEL {level}")]
+                + opening_text + bar_text + tb_text,
+    }
+    truth = {
+        "type": "floor_plan",
+        "sheet_number": sheet_number,
+        "level": level,
+        "outline": {
+            "vertices_ft": [list(v) for v in vertices_ft],
+            "vertices_pt": [list(v) for v in vertices_pt],
+            "perimeter_ft": polygon_perimeter(vertices_ft),
+            "area_sqft": polygon_area(vertices_ft),
+            "segments": len(outline),
+        },
+        "interior_segments": len(interior),
+        "openings": openings,
+        "opening_sqft": sum(o["width_ft"] * o["height_ft"] for o in openings),
+        "scale_bar": bar_truth,
+        "total_segments": len(page["segments"]),
+    }
+    return page, truth
+
+
+def schedule_page(rows, sheet_number, opening_rows=None):
+    """Build a wall (and optional door/window) schedule page and its ground truth"""
+    sheet_w, sheet_h = SHEET_SIZE
+    table_segments, table_text = schedule_table(rows, MARGIN, sheet_h - 2 * MARGIN)
+    if opening_rows:
+        top = sheet_h - 2 * MARGIN - (len(rows) + 1) * 24 - 96
+        segments, text = opening_schedule_table(opening_rows, MARGIN, top)
+        table_segments += segments
+        table_text += text
+    tb_segments, tb_text = title_block(sheet_number, "WALL SCHEDULE")
+    page = {"segments": table_segments + tb_segments, "text": table_text + tb_text}
+    truth = {
+        "type": "schedule",
+        "sheet_number": sheet_number,
+        "rows": rows,
+        "opening_rows": opening_rows or [],
+        "total_segments": len(page["segments"]),
+    }
+    return page, truth
+
+
+def generate_plan_set(path, levels=3, shape="rectangle", width_ft=130.0, depth_ft=130.0,
+                      outline_segments=100, interior_segments=0,
+                      scale='1/8" = 1\'-0"', vary_levels=False, schedule=None,
+                      doors=0, windows=0, opening_schedule=None,
+                      seed=0, ground_truth_path=None):
+    """
+    Write a multi-page plan set (one floor plan per level plus a wall
+    schedule) and a JSON ground-truth file next to it.
+
+    With `vary_levels`, each level above the first is set back by a random
+    amount so footprints differ between floors; otherwise every level is
+    an identical typical floor. `doors` and `windows` place that many
+    openings on each floor, tagged with marks from a door/window schedule
+    drawn on the schedule sheet. Returns the ground truth.
+    """
+    if scale not in SCALES:
+        raise ValueError(f"Unknown scale '{scale}'. Use one of {list(SCALES)}")
+    rng = random.Random(seed)
+    points_per_foot = SCALES[scale]
+    schedule = schedule or DEFAULT_SCHEDULE
+    opening_schedule = opening_schedule or DEFAULT_OPENING_SCHEDULE
+    opening_counts = {"door": doors, "window": windows}
+
+    pages = []
+    truths = []
+    base = outline_vertices(shape, width_ft, depth_ft)
+    for i in range(levels):
+        vertices = base
+        if vary_levels and i > 0:
+            setback = rng.uniform(2.0, min(width_ft, depth_ft) / 10)
+            vertices = outline_vertices(shape, width_ft - setback, depth_ft - setback)
+        # Interior layout is seeded by the footprint, so typical floors repeat
+        page, truth = floor_plan_page(
+            vertices, outline_segments, interior_segments, points_per_foot,
+            scale, f"A-{101 + i}", _level_name(i), random.Random(f"{seed}:{vertices}"),
+            opening_counts, opening_schedule,
+        )
+        pages.append(page)
+        truths.append(truth)
+
+    page, truth = schedule_page(schedule, "A-501", opening_schedule if doors or windows else None)
+    pages.append(page)
+    truths.append(truth)
+
+    write_pdf(path, pages)
+
+    ground_truth = {
+        "pdf": path,
+        "sheet_size_pt": list(SHEET_SIZE),
+        "coordinate_origin": "bottom-left",
+        "scale": {"notation": scale, "points_per_foot": points_per_foot},
+        "seed": seed,
+        "pages": [dict(truth, page=n) for n, truth in enumerate(truths, start=1)],
+    }
+    ground_truth_path = ground_truth_path or path.rsplit(".", 1)[0] + ".json"
+    with open(ground_truth_path, "w") as f:
+        json.dump(ground_truth, f, indent=2)
+    return ground_truth
+
+
+def write_scanned_copy(src_path, dst_path, dpi=300, strip_px=512):
+    """
+    Rasterize a plan set into an image-only PDF, as if it had been scanned.
+
+    Pages are rendered in horizontal strips and compressed incrementally,
+    so memory stays bounded even for E-size sheets at 600 DPI.
+    """
+    import pypdfium2 as pdfium
+
+    document = pdfium.PdfDocument(src_path)
+    pages = []
+    try:
+        for page in document:
+            width_pt, height_pt = page.get_size()
+            strip_pt = strip_px * 72 / dpi
+            compressor = zlib.compressobj(6)
+            chunks = []
+            width_px = height_px = 0
+            top = 0.0
+            while top < height_pt:
+                bottom = min(height_pt, top + strip_pt)
+                bitmap = page.render(
+                    scale=dpi / 72,
+                    crop=(0, height_pt - bottom, 0, top),
+                    grayscale=True,
+                )
+                strip = bitmap.to_numpy()
+                height_px += strip.shape[0]
+                width_px = strip.shape[1]
+                chunks.append(compressor.compress(strip.tobytes()))
+                bitmap.close()
+                top = bottom
+            chunks.append(compressor.flush())
+            pages.append({
+                "size": (width_pt, height_pt),
+                "image": {"width_px": width_px, "height_px": height_px, "data": b"".join(chunks)},
+            })
+            page.close()
+    finally:
+        document.close()
+    write_pdf(dst_path, pages)
+    return dst_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic floor-plan PDFs with ground truth")
+    parser.add_argument("output", help="PDF path; ground truth is written alongside as .json")
+    parser.add_argument("--levels", type=int, default=3)
+    parser.add_argument("--shape", choices=SHAPES, default="rectangle")
+    parser.add_argument("--width", type=float, default=130.0, help="Footprint width (ft)")
+    parser.add_argument("--depth", type=float, default=130.0, help="Footprint depth (ft)")
+    parser.add_argument("--outline-segments", type=int, default=100)
+    parser.add_argument("--interior-segments", type=int, default=0)
+    parser.add_argument("--scale", choices=list(SCALES), default='1/8" = 1\'-0"')
+    parser.add_argument("--vary-levels", action="store_true")
+    parser.add_argument("--doors", type=int, default=0, help="Doors per floor")
+    parser.add_argument("--windows", type=int, default=0, help="Windows per floor")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scanned-dpi", type=int,
+                        help="Also write an image-only copy (<output>-scanned.pdf) at this DPI")
+    args = parser.parse_args()
+
+    truth = generate_plan_set(
+        args.output, levels=args.levels, shape=args.shape,
+        width_ft=args.width, depth_ft=args.depth,
+        outline_segments=args.outline_segments, interior_segments=args.interior_segments,
+        scale=args.scale, vary_levels=args.vary_levels,
+        doors=args.doors, windows=args.windows, seed=args.seed,
+    )
+    print(f"Wrote {len(truth['pages'])} pages to {args.output}")
+    if args.scanned_dpi:
+        scanned = args.output.rsplit(".", 1)[0] + "-scanned.pdf"
+        write_scanned_copy(args.output, scanned, dpi=args.scanned_dpi)
+        print(f"Wrote scanned copy to {scanned}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+"""
+EcoSeal Takeoff System - Project Revisions
+Copy-on-write takeoff snapshots and revision diffs
+
+A revision does not copy a project's takeoffs. Each distinct takeoff row is
+stored once as an immutable version keyed by a fingerprint of its values,
+and a revision records only the versions added or removed relative to its
+parent (signed counts). Summing the counts along a revision's chain gives
+its takeoffs, so storage grows with what changed between issues of a
+drawing set rather than with revisions x project size.
+"""
+
+import hashlib
+import json
+from collections import Counter
+
+# Takeoff values captured in a version; ids and timestamps are not
+FIELDS = (
+    "level", "wall_type", "material_type", "quantity", "unit", "assembly",
+    "r_value", "perimeter_ft", "height_ft", "confidence", "deductions",
+)
+
+
+def snapshot(row):
+    """The versioned values of a takeoff row (ORM object or dict)"""
+    get = row.get if isinstance(row, dict) else lambda name: getattr(row, name)
+    return {name: get(name) for name in FIELDS}
+
+
+def fingerprint(values):
+    """Stable content hash of a snapshot"""
+    canonical = json.dumps(values, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def changes(parent, current):
+    """
+    Signed count changes turning `parent` into `current`, both
+    {fingerprint: count}. Unchanged rows produce nothing.
+    """
+    delta = Counter(current)
+    delta.subtract(parent)
+    return {key: count for key, count in delta.items() if count}
+
+
+def _totals(rows):
+    by_level, by_material = Counter(), Counter()
+    for row in rows:
+        by_level[(row["level"], row["material_type"])] += row["quantity"] or 0.0
+        by_material[row["material_type"]] += row["quantity"] or 0.0
+    return by_level, by_material
+
+
+def diff(base, head):
+    """
+    Quantity deltas between two lists of takeoff snapshots, by level and
+    material and by material alone. Levels whose quantity did not move are
+    left out.
+    """
+    base_levels, base_materials = _totals(base)
+    head_levels, head_materials = _totals(head)
+
+    levels = []
+    for level, material in sorted(set(base_levels) | set(head_levels)):
+        before = base_levels.get((level, material), 0.0)
+        after = head_levels.get((level, material), 0.0)
+        if round(after - before, 1):
+            levels.append({
+                "level": level,
+                "material_type": material,
+                "base": round(before, 1),
+                "head": round(after, 1),
+                "delta": round(after - before, 1),
+            })
+    materials = {
+        material: {
+            "base": round(base_materials.get(material, 0.0), 1),
+            "head": round(head_materials.get(material, 0.0), 1),
+            "delta": round(head_materials.get(material, 0.0) - base_materials.get(material, 0.0), 1),
+        }
+        for material in sorted(set(base_materials) | set(head_materials))
+    }
+    base_total, head_total = sum(base_materials.values()), sum(head_materials.values())
+    return {
+        "levels": levels,
+        "materials": materials,
+        "total": {
+            "base": round(base_total, 1),
+            "head": round(head_total, 1),
+            "delta": round(head_total - base_total, 1),
+        },
+    }
@@ -0,0 +1,231 @@
+"""
+EcoSeal Takeoff System - Project Search
+Full-text index over projects and their takeoffs
+
+One document per project: name, notes, and the level / wall type /
+material / assembly / R-value terms of its takeoffs. On SQLite the index is
+an FTS5 table ranked with bm25; on PostgreSQL it is a weighted tsvector
+with a GIN index ranked with ts_rank. Either way database triggers keep it
+current on every insert, update and delete, so writes made anywhere
+(including bulk takeoff calculation) are searchable immediately and a
+search never scans the projects table.
+"""
+
+import json
+import logging
+import re
+from contextlib import contextmanager
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Relative weight of each indexed field (name, notes, takeoff terms)
+WEIGHTS = (10.0, 2.0, 1.0)
+
+# Broad queries rank only their most recent matches; scoring every one of
+# tens of thousands of hits is what makes full-text search slow
+RANK_WINDOW = 1000
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+
+# Takeoff terms for one project, as a single SQL expression
+_SQLITE_TERMS = """(
+    SELECT group_concat(
+        coalesce(level, '') || ' ' || coalesce(wall_type, '') || ' ' || coalesce(material_type, '')
+        || ' ' || coalesce(assembly, '') || ' ' || coalesce(r_value, ''), ' ')
+    FROM takeoffs WHERE project_id = {pid}
+)"""
+
+SQLITE_DDL = [
+    "CREATE TABLE project_search_deferred (id integer)",
+    "CREATE VIRTUAL TABLE project_search USING fts5(name, notes, takeoffs, tokenize='porter unicode61')",
+    """CREATE TRIGGER project_search_project_insert AFTER INSERT ON projects
+    WHEN NOT EXISTS (SELECT 1 FROM project_search_deferred) BEGIN
+        INSERT INTO project_search (rowid, name, notes, takeoffs)
+        VALUES (new.id, new.name, new.notes, coalesce(""" + _SQLITE_TERMS.format(pid="new.id") + """, ''));
+    END""",
+    """CREATE TRIGGER project_search_project_update AFTER UPDATE OF name, notes ON projects
+    WHEN NOT EXISTS (SELECT 1 FROM project_search_deferred) BEGIN
+        UPDATE project_search SET name = new.name, notes = new.notes WHERE rowid = new.id;
+    END""",
+    """CREATE TRIGGER project_search_project_delete AFTER DELETE ON projects
+    WHEN NOT EXISTS (SELECT 1 FROM project_search_deferred) BEGIN
+        DELETE FROM project_search WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER project_search_takeoff_insert AFTER INSERT ON takeoffs
+    WHEN NOT EXISTS (SELECT 1 FROM project_search_deferred) BEGIN
+        UPDATE project_search SET takeoffs = coalesce(""" + _SQLITE_TERMS.format(pid="new.project_id") + """, '')
+        WHERE rowid = new.project_id;
+    END""",
+    """CREATE TRIGGER project_search_takeoff_update
+    AFTER UPDATE OF project_id, level, wall_type, material_type, assembly, r_value ON takeoffs
+    WHEN NOT EXISTS (SELECT 1 FROM project_search_deferred) BEGIN
+        UPDATE project_search SET takeoffs = coalesce(""" + _SQLITE_TERMS.format(pid="old.project_id") + """, '')
+        WHERE rowid = old.project_id;
+        UPDATE project_search SET takeoffs = coalesce(""" + _SQLITE_TERMS.format(pid="new.project_id") + """, '')
+        WHERE rowid = new.project_id;
+    END""",
+    """CREATE TRIGGER project_search_takeoff_delete AFTER DELETE ON takeoffs
+    WHEN NOT EXISTS (SELECT 1 FROM project_search_deferred) BEGIN
+        UPDATE project_search SET takeoffs = coalesce(""" + _SQLITE_TERMS.format(pid="old.project_id") + """, '')
+        WHERE rowid = old.project_id;
+    END""",
+    # Backfill projects that existed before the index
+    """INSERT INTO project_search (rowid, name, notes, takeoffs)
+    SELECT p.id, p.name, p.notes, coalesce(""" + _SQLITE_TERMS.format(pid="p.id") + """, '') FROM projects p""",
+]
+
+# Rebuild the documents of the projects in :ids (a JSON array)
+SQLITE_REFRESH = [
+    "DELETE FROM project_search WHERE rowid IN (SELECT value FROM json_each(:ids))",
+    """INSERT INTO project_search (rowid, name, notes, takeoffs)
+    SELECT p.id, p.name, p.notes, coalesce(""" + _SQLITE_TERMS.format(pid="p.id") + """, '')
+    FROM projects p WHERE p.id IN (SELECT value FROM json_each(:ids))""",
+]
+
+POSTGRES_DDL = [
+    "CREATE TABLE project_search_deferred (id integer)",
+    "CREATE TABLE project_search (project_id integer PRIMARY KEY, document tsvector NOT NULL)",
+    "CREATE INDEX project_search_document ON project_search USING GIN (document)",
+    """CREATE FUNCTION project_search_refresh(pid integer) RETURNS void AS $$
+        DELETE FROM project_search WHERE project_id = pid;
+        INSERT INTO project_search (project_id, document)
+        SELECT p.id,
+            setweight(to_tsvector('english', coalesce(p.name, '')), 'A') ||
+            setweight(to_tsvector('english', coalesce(p.notes, '')), 'B') ||
+            setweight(to_tsvector('english', coalesce((
+                SELECT string_agg(concat_ws(' ', t.level, t.wall_type, t.material_type, t.assembly, t.r_value), ' ')
+                FROM takeoffs t WHERE t.project_id = p.id
+            ), '')), 'C')
+        FROM projects p WHERE p.id = pid;
+    $$ LANGUAGE sql""",
+    """CREATE FUNCTION project_search_project_changed() RETURNS trigger AS $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM project_search_deferred) THEN RETURN NULL; END IF;
+        PERFORM project_search_refresh(CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END);
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE FUNCTION project_search_takeoff_changed() RETURNS trigger AS $$
+    BEGIN
+        IF EXISTS (SELECT 1 FROM project_search_deferred) THEN RETURN NULL; END IF;
+        IF TG_OP <> 'INSERT' THEN PERFORM project_search_refresh(OLD.project_id); END IF;
+        IF TG_OP <> 'DELETE' AND (TG_OP = 'INSERT' OR NEW.project_id <> OLD.project_id) THEN
+            PERFORM project_search_refresh(NEW.project_id);
+        END IF;
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+    """CREATE TRIGGER project_search_project AFTER INSERT OR DELETE OR UPDATE OF name, notes
+    ON projects FOR EACH ROW EXECUTE FUNCTION project_search_project_changed()""",
+    """CREATE TRIGGER project_search_takeoff
+    AFTER INSERT OR DELETE OR UPDATE OF project_id, level, wall_type, material_type, assembly, r_value
+    ON takeoffs FOR EACH ROW EXECUTE FUNCTION project_search_takeoff_changed()""",
+    "SELECT project_search_refresh(id) FROM projects",
+]
+
+POSTGRES_REFRESH = [
+    "SELECT project_search_refresh(id) FROM unnest(CAST(:ids AS integer[])) AS id",
+]
+
+
+def install(engine):
+    """Create the index, its triggers and backfill it, once per database"""
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        exists = "SELECT 1 FROM sqlite_master WHERE name = 'project_search'"
+        ddl = SQLITE_DDL
+    elif dialect == "postgresql":
+        exists = "SELECT 1 FROM pg_class WHERE relname = 'project_search'"
+        ddl = POSTGRES_DDL
+    else:
+        logger.warning(f"Project search is not supported on {dialect}")
+        return False
+    with engine.begin() as conn:
+        if conn.execute(text(exists)).first() is None:
+            for statement in ddl:
+                conn.execute(text(statement))
+            logger.info(f"Created project search index ({dialect})")
+    return True
+
+
+@contextmanager
+def deferred(connection):
+    """
+    Suspend the index triggers for a bulk write on `connection`.
+
+        with search.deferred(db.connection()) as touched:
+            ...bulk insert...
+            touched.update(project_ids)
+
+    The suspension is a row only the writing transaction can see, so
+    other connections keep indexing as usual. On exit the documents of the
+    projects added to `touched` are rebuilt in one pass.
+    """
+    touched = set()
+    connection.execute(text("INSERT INTO project_search_deferred (id) VALUES (1)"))
+    try:
+        yield touched
+    finally:
+        connection.execute(text("DELETE FROM project_search_deferred"))
+    if touched:
+        ids = sorted(touched)
+        if connection.dialect.name == "sqlite":
+            for statement in SQLITE_REFRESH:
+                connection.execute(text(statement), {"ids": json.dumps(ids)})
+        else:
+            for statement in POSTGRES_REFRESH:
+                connection.execute(text(statement), {"ids": ids})
+
+
+def _terms(query):
+    return [token.lower() for token in TOKEN.findall(query)]
+
+
+# Per dialect: the match expression, count, rank-window cutoff and ranked page
+QUERIES = {
+    "sqlite": {
+        "count": "SELECT count(*) FROM project_search WHERE project_search MATCH :match",
+        "cutoff": "SELECT rowid FROM project_search WHERE project_search MATCH :match "
+                  "ORDER BY rowid DESC LIMIT 1 OFFSET :window",
+        "page": "SELECT rowid, -bm25(project_search, :w0, :w1, :w2) AS score FROM project_search "
+                "WHERE project_search MATCH :match AND rowid >= :cutoff "
+                "ORDER BY score DESC, rowid DESC LIMIT :limit OFFSET :offset",
+    },
+    "postgresql": {
+        "count": "SELECT count(*) FROM project_search WHERE document @@ to_tsquery('english', :match)",
+        "cutoff": "SELECT project_id FROM project_search WHERE document @@ to_tsquery('english', :match) "
+                  "ORDER BY project_id DESC LIMIT 1 OFFSET :window",
+        "page": "SELECT project_id, ts_rank(CAST(:weights AS real[]), document, to_tsquery('english', :match)) AS score "
+                "FROM project_search WHERE document @@ to_tsquery('english', :match) AND project_id >= :cutoff "
+                "ORDER BY score DESC, project_id DESC LIMIT :limit OFFSET :offset",
+    },
+}
+
+def search(db, query, limit=20, offset=0):
+    """
+    Ranked project ids matching every word of `query`, the last word also
+    as a prefix so results follow typing. Returns (total, [(project_id, score), ...]),
+    best first.
+
+    When more than RANK_WINDOW projects match, only the newest RANK_WINDOW
+    are ranked, unless the requested page reaches past them.
+    """
+    terms = _terms(query)
+    if not terms:
+        return 0, []
+    dialect = db.get_bind().dialect.name
+    sql = QUERIES[dialect]
+    if dialect == "sqlite":
+        params = {"match": " ".join(f'"{term}"' for term in terms) + "*",
+                  "w0": WEIGHTS[0], "w1": WEIGHTS[1], "w2": WEIGHTS[2]}
+    else:
+        # ts_rank weights are ordered {D, C, B, A}
+        params = {"match": " & ".join(terms) + ":*",
+                  "weights": "{" + ",".join(str(w / WEIGHTS[0]) for w in (0.0,) + WEIGHTS[::-1]) + "}"}
+
+    total = db.execute(text(sql["count"]), params).scalar()
+    cutoff = 0
+    if total > RANK_WINDOW and offset + limit <= RANK_WINDOW:
+        cutoff = db.execute(text(sql["cutoff"]), dict(params, window=RANK_WINDOW - 1)).scalar()
+    rows = db.execute(text(sql["page"]), dict(params, cutoff=cutoff, limit=limit, offset=offset)).all()
+    return total, [(project_id, float(score)) for project_id, score in rows]
@@ -0,0 +1,121 @@
+"""
+EcoSeal Takeoff System - Segment Store
+Compact columnar storage for the boundary edges behind each takeoff row
+
+A takeoff row keeps one blob holding every one of its wall segments as
+packed little-endian column arrays (struct of arrays), not one database
+row per segment. A blob is a small JSON header followed by 8-byte aligned
+column buffers, so loading is a single read plus np.frombuffer per column
+with no per-segment Python objects.
+"""
+
+import json
+import struct
+
+import numpy as np
+
+MAGIC = b"ESG1"
+
+# Column name -> dtype, in storage order
+COLUMNS = {
+    "edge": "<u4",          # boundary edge index on the page
+    "x0": "<f4",            # page points, top-left origin
+    "y0": "<f4",
+    "x1": "<f4",
+    "y1": "<f4",
+    "length_ft": "<f4",
+    "door_sqft": "<f4",
+    "window_sqft": "<f4",
+    "assembly": "<u2",      # index into the header's assembly table
+}
+
+ALIGN = 8
+
+
+def _pad(n):
+    return -n % ALIGN
+
+
+def pack(columns, assemblies, **meta):
+    """
+    Pack segment columns into a blob.
+
+    `columns` maps every name in COLUMNS to an array of equal length;
+    `assemblies` is the string table the "assembly" column indexes into.
+    Extra keyword arguments are kept in the header (page, points_per_foot...).
+    """
+    count = len(columns["x0"])
+    header = json.dumps({
+        "count": count,
+        "columns": list(COLUMNS.items()),
+        "assemblies": list(assemblies),
+        "meta": meta,
+    }).encode()
+    parts = [MAGIC, struct.pack("<I", len(header)), header, b"\0" * _pad(8 + len(header))]
+    for name, dtype in COLUMNS.items():
+        data = np.ascontiguousarray(columns[name], dtype=dtype).tobytes()
+        if len(data) != count * np.dtype(dtype).itemsize:
+            raise ValueError(f"Column '{name}' has the wrong length")
+        parts.append(data)
+        parts.append(b"\0" * _pad(len(data)))
+    return b"".join(parts)
+
+
+def unpack(blob):
+    """
+    Read a blob back into ({name: array}, header).
+
+    Arrays are read-only views onto the blob; nothing is copied.
+    """
+    if blob[:4] != MAGIC:
+        raise ValueError("Not a segment blob")
+    (header_len,) = struct.unpack_from("<I", blob, 4)
+    header = json.loads(blob[8:8 + header_len])
+    offset = 8 + header_len + _pad(8 + header_len)
+    count = header["count"]
+    columns = {}
+    for name, dtype in header["columns"]:
+        columns[name] = np.frombuffer(blob, dtype=dtype, count=count, offset=offset)
+        size = count * np.dtype(dtype).itemsize
+        offset += size + _pad(size)
+    return columns, header
+
+
+def from_edges(edges, assembly, **meta):
+    """Pack the per-edge arrays of one openings.deduct row"""
+    coords = np.asarray(edges["coords"], dtype=float).reshape(-1, 4)
+    return pack({
+        "edge": edges["index"],
+        "x0": coords[:, 0],
+        "y0": coords[:, 1],
+        "x1": coords[:, 2],
+        "y1": coords[:, 3],
+        "length_ft": edges["length_ft"],
+        "door_sqft": edges["door_sqft"],
+        "window_sqft": edges["window_sqft"],
+        "assembly": np.zeros(len(coords)),
+    }, [assembly], **meta)
+
+
+def load(blobs):
+    """
+    Concatenate several blobs (e.g. every takeoff in a project) into one
+    set of columns.
+
+    `blobs` is a list of (owner_id, blob). Assemblies are decoded to
+    strings and an "owner" column records which blob each segment came
+    from.
+    """
+    parts, owners, assemblies = [], [], []
+    for owner, blob in blobs:
+        columns, header = unpack(blob)
+        parts.append(columns)
+        owners.append(np.full(header["count"], owner))
+        table = np.array(header["assemblies"], dtype=object)
+        assemblies.append(table[columns["assembly"]] if len(table) else np.empty(0, dtype=object))
+    if not parts:
+        return {name: np.empty(0, dtype=dtype) for name, dtype in COLUMNS.items()} | {"owner": np.empty(0)}
+    merged = {name: np.concatenate([p[name] for p in parts]) for name in COLUMNS}
+    merged["assembly"] = np.concatenate(assemblies)
+    merged["owner"] = np.concatenate(owners)
+    return merged
@@ -0,0 +1,115 @@
+"""
+EcoSeal Takeoff System - Change Feed
+Sequence-numbered changes to projects, takeoffs and settings for delta sync
+
+Every insert, update and delete on a synced table is recorded by a
+database trigger in `change_log` under a new, ever-increasing `seq`. The
+log keeps one entry per row - its latest change - so it stays as small as
+the tables themselves, and a deleted row leaves a tombstone entry instead
+of disappearing. A client that last synced at `seq` N asks for entries
+above N and gets each changed row's current values or its tombstone.
+
+Triggers catch every write path, including bulk imports that bypass the
+ORM. On PostgreSQL the trigger takes a transaction-level advisory lock so
+sequence numbers are committed in order; otherwise a client could sync
+past a lower number that was still uncommitted and miss that change.
+"""
+
+import logging
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Tables clients can sync, each with an integer `id` primary key
+TABLES = ("projects", "takeoffs", "settings")
+
+# Change entries returned per sync request, at most
+MAX_CHANGES = 5000
+
+# Advisory lock key serializing change-log writers on PostgreSQL
+_POSTGRES_LOCK = 7104271
+
+SQLITE_DDL = [
+    """CREATE TABLE change_log (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        table_name TEXT NOT NULL,
+        row_id INTEGER NOT NULL,
+        deleted INTEGER NOT NULL DEFAULT 0
+    )""",
+    "CREATE UNIQUE INDEX change_log_row ON change_log (table_name, row_id)",
+]
+for _table in TABLES:
+    # REPLACE drops the row's previous entry, so the new one gets a new seq
+    SQLITE_DDL += [
+        f"""CREATE TRIGGER change_log_{_table}_insert AFTER INSERT ON {_table} BEGIN
+            REPLACE INTO change_log (table_name, row_id, deleted) VALUES ('{_table}', new.id, 0);
+        END""",
+        f"""CREATE TRIGGER change_log_{_table}_update AFTER UPDATE ON {_table} BEGIN
+            REPLACE INTO change_log (table_name, row_id, deleted) VALUES ('{_table}', new.id, 0);
+        END""",
+        f"""CREATE TRIGGER change_log_{_table}_delete AFTER DELETE ON {_table} BEGIN
+            REPLACE INTO change_log (table_name, row_id, deleted) VALUES ('{_table}', old.id, 1);
+        END""",
+        # Existing rows start the log
+        f"INSERT INTO change_log (table_name, row_id) SELECT '{_table}', id FROM {_table} ORDER BY id",
+    ]
+
+POSTGRES_DDL = [
+    """CREATE TABLE change_log (
+        seq bigserial PRIMARY KEY,
+        table_name text NOT NULL,
+        row_id integer NOT NULL,
+        deleted boolean NOT NULL DEFAULT false,
+        UNIQUE (table_name, row_id)
+    )""",
+    f"""CREATE FUNCTION change_log_record() RETURNS trigger AS $$
+    DECLARE
+        rid integer := CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END;
+    BEGIN
+        PERFORM pg_advisory_xact_lock({_POSTGRES_LOCK});
+        DELETE FROM change_log WHERE table_name = TG_TABLE_NAME AND row_id = rid;
+        INSERT INTO change_log (table_name, row_id, deleted) VALUES (TG_TABLE_NAME, rid, TG_OP = 'DELETE');
+        RETURN NULL;
+    END $$ LANGUAGE plpgsql""",
+]
+for _table in TABLES:
+    POSTGRES_DDL += [
+        f"""CREATE TRIGGER change_log_{_table} AFTER INSERT OR UPDATE OR DELETE ON {_table}
+        FOR EACH ROW EXECUTE FUNCTION change_log_record()""",
+        f"INSERT INTO change_log (table_name, row_id) SELECT '{_table}', id FROM {_table} ORDER BY id",
+    ]
+
+
+def install(engine):
+    """Create the change log and its triggers, seeded with existing rows, once per database"""
+    dialect = engine.dialect.name
+    if dialect == "sqlite":
+        exists = "SELECT 1 FROM sqlite_master WHERE name = 'change_log'"
+        ddl = SQLITE_DDL
+    elif dialect == "postgresql":
+        exists = "SELECT 1 FROM pg_class WHERE relname = 'change_log'"
+        ddl = POSTGRES_DDL
+    else:
+        logger.warning(f"Change feed is not supported on {dialect}")
+        return False
+    with engine.begin() as conn:
+        if conn.execute(text(exists)).first() is None:
+            for statement in ddl:
+                conn.execute(text(statement))
+            logger.info(f"Created change log ({dialect})")
+    return True
+
+
+def changes(db, since=0, limit=MAX_CHANGES):
+    """
+    Change entries after `since`, oldest first: (entries, more) where
+    entries are (seq, table_name, row_id, deleted) and `more` says whether
+    further entries were left for the next request.
+    """
+    rows = db.execute(
+        text("SELECT seq, table_name, row_id, deleted FROM change_log WHERE seq > :since ORDER BY seq LIMIT :limit"),
+        {"since": since, "limit": limit + 1},
+    ).all()
+    return [(seq, table, row_id, bool(deleted)) for seq, table, row_id, deleted in rows[:limit]], len(rows) > limit
+
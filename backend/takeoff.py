@@ -0,0 +1,311 @@
+"""
+EcoSeal Takeoff System - Takeoff Calculation
+Turns an indexed plan set into takeoff rows: boundary perimeter x floor
+height per level and wall type, less door and window openings
+
+Calculation runs on an incremental dependency graph (see incremental.py):
+
+    pages -> scale, boundary -> openings (all plan pages, batched)
+          -> floor rows (floor spec + boundary + openings) -> summary
+
+Changing one floor's height or assembly re-runs only that floor's row and
+the summary; PDF extraction and boundary tracing are never repeated for a
+plan set that is already loaded.
+"""
+
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import boundary
+import extraction
+import incremental
+import openings
+import segment_store
+import workers
+from assemblies import r_number
+
+logger = logging.getLogger(__name__)
+
+# Plan sets whose graphs are kept in memory
+GRAPH_CACHE_SIZE = int(os.getenv("TAKEOFF_GRAPH_CACHE", "8"))
+
+
+def _normalise_level(level):
+    return (level or "").replace(" ", "").upper()
+
+
+def floor_pages(floors, plan_pages):
+    """
+    Map each floor to its plan page number.
+
+    Floors may name a page explicitly; otherwise the indexed floor plan
+    with the same level is used. Floors without a plan of their own (a roof
+    parapet, say) map to None and reuse the floor below.
+    """
+    by_level = {}
+    for page in plan_pages:
+        if page["page_type"] == "floor_plan" and page.get("level"):
+            by_level.setdefault(_normalise_level(page["level"]), page["page_number"])
+    return [
+        floor.get("page_number") or by_level.get(_normalise_level(floor["level"]))
+        for floor in floors
+    ]
+
+
+def _scale(page):
+    return extraction.detect_scale(page["words"])
+
+
+def _schedule(*pages):
+    schedule = {}
+    for page in pages:
+        schedule.update(openings.parse_schedule(page["words"]))
+    return schedule
+
+
+def _row(floor, result=None, scale=None, found_by_page=None):
+    """One floor's takeoff row from its spec, boundary and openings"""
+    ppf = scale["points_per_foot"] if scale else None
+    found = [] if floor["carried"] or result is None else found_by_page.get(floor["page_number"], [])
+    level = {
+        "page": {},
+        "polygon": result["polygon"] if result else [],
+        "points_per_foot": ppf,
+        "height_ft": floor["height_ft"],
+        "wall_type": floor["wall_type"],
+    }
+    # Without a scale the boundary is in points, not feet: no quantity at all
+    rows = openings.deduct([level], found) if ppf else []
+    row = rows[0] if rows else None
+
+    if row is None:
+        confidence = "RED"
+    elif floor["carried"] or row["deductions"]["unscheduled"]:
+        confidence = "YELLOW"
+    else:
+        confidence = "GREEN"
+    return {
+        "level": floor["level"],
+        "wall_type": floor["wall_type"],
+        "material_type": floor.get("material_type", "ccSPF"),
+        "quantity": round(row["net_sqft"], 1) if row else 0.0,
+        "unit": "sqft",
+        "assembly": floor["assembly"],
+        "r_value": floor["r_value"],
+        "perimeter_ft": round(row["perimeter_ft"], 1) if row else 0.0,
+        "height_ft": floor["height_ft"],
+        "confidence": confidence,
+        "deductions": row["deductions"] if row else None,
+        "segments": segment_store.from_edges(
+            row["edges"], floor["assembly"],
+            page=floor["page_number"], points_per_foot=ppf,
+        ) if row else None,
+    }
+
+
+def page_rows(page, floors, schedule=None, engine=None):
+    """
+    Takeoff rows for the floors on one extracted plan page, computed
+    directly rather than through a TakeoffGraph: scale, boundary, openings
+    and rows in one call, for processing pages independently. The first
+    floor is the page's own; any after it are carried from it (a parapet
+    on the floor below), as in TakeoffGraph.update.
+    """
+    scale = _scale(page)
+    ppf = scale["points_per_foot"] if scale else None
+    result = (engine or boundary.BoundaryEngine()).extract(
+        page["page"], page["segments"], ppf, (page["width"], page["height"])
+    )
+    found = openings.detect_openings(
+        [{"page": page, "polygon": result["polygon"], "points_per_foot": ppf}], schedule
+    )
+    found_by_page = {page["page"]: found}
+    return [
+        _row(dict(floor, page_number=page["page"], carried=i > 0), result, scale, found_by_page)
+        for i, floor in enumerate(floors)
+    ]
+
+
+def summarize(*rows):
+    """
+    Project totals: area per material, gross/net area, weighted R-value.
+    Rows without a deduction breakdown (entered by hand) count their
+    quantity as gross area.
+    """
+    materials = {}
+    weighted, weight = 0.0, 0.0
+    for row in rows:
+        materials[row["material_type"]] = materials.get(row["material_type"], 0.0) + row["quantity"]
+        r = r_number(row["r_value"])
+        if r is not None and row["quantity"]:
+            weighted += r * row["quantity"]
+            weight += row["quantity"]
+    deductions = [row["deductions"] for row in rows if row["deductions"]]
+    return {
+        "levels": len(rows),
+        "gross_sqft": round(sum(d["gross_sqft"] for d in deductions)
+                            + sum(row["quantity"] for row in rows if not row["deductions"]), 1),
+        # What deduct actually took off: openings are capped at the wall's gross area
+        "deduction_sqft": round(sum(d["gross_sqft"] - d["net_sqft"] for d in deductions), 1),
+        "net_sqft": round(sum(row["quantity"] for row in rows), 1),
+        "materials": {m: round(q, 1) for m, q in sorted(materials.items())},
+        "avg_r_value": round(weighted / weight, 1) if weight else None,
+        "confidence": {
+            c: sum(row["confidence"] == c for row in rows) for c in ("GREEN", "YELLOW", "RED")
+        },
+    }
+
+
+class TakeoffGraph:
+    """
+    Incremental takeoff calculation for one plan set.
+
+    Node keys:
+        ("page", n)       extracted page (input; a stored plan set never changes)
+        ("scale", n)      detected scale notation
+        ("boundary", n)   traced outline
+        ("schedule",)     door/window schedule from the schedule pages
+        ("openings",)     openings on every plan page in use, detected in one batch
+        ("floor", level)  floor spec from the user (input)
+        ("row", level)    takeoff row for one floor
+        ("summary",)      project totals
+    """
+
+    def __init__(self, path, plan_pages, pool=None):
+        self.path = path
+        self.plan_pages = plan_pages
+        self.pool = pool  # workers.WorkerPool for extraction; in-process without one
+        self.failed = {}  # page number -> why extraction failed
+        self.graph = incremental.Graph()
+        self.engine = boundary.BoundaryEngine()
+        self.lock = threading.Lock()
+        self.schedule_pages = [p["page_number"] for p in plan_pages if p["page_type"] == "schedule"]
+
+    def _load_pages(self, numbers):
+        # Failed pages are retried on every update; a worker timeout or
+        # recycle should not leave a page RED for as long as the graph lives
+        missing = [n for n in numbers if ("page", n) not in self.graph or n in self.failed]
+        if not missing:
+            return
+        if self.pool is None:
+            for page in extraction.extract_pdf(self.path, missing):
+                self.graph.input(("page", page["page"]), page)
+            return
+        # One task per page, so a page that fails costs only itself
+        name = os.path.basename(self.path)
+        futures = {
+            n: self.pool.submit(extraction.extract_pdf, self.path, [n], description=f"{name} page {n}")
+            for n in missing
+        }
+        for n, future in futures.items():
+            try:
+                page = future.result()[0]
+                self.failed.pop(n, None)
+            except workers.TaskFailed as e:
+                logger.warning(f"Page {n} of {self.path} could not be extracted ({e.reason}); marking it RED")
+                self.failed[n] = e.reason
+                page = extraction.failed_page(n, str(e))
+            self.graph.input(("page", n), page)
+
+    def _boundary(self, page, scale):
+        return self.engine.extract(
+            page["page"], page["segments"],
+            scale["points_per_foot"] if scale else None,
+            (page["width"], page["height"]),
+        )
+
+    def _openings(self, schedule, *inputs):
+        """Detect openings on every plan page at once, grouped by page"""
+        numbers, levels = [], []
+        for page, scale, result in zip(inputs[::3], inputs[1::3], inputs[2::3]):
+            numbers.append(page["page"])
+            levels.append({
+                "page": page,
+                "polygon": result["polygon"],
+                "points_per_foot": scale["points_per_foot"] if scale else None,
+            })
+        by_page = {number: [] for number in numbers}
+        for opening in openings.detect_openings(levels, schedule):
+            by_page[numbers[opening["level"]]].append(dict(opening, level=0))
+        return by_page
+
+    def _define_page(self, n):
+        self.graph.define(("scale", n), _scale, [("page", n)])
+        self.graph.define(("boundary", n), self._boundary, [("page", n), ("scale", n)])
+
+    def boundary(self, n):
+        """
+        (extracted page, boundary) for plan page `n`, traced once and then
+        shared with the takeoff calculation. Hold self.lock while calling.
+        """
+        self._load_pages([n])
+        self._define_page(n)
+        return self.graph.get(("page", n)), self.graph.get(("boundary", n))
+
+    def update(self, floors):
+        """
+        Bring the graph in line with `floors` and return
+        {"takeoffs", "summary", "recalculated", "failed_pages"}, where
+        "recalculated" lists the levels whose rows had to be recomputed and
+        "failed_pages" maps plan pages that could not be extracted (their
+        floors are RED, and the next update tries them again) to the reason.
+        """
+        levels = [floor["level"] for floor in floors]
+        if len(set(levels)) != len(levels):
+            raise ValueError("Each floor must have a unique level")
+
+        g = self.graph
+        pages_for = floor_pages(floors, self.plan_pages)
+        used = sorted({n for n in pages_for if n})
+        self._load_pages(used + self.schedule_pages)
+
+        g.define(("schedule",), _schedule, [("page", n) for n in self.schedule_pages])
+        for n in used:
+            self._define_page(n)
+        g.define(("openings",), self._openings, [("schedule",)] + [
+            key for n in used for key in (("page", n), ("scale", n), ("boundary", n))
+        ])
+
+        last = None
+        for floor, number in zip(floors, pages_for):
+            source = number or last
+            last = source
+            g.input(("floor", floor["level"]), dict(floor, page_number=source, carried=not number))
+            deps = [("floor", floor["level"])]
+            if source:
+                deps += [("boundary", source), ("scale", source), ("openings",)]
+            g.define(("row", floor["level"]), _row, deps)
+        for key in g.keys("row") + g.keys("floor"):
+            if key[1] not in levels:
+                g.remove(key)
+        g.define(("summary",), summarize, [("row", level) for level in levels])
+
+        g.recomputed = []
+        takeoffs = [g.get(("row", level)) for level in levels]
+        summary = g.get(("summary",))
+        recalculated = [key[1] for key in g.recomputed if key[0] == "row"]
+        logger.info(f"Takeoff graph for {self.path}: recalculated {len(recalculated)} of {len(levels)} floors")
+        failed = {n: self.failed[n] for n in used if n in self.failed}
+        return {"takeoffs": takeoffs, "summary": summary, "recalculated": recalculated, "failed_pages": failed}
+
+
+_graphs = OrderedDict()
+_graphs_lock = threading.Lock()
+
+
+def graph_for(key, path, plan_pages, pool=None):
+    """The cached TakeoffGraph for a plan set, least recently used evicted"""
+    with _graphs_lock:
+        graph = _graphs.pop(key, None) or TakeoffGraph(path, plan_pages, pool)
+        _graphs[key] = graph
+        while len(_graphs) > GRAPH_CACHE_SIZE:
+            _graphs.popitem(last=False)
+    return graph
+
+
+def cache_status():
+    """Plan set graphs held in memory"""
+    with _graphs_lock:
+        return {"graphs": len(_graphs), "max_graphs": GRAPH_CACHE_SIZE}
@@ -0,0 +1,76 @@
+"""
+Analytics rollups stay equal to the takeoffs table under concurrent writes
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+# main configures its database from the environment at import
+_tmp = tempfile.mkdtemp()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp, 'rollups.db')}"
+os.environ["UPLOAD_DIR"] = os.path.join(_tmp, "uploads")
+os.environ["WARMUP"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import func  # noqa: E402
+
+import main  # noqa: E402
+
+THREADS = 8
+WRITES = 25
+
+
+def test_concurrent_writes_keep_rollups_in_step():
+    db = main.SessionLocal()
+    project = main.ProjectDB(name="Rollups")
+    db.add(project)
+    db.commit()
+    project_id = project.id
+    db.close()
+
+    errors = []
+
+    def write(worker):
+        for i in range(WRITES):
+            db = main.SessionLocal()
+            try:
+                db.add(main.TakeoffDB(
+                    project_id=project_id, level=f"L{worker}", wall_type="EW-1",
+                    material_type=("closed_cell", "open_cell")[i % 2], quantity=10.0 + worker,
+                    r_value="R-21", confidence="RED" if i % 5 == 0 else "GREEN"
+                ))
+                db.commit()
+            except Exception as e:
+                errors.append(e)
+            finally:
+                db.close()
+
+    threads = [threading.Thread(target=write, args=(worker,)) for worker in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    db = main.SessionLocal()
+    try:
+        takeoffs = dict(db.query(
+            main.TakeoffDB.material_type, func.sum(main.TakeoffDB.quantity)
+        ).group_by(main.TakeoffDB.material_type).all())
+        counts = dict(db.query(
+            main.TakeoffDB.material_type, func.count(main.TakeoffDB.id)
+        ).group_by(main.TakeoffDB.material_type).all())
+        rollups = db.query(
+            main.TakeoffRollupDB.material_type, func.sum(main.TakeoffRollupDB.sqft),
+            func.sum(main.TakeoffRollupDB.takeoffs), func.sum(main.TakeoffRollupDB.red)
+        ).group_by(main.TakeoffRollupDB.material_type).all()
+        red = db.query(func.count(main.TakeoffDB.id)).filter(main.TakeoffDB.confidence == "RED").scalar()
+    finally:
+        db.close()
+
+    assert sum(counts.values()) == THREADS * WRITES
+    assert {m: round(sqft, 6) for m, sqft, _, _ in rollups} == {m: round(q, 6) for m, q in takeoffs.items()}
+    assert {m: n for m, _, n, _ in rollups} == counts
+    assert sum(r for _, _, _, r in rollups) == red
@@ -0,0 +1,247 @@
+"""
+EcoSeal Takeoff System - Plan Tiles
+Zoomable tile pyramid for plan page previews, rendered on demand and
+cached on disk
+
+Zoom 0 fits the whole sheet in one TILE_PX square tile; each zoom level
+doubles the resolution, up to raster.MAX_DPI. A viewer requests only the
+tiles in view, each rendered from the PDF with a cropped pdfium render, so
+no request ever renders a full E-size sheet. Rendered tiles are PNGs kept
+on disk by file hash, page, zoom and tile coordinates, with the least
+recently used evicted once the cache passes its size limit.
+
+Boundary overlays are vector layers in page points (top-left origin, the
+same space as the tiles at zoom 0 x TILE_PX / longest side), as SVG or
+GeoJSON, so they stay sharp at every zoom.
+"""
+
+import io
+import logging
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pypdfium2 as pdfium
+from PIL import Image
+
+import raster
+
+logger = logging.getLogger(__name__)
+
+TILE_PX = 256
+
+# Rendered tiles kept on disk, in megabytes
+TILE_CACHE_MB = int(os.getenv("TILE_CACHE_MB", "512"))
+
+# Open PDF documents kept between tile requests
+OPEN_DOCUMENTS = 4
+
+# pdfium is not thread-safe; renders from the request thread pool take turns
+_render_lock = threading.Lock()
+_documents = OrderedDict()
+
+
+# ============================================================================
+# PYRAMID
+# ============================================================================
+
+def pyramid(width_pt, height_pt, tile_px=TILE_PX, max_dpi=raster.MAX_DPI):
+    """
+    Zoom levels for a page: {"width", "height" (points), "tile_size",
+    "max_zoom", "levels": [{"zoom", "scale" (px per point), "columns", "rows"}]}
+    """
+    base = tile_px / max(width_pt, height_pt)
+    max_zoom = max(0, math.ceil(math.log2(max_dpi / 72 / base)))
+    levels = []
+    for zoom in range(max_zoom + 1):
+        scale = base * 2 ** zoom
+        levels.append({
+            "zoom": zoom,
+            "scale": scale,
+            "columns": math.ceil(width_pt * scale / tile_px),
+            "rows": math.ceil(height_pt * scale / tile_px),
+        })
+    return {"width": width_pt, "height": height_pt, "tile_size": tile_px, "max_zoom": max_zoom, "levels": levels}
+
+
+def _document(path):
+    document = _documents.pop(path, None) or pdfium.PdfDocument(path)
+    _documents[path] = document
+    while len(_documents) > OPEN_DOCUMENTS:
+        _documents.popitem(last=False)[1].close()
+    return document
+
+
+def page_size(path, page_number):
+    """(width, height) of a page in points"""
+    with _render_lock:
+        return tuple(_document(path)[page_number - 1].get_size())
+
+
+def render_tile(path, page_number, zoom, x, y, tile_px=TILE_PX):
+    """
+    Render tile (x, y) of zoom level `zoom` as PNG bytes. Tiles on the
+    right and bottom edges are padded with white to the full tile size.
+    Raises ValueError for a tile outside the pyramid.
+    """
+    with _render_lock:
+        page = _document(path)[page_number - 1]
+        width_pt, height_pt = page.get_size()
+        levels = pyramid(width_pt, height_pt, tile_px)["levels"]
+        if not 0 <= zoom < len(levels):
+            raise ValueError(f"Zoom must be between 0 and {len(levels) - 1}")
+        level = levels[zoom]
+        if not (0 <= x < level["columns"] and 0 <= y < level["rows"]):
+            raise ValueError(f"Tile {x},{y} is outside zoom {zoom} ({level['columns']}x{level['rows']} tiles)")
+
+        step_pt = tile_px / level["scale"]
+        box = (x * step_pt, y * step_pt, min(width_pt, (x + 1) * step_pt), min(height_pt, (y + 1) * step_pt))
+        pixels = raster.render_tile(page, box, dpi=level["scale"] * 72)
+
+    tile = np.full((tile_px, tile_px), 255, dtype=np.uint8)
+    h, w = min(tile_px, pixels.shape[0]), min(tile_px, pixels.shape[1])
+    tile[:h, :w] = pixels[:h, :w]
+    buffer = io.BytesIO()
+    Image.fromarray(tile, "L").save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+# ============================================================================
+# DISK CACHE
+# ============================================================================
+
+class TileCache:
+    """
+    PNG tiles on disk under directory/<file hash>/<page>/<zoom>/<x>_<y>.png,
+    evicting the least recently used once the total passes `max_bytes`.
+
+    Recency is kept in file modification times, so it survives restarts;
+    each process tracks the sizes it knows about, so with several workers
+    the limit is approximate.
+    """
+
+    def __init__(self, directory, max_bytes=TILE_CACHE_MB * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self._files = None  # path -> size, least recently used first
+        self._total = 0
+
+    def _path(self, file_hash, page_number, zoom, x, y):
+        return os.path.join(self.directory, file_hash, str(page_number), str(zoom), f"{x}_{y}.png")
+
+    def _scan(self):
+        if self._files is not None:
+            return
+        found = []
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if name.endswith(".png"):
+                    path = os.path.join(root, name)
+                    stat = os.stat(path)
+                    found.append((stat.st_mtime, path, stat.st_size))
+        found.sort()
+        self._files = OrderedDict((path, size) for _, path, size in found)
+        self._total = sum(self._files.values())
+
+    def get(self, *key):
+        path = self._path(*key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        with self.lock:
+            self._scan()
+            if path in self._files:
+                self._files.move_to_end(path)
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return data
+
+    def put(self, data, *key):
+        path = self._path(*key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp = f"{path}.{threading.get_ident()}.part"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+        with self.lock:
+            self._scan()
+            self._total += len(data) - self._files.pop(path, 0)
+            self._files[path] = len(data)
+            while self._total > self.max_bytes and len(self._files) > 1:
+                old, size = self._files.popitem(last=False)
+                self._total -= size
+                try:
+                    os.remove(old)
+                except FileNotFoundError:
+                    pass
+
+    def status(self):
+        """Tiles on disk and their size against the limit"""
+        with self.lock:
+            self._scan()
+            return {
+                "tiles": len(self._files),
+                "mb": round(self._total / 2 ** 20, 1),
+                "max_mb": round(self.max_bytes / 2 ** 20, 1),
+            }
+
+    def tile(self, path, file_hash, page_number, zoom, x, y):
+        """Tile PNG from the cache, rendering and storing it on a miss"""
+        key = (file_hash, page_number, zoom, x, y)
+        data = self.get(*key)
+        if data is None:
+            data = render_tile(path, page_number, zoom, x, y)
+            self.put(data, *key)
+        return data
+
+
+# ============================================================================
+# OVERLAYS
+# ============================================================================
+
+def boundary_geojson(page_number, width_pt, height_pt, result):
+    """A boundary from boundary.BoundaryEngine.extract as a GeoJSON FeatureCollection in page points"""
+    features = []
+    if result and result["polygon"]:
+        ring = [[float(px), float(py)] for px, py in result["polygon"]]
+        ring.append(ring[0])
+        features.append({
+            "type": "Feature",
+            "geometry": {"type": "Polygon", "coordinates": [ring]},
+            "properties": {
+                "layer": "boundary",
+                "page": page_number,
+                "perimeter": result["perimeter"],
+                "area": result["area"],
+                "units": result["units"],
+                "method": result["method"],
+            },
+        })
+    return {
+        "type": "FeatureCollection",
+        # Planar page coordinates: points from the top-left corner, y down
+        "bbox": [0, 0, width_pt, height_pt],
+        "features": features,
+    }
+
+
+def boundary_svg(width_pt, height_pt, result, stroke="#e4572e"):
+    """A boundary as an SVG layer sized to the page, to lay over its tiles"""
+    shapes = ""
+    if result and result["polygon"]:
+        points = " ".join(f"{px:.2f},{py:.2f}" for px, py in result["polygon"])
+        shapes = (
+            f'<polygon points="{points}" fill="{stroke}" fill-opacity="0.12" stroke="{stroke}" '
+            f'stroke-width="2" vector-effect="non-scaling-stroke"/>'
+        )
+    return (
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width_pt:.2f} {height_pt:.2f}" '
+        f'width="{width_pt:.2f}" height="{height_pt:.2f}">{shapes}</svg>'
+    )
@@ -0,0 +1,325 @@
+"""
+EcoSeal Takeoff System - Extraction Workers
+Worker processes for PDF extraction with memory caps, timeouts and recycling
+
+pdfplumber can need gigabytes on a dense sheet, and a pathological page
+can hang or exhaust memory. Extraction therefore runs in a small pool of
+worker processes, never in the API process itself. A supervisor thread
+hands each worker one task at a time and watches it:
+
+- a worker whose resident memory passes the cap is killed;
+- a task running past the timeout is killed;
+- a worker that dies (a crash in a C library, say) is noticed;
+- a worker is retired after a number of tasks, so heap fragmentation
+  from one large page cannot accumulate.
+
+Killed and retired workers are replaced. The task's future fails with
+TaskFailed, and callers fall back to a RED-confidence page instead of
+failing the whole project. Each worker reports its peak RSS per task;
+status() lists it per worker with the pool's counters.
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from multiprocessing.connection import wait as wait_connections
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+# Worker processes in the API's extraction pool
+WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+
+# Resident memory (MB) a worker may reach before its task is killed
+MEMORY_LIMIT_MB = int(os.getenv("EXTRACTION_MEMORY_MB", "2048"))
+
+# Seconds a single task may run
+TASK_TIMEOUT_S = float(os.getenv("EXTRACTION_TIMEOUT_S", "120"))
+
+# Tasks a worker runs before it is replaced
+MAX_TASKS_PER_WORKER = int(os.getenv("EXTRACTION_MAX_TASKS", "25"))
+
+# Supervisor polling interval for results, memory and timeouts
+POLL_SECONDS = 0.05
+
+# Failures kept for status()
+RECENT_FAILURES = 20
+
+# Modules workers import once at start rather than per task
+PRELOAD = ["extraction", "boundary", "openings", "takeoff", "page_index"]
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+
+class TaskFailed(Exception):
+    """A task killed for memory or time, lost with its worker, or raising an error"""
+
+    def __init__(self, reason, message, peak_rss_mb=None):
+        super().__init__(message)
+        self.reason = reason  # memory, timeout, crashed, error
+        self.peak_rss_mb = peak_rss_mb
+
+
+# ============================================================================
+# MEMORY
+# ============================================================================
+
+def rss_mb(pid):
+    """Resident memory of a process in MB, or None where /proc is unavailable"""
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE / 2 ** 20
+    except (OSError, IndexError, ValueError):
+        return None
+
+
+def _reset_peak():
+    # Linux resets VmHWM (peak RSS) when "5" is written to clear_refs
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+    except OSError:
+        pass
+
+
+def _peak_mb():
+    """Peak RSS of this process since the last _reset_peak, in MB"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    if resource is not None:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+    return None
+
+
+# ============================================================================
+# WORKER PROCESS
+# ============================================================================
+
+def _serve(connection, max_tasks):
+    """Run tasks from `connection` one at a time, then exit after `max_tasks`"""
+    for _ in range(max_tasks):
+        try:
+            task = connection.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+        function, args, kwargs = task
+        _reset_peak()
+        try:
+            outcome = ("ok", function(*args, **kwargs))
+        except MemoryError:
+            outcome = ("memory", "Out of memory")
+        except Exception as e:
+            outcome = ("error", f"{type(e).__name__}: {e}")
+        connection.send(outcome + (_peak_mb(),))
+    connection.close()
+
+
+class _Worker:
+    def __init__(self, context, max_tasks):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_serve, args=(child, max_tasks), daemon=True)
+        self.process.start()
+        child.close()
+        self.tasks = 0
+        self.task = None  # (future, description, started)
+        self.peak_rss_mb = 0.0
+        self.started = time.time()
+
+    def status(self):
+        return {
+            "pid": self.process.pid,
+            "state": "busy" if self.task else "idle",
+            "task": self.task[1] if self.task else None,
+            "tasks": self.tasks,
+            "rss_mb": _round(rss_mb(self.process.pid)),
+            "peak_rss_mb": _round(self.peak_rss_mb),
+            "uptime_s": round(time.time() - self.started, 1),
+        }
+
+
+def _round(value):
+    return round(value, 1) if value is not None else None
+
+
+# ============================================================================
+# POOL
+# ============================================================================
+
+class WorkerPool:
+    """
+    A fixed number of supervised worker processes. submit() returns a
+    concurrent.futures.Future; the pool starts on first use.
+    """
+
+    def __init__(self, workers=WORKERS, memory_limit_mb=MEMORY_LIMIT_MB, timeout_s=TASK_TIMEOUT_S,
+                 max_tasks=MAX_TASKS_PER_WORKER, preload=PRELOAD):
+        self.size = max(1, workers)
+        self.memory_limit_mb = memory_limit_mb
+        self.timeout_s = timeout_s
+        self.max_tasks = max(1, max_tasks)
+        methods = multiprocessing.get_all_start_methods()
+        # Workers are never forked from a process running threads and DB connections
+        self.context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        if self.context.get_start_method() == "forkserver":
+            self.context.set_forkserver_preload(preload)
+        self.lock = threading.Lock()
+        self.queue = deque()
+        self.workers = []
+        self.counts = {"completed": 0, "failed": 0, "recycled": 0, "killed_memory": 0, "killed_timeout": 0,
+                       "crashed": 0}
+        self.peak_rss_mb = 0.0
+        self.failures = deque(maxlen=RECENT_FAILURES)
+        self._thread = None
+        self._closed = False
+
+    def start(self):
+        """Start the workers and supervisor, if not running yet"""
+        with self.lock:
+            if self._thread is None and not self._closed:
+                self.workers = [_Worker(self.context, self.max_tasks) for _ in range(self.size)]
+                self._thread = threading.Thread(target=self._supervise, name="extraction-pool", daemon=True)
+                self._thread.start()
+                logger.info(f"Started {self.size} extraction workers ({self.context.get_start_method()})")
+
+    def submit(self, function, *args, description=None, **kwargs):
+        future = Future()
+        with self.lock:
+            if self._closed:
+                raise RuntimeError("Worker pool is shut down")
+            self.queue.append((future, function, args, kwargs, description or function.__name__))
+        self.start()
+        return future
+
+    def run(self, function, *args, description=None, **kwargs):
+        """submit() and wait for the result; raises TaskFailed"""
+        return self.submit(function, *args, description=description, **kwargs).result()
+
+    def status(self):
+        with self.lock:
+            return {
+                "workers": [worker.status() for worker in self.workers],
+                "queued": len(self.queue),
+                "busy": sum(worker.task is not None for worker in self.workers),
+                **self.counts,
+                "peak_rss_mb": _round(self.peak_rss_mb),
+                "memory_limit_mb": self.memory_limit_mb,
+                "timeout_s": self.timeout_s,
+                "max_tasks_per_worker": self.max_tasks,
+                "recent_failures": list(self.failures),
+            }
+
+    def shutdown(self):
+        with self.lock:
+            self._closed = True
+            queued, self.queue = list(self.queue), deque()
+        for future, *_ in queued:
+            future.cancel()
+        if self._thread is not None:
+            self._thread.join()
+
+    # Supervisor thread ------------------------------------------------------
+
+    def _finish(self, worker, outcome, value, peak):
+        future, description, _ = worker.task
+        worker.task = None
+        worker.tasks += 1
+        if peak is not None:
+            worker.peak_rss_mb = max(worker.peak_rss_mb, peak)
+            self.peak_rss_mb = max(self.peak_rss_mb, peak)
+        if outcome == "ok":
+            self.counts["completed"] += 1
+            future.set_result(value)
+            return
+        self.counts["failed"] += 1
+        self.failures.append({"task": description, "reason": outcome, "message": value,
+                              "peak_rss_mb": _round(peak), "at": time.time()})
+        logger.warning(f"Extraction task {description} failed ({outcome}): {value}")
+        future.set_exception(TaskFailed(outcome, value, _round(peak)))
+
+    def _replace(self, worker, kill=False):
+        if kill:
+            worker.process.kill()
+        worker.process.join()
+        worker.connection.close()
+        self.workers[self.workers.index(worker)] = _Worker(self.context, self.max_tasks)
+
+    def _supervise(self):
+        while True:
+            with self.lock:
+                if self._closed and not any(worker.task for worker in self.workers):
+                    break
+                for worker in list(self.workers):
+                    if worker.task is not None or not self.queue:
+                        continue
+                    if not worker.process.is_alive():
+                        self._replace(worker)
+                        continue
+                    future, function, args, kwargs, description = self.queue.popleft()
+                    if future.set_running_or_notify_cancel():
+                        worker.task = (future, description, time.monotonic())
+                        worker.connection.send((function, args, kwargs))
+                busy = {worker.connection: worker for worker in self.workers if worker.task}
+
+            if busy:
+                ready = wait_connections(list(busy), timeout=POLL_SECONDS)
+            else:
+                ready = []
+                time.sleep(POLL_SECONDS)
+
+            with self.lock:
+                for connection in ready:
+                    worker = busy[connection]
+                    try:
+                        outcome, value, peak = connection.recv()
+                    except (EOFError, OSError):
+                        worker.process.join(timeout=1)
+                        self.counts["crashed"] += 1
+                        self._finish(worker, "crashed", f"Worker exited with code {worker.process.exitcode}",
+                                     worker.peak_rss_mb)
+                        self._replace(worker, kill=True)
+                        continue
+                    self._finish(worker, outcome, value, peak)
+                    if outcome == "memory" or worker.tasks >= self.max_tasks:
+                        self.counts["recycled"] += 1
+                        self._replace(worker)
+
+                now = time.monotonic()
+                for worker in list(self.workers):
+                    if worker.task is None:
+                        continue
+                    rss = rss_mb(worker.process.pid)
+                    if rss is not None:
+                        worker.peak_rss_mb = max(worker.peak_rss_mb, rss)
+                        self.peak_rss_mb = max(self.peak_rss_mb, rss)
+                    if rss is not None and rss > self.memory_limit_mb:
+                        self.counts["killed_memory"] += 1
+                        self._finish(worker, "memory", f"Worker passed {self.memory_limit_mb} MB", rss)
+                        self._replace(worker, kill=True)
+                    elif now - worker.task[2] > self.timeout_s:
+                        self.counts["killed_timeout"] += 1
+                        self._finish(worker, "timeout", f"Task ran over {self.timeout_s:g}s", rss)
+                        self._replace(worker, kill=True)
+
+        for worker in self.workers:
+            try:
+                worker.connection.send(None)
+            except OSError:
+                pass
+            worker.process.join(timeout=5)
+            if worker.process.is_alive():
+                worker.process.kill()
@@ -1,6 +1,6 @@
 import React, { useState, useEffect } from 'react'
 import './App.css'
-import { createProject, listProjects, createTakeoff, listTakeoffs, getStats } from './api'
+import { createProject, listProjects, createTakeoff, listTakeoffs, getStats, newIdempotencyKey, retryWrite } from './api'
 
 export default function App() {
   const [page, setPage] = useState('new-takeoff')
@@ -54,11 +54,12 @@ export default function App() {
     
     setLoading(true)
     try {
-      const res = await createProject({
+      const key = newIdempotencyKey()
+      const res = await retryWrite(() => createProject({
         name: projectName,
         date: projectDate,
         notes: projectNotes
-      })
+      }, key))
       setSelectedProject(res.data)
       setCurrentStep(1)
       await loadProjects()
@@ -89,7 +90,9 @@ export default function App() {
         confidence: 'GREEN'
       }
       
-      await createTakeoff(selectedProject.id, takeoff)
+      // One key per save, so retries cannot duplicate the row
+      const key = newIdempotencyKey()
+      await retryWrite(() => createTakeoff(selectedProject.id, takeoff, key))
       await loadStats()
       alert('Takeoff saved!')
     } catch (err) {
@@ -423,7 +426,7 @@ export default function App() {
                             <td><b>{proj.name}</b></td>
                             <td>{new Date(proj.date).toLocaleDateString()}</td>
                             <td>{proj.status}</td>
-                            <td>—</td>
+                            <td>{proj.takeoff_count}</td>
                           </tr>
                         ))
                       )}
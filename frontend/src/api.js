@@ -9,22 +9,90 @@ const api = axios.create({
   }
 })
 
+// A read shed under load (429/503) is retried once after its Retry-After
+api.interceptors.response.use(undefined, async (err) => {
+  const { config, response } = err
+  if (!response || ![429, 503].includes(response.status) || config.method !== 'get' || config._retried) {
+    throw err
+  }
+  const seconds = Math.min(Number(response.headers['retry-after']) || 1, 10)
+  await new Promise((resolve) => setTimeout(resolve, seconds * 1000))
+  return api({ ...config, _retried: true })
+})
+
+// Writes sent with an Idempotency-Key are safe to retry: the API replays
+// the first response instead of writing again
+const idempotent = (key) => (key ? { headers: { 'Idempotency-Key': key } } : undefined)
+export const newIdempotencyKey = () => crypto.randomUUID()
+
+// Retry a keyed write when the connection drops before a response arrives
+export const retryWrite = async (send, attempts = 3) => {
+  for (let attempt = 1; ; attempt++) {
+    try {
+      return await send()
+    } catch (err) {
+      if (err.response || attempt >= attempts) throw err
+      await new Promise((resolve) => setTimeout(resolve, 500 * attempt))
+    }
+  }
+}
+
 // Projects
-export const createProject = (projectData) => api.post('/api/projects', projectData)
+export const createProject = (projectData, idempotencyKey) => api.post('/api/projects', projectData, idempotent(idempotencyKey))
 export const listProjects = () => api.get('/api/projects')
 export const getProject = (id) => api.get(`/api/projects/${id}`)
+export const getProjectFull = (id) => api.get(`/api/projects/${id}/full`)
 export const updateProject = (id, projectData) => api.put(`/api/projects/${id}`, projectData)
 export const deleteProject = (id) => api.delete(`/api/projects/${id}`)
 
 // Takeoffs
-export const createTakeoff = (projectId, takeoffData) => api.post(`/api/projects/${projectId}/takeoffs`, takeoffData)
+export const createTakeoff = (projectId, takeoffData, idempotencyKey) => api.post(`/api/projects/${projectId}/takeoffs`, takeoffData, idempotent(idempotencyKey))
+export const createTakeoffs = (projectId, takeoffs, idempotencyKey) => api.post(`/api/projects/${projectId}/takeoffs/batch`, takeoffs, idempotent(idempotencyKey))
 export const listTakeoffs = (projectId) => api.get(`/api/projects/${projectId}/takeoffs`)
 export const deleteTakeoff = (projectId, takeoffId) => api.delete(`/api/projects/${projectId}/takeoffs/${takeoffId}`)
 
+// Plan page previews: tile pyramid and vector boundary overlay
+const planPage = (projectId, fileHash, page) => `/api/projects/${projectId}/plans/${fileHash}/pages/${page}`
+export const getTilePyramid = (projectId, fileHash, page) => api.get(`${planPage(projectId, fileHash, page)}/tiles`)
+export const tileUrl = (projectId, fileHash, page, zoom, x, y) =>
+  `${API_URL}${planPage(projectId, fileHash, page)}/tiles/${zoom}/${x}/${y}.png`
+export const getBoundaryGeoJSON = (projectId, fileHash, page) => api.get(`${planPage(projectId, fileHash, page)}/boundary.geojson`)
+export const boundarySvgUrl = (projectId, fileHash, page) => `${API_URL}${planPage(projectId, fileHash, page)}/boundary.svg`
+
 // Settings
 export const updateSetting = (key, value) => api.post('/api/settings', { key, value })
 export const getSetting = (key) => api.get(`/api/settings/${key}`)
 
+// Sync: keep a local copy of projects, takeoffs and settings up to date
+// by fetching only what changed since the last sync
+export const syncChanges = (since = 0) => api.get('/api/sync', { params: { since } })
+
+const SYNC_STORAGE_KEY = 'ecoseal-sync'
+
+export const syncLocalCopy = async () => {
+  const local = JSON.parse(localStorage.getItem(SYNC_STORAGE_KEY) || 'null') ||
+    { seq: 0, projects: {}, takeoffs: {}, settings: {} }
+  let more = true
+  while (more) {
+    const { data } = await syncChanges(local.seq)
+    for (const [table, rows] of Object.entries(data.changes)) {
+      for (const row of rows) local[table][row.id] = row
+    }
+    for (const [table, ids] of Object.entries(data.deleted)) {
+      for (const id of ids) delete local[table][id]
+    }
+    local.seq = data.seq
+    more = data.more
+  }
+  localStorage.setItem(SYNC_STORAGE_KEY, JSON.stringify(local))
+  return local
+}
+
+// Material orders (foam sets/drums, sealant, poly) per delivery phase
+export const getProjectOrders = (projectId, deliveryDrums) => api.get(`/api/projects/${projectId}/orders`, { params: { delivery_drums: deliveryDrums } })
+export const getOrders = (status = ['draft', 'in_progress'], deliveryDrums) =>
+  api.get('/api/orders', { params: { status, delivery_drums: deliveryDrums }, paramsSerializer: { indexes: null } })
+
 // Stats
 export const getStats = () => api.get('/api/stats')
 export const healthCheck = () => api.get('/health')
@@ -1,10 +1,89 @@
 # streamlit_app.py
 """EcoSeal Takeoff System - INTERFACE"""
 
+import os
+import sys
+import uuid
+
 import streamlit as st
 import pandas as pd
 from datetime import datetime
 
+# Backend modules (PDF page index) live alongside the API
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend"))
+import page_index
+from api_client import APIClient, APIError
+
+# Boundary perimeter shown in step 4 (from the extracted outline)
+BOUNDARY_PERIMETER_FT = 520.0
+
+SHEET_GROUPS = [
+    ("Floor Plan Sheets", ["floor_plan"]),
+    ("Section Sheets", ["section", "elevation"]),
+    ("Schedule Sheets", ["schedule", "detail", "other"]),
+]
+
+
+@st.cache_data(show_spinner="Indexing plan pages...")
+def index_plan_set(pdf_bytes):
+    """Classify every page of an uploaded plan set (cached per file)"""
+    return page_index.build_index(pdf_bytes)
+
+
+@st.cache_resource
+def api():
+    """One API client (and pooled HTTP session) per server process"""
+    return APIClient()
+
+
+@st.cache_data(ttl=60, show_spinner=False)
+def quick_stats():
+    """This month's bucket and all-time totals from the analytics endpoint, or None"""
+    try:
+        data = api().analytics(period="month")
+    except APIError:
+        return None
+    month = datetime.utcnow().strftime("%Y-%m-01")
+    current = next((b for b in data["buckets"] if b["start"] == month), None)
+    return {"month": current, "totals": data["totals"]}
+
+
+@st.cache_data(ttl=30, show_spinner=False)
+def recent_projects():
+    """Saved projects, newest first, or None if the API is unavailable"""
+    try:
+        return api().list_projects()
+    except APIError:
+        return None
+
+
+def takeoff_rows(project_data):
+    """TakeoffItem payloads for the wizard's floors and confirmed assemblies"""
+    assemblies = {a['Wall Type']: a for a in project_data.get('assemblies', [])}
+    perimeter = project_data.get('perimeter_ft', BOUNDARY_PERIMETER_FT)
+    rows = []
+    for level, floor in project_data.get('floors', {}).items():
+        assembly = assemblies.get(floor['assembly'], {})
+        rows.append({
+            "level": level,
+            "wall_type": floor['assembly'],
+            "material_type": assembly.get('Material', "ccSPF"),
+            "quantity": round(perimeter * floor['height'], 1),
+            "unit": "sqft",
+            "assembly": assembly.get('Assembly', ""),
+            "r_value": assembly.get('R-Value', ""),
+            "perimeter_ft": perimeter,
+            "height_ft": floor['height'],
+            "confidence": "GREEN" if assembly.get('Confirmed') else "YELLOW",
+        })
+    return rows
+
+
+def page_label(entry):
+    """Human-readable label for a page index entry"""
+    name = entry["title"] or entry["sheet_number"] or entry["page_type"].replace("_", " ").title()
+    return f"Page {entry['page_number']}: {name}"
+
 # Page config
 st.set_page_config(
     page_title="EcoSeal Takeoff System",
@@ -67,8 +146,14 @@ with st.sidebar:
     
     st.divider()
     st.markdown("### Quick Stats")
-    st.metric("Projects this month", "12")
-    st.metric("Total takeoffs", "47")
+    stats = quick_stats()
+    if stats:
+        st.metric("Projects this month", stats["month"]["projects"] if stats["month"] else 0)
+        st.metric("Total takeoffs", stats["totals"]["takeoffs"])
+    else:
+        st.metric("Projects this month", "—")
+        st.metric("Total takeoffs", "—")
+        st.caption("API unavailable")
     
     st.divider()
     st.markdown("### About")
@@ -119,12 +204,13 @@ if page == "New Takeoff":
             )
             st.session_state.project_data['project_date'] = str(project_date)
         
-        st.text_area(
+        project_notes = st.text_area(
             "Project Notes (optional)",
             placeholder="e.g., Multi-family residential, 5 storeys, wood frame...",
             value=st.session_state.project_data.get('project_notes', ''),
             height=100
         )
+        st.session_state.project_data['project_notes'] = project_notes
         
         st.divider()
         
@@ -155,16 +241,21 @@ if page == "New Takeoff":
         )
         
         if uploaded_file:
-            # Simulate file upload
+            index = index_plan_set(uploaded_file.getvalue())
+            scanned = sum(1 for entry in index if entry['features']['words'] == 0)
+            pdf_format = "Scanned PDF (raster)" if scanned == len(index) else "Vector PDF (extractable)"
+            
             st.markdown(f"""
             <div class="success-box">
             ✓ <b>File uploaded:</b> {uploaded_file.name}<br>
-            ✓ <b>Format:</b> Vector PDF (extractable)
+            ✓ <b>Format:</b> {pdf_format}<br>
+            ✓ <b>Pages indexed:</b> {len(index)}
             </div>
             """, unsafe_allow_html=True)
             
             st.session_state.project_data['pdf_name'] = uploaded_file.name
-            st.session_state.project_data['pdf_pages'] = 35
+            st.session_state.project_data['pdf_pages'] = len(index)
+            st.session_state.project_data['page_index'] = index
         
         st.divider()
         
@@ -184,40 +275,44 @@ if page == "New Takeoff":
         st.markdown("### Step 2️⃣ Select Floor Plan & Schedule Sheets", help="Choose which PDF pages to use")
         st.divider()
         
-        # Simulate PDF preview
-        st.markdown("**Available pages in PDF:**")
-        
-        col1, col2, col3 = st.columns(3)
-        
-        with col1:
-            st.markdown("**Floor Plan Sheets**")
-            floor_plan_1 = st.checkbox("Page 1: Floor Plan L2-3", value=True)
-            floor_plan_2 = st.checkbox("Page 2: Floor Plan L3-4", value=True)
-            floor_plan_3 = st.checkbox("Page 3: Floor Plan L4-5", value=False)
-        
-        with col2:
-            st.markdown("**Section Sheets**")
-            section_1 = st.checkbox("Page 4: Section A-A", value=False)
-        
-        with col3:
-            st.markdown("**Schedule Sheets**")
-            schedule = st.checkbox("Page 5: Wall Schedule", value=True)
-            details = st.checkbox("Page 6: Details", value=False)
+        index = st.session_state.project_data.get('page_index', [])
+        st.markdown(f"**Available pages in PDF:** {len(index)} (classified automatically)")
+        
+        # Floor plans and schedules are preselected; sections are for reference
+        selected_pages = []
+        for column, (heading, page_types) in zip(st.columns(3), SHEET_GROUPS):
+            with column:
+                st.markdown(f"**{heading}**")
+                entries = [entry for entry in index if entry['page_type'] in page_types]
+                labels = {page_label(entry): entry for entry in entries}
+                defaults = [
+                    label for label, entry in labels.items()
+                    if entry['page_type'] in ("floor_plan", "schedule")
+                ]
+                chosen = st.multiselect(
+                    heading,
+                    list(labels),
+                    default=defaults,
+                    key=f"sheets_{page_types[0]}",
+                    label_visibility="collapsed"
+                )
+                selected_pages.extend(labels[label] for label in chosen)
+                low_confidence = sum(1 for entry in entries if entry['confidence'] != "GREEN")
+                if low_confidence:
+                    st.caption(f"⚠️ {low_confidence} page(s) classified with low confidence")
         
         st.markdown("---")
         
         # Show selected floor plans
         st.markdown("**Selected Floor Plans:**")
-        selected_plans = []
-        if floor_plan_1:
-            selected_plans.append("• Page 1: Floor Plan L2-3")
-        if floor_plan_2:
-            selected_plans.append("• Page 2: Floor Plan L3-4")
-        if floor_plan_3:
-            selected_plans.append("• Page 3: Floor Plan L4-5")
+        selected_plans = [entry for entry in selected_pages if entry['page_type'] == "floor_plan"]
+        for entry in selected_plans:
+            level = f" (Level {entry['level']})" if entry['level'] else ""
+            st.markdown(f"• {page_label(entry)}{level}")
         
-        for plan in selected_plans:
-            st.markdown(plan)
+        st.session_state.project_data['selected_pages'] = sorted(
+            entry['page_number'] for entry in selected_pages
+        )
         
         st.divider()
         
@@ -314,6 +409,7 @@ if page == "New Takeoff":
         """, unsafe_allow_html=True)
         
         st.session_state.project_data['boundary_extracted'] = True
+        st.session_state.project_data['perimeter_ft'] = BOUNDARY_PERIMETER_FT
         
         st.divider()
         
@@ -446,42 +542,45 @@ if page == "New Takeoff":
         st.markdown("### Step 7️⃣ Review & Export", help="Review takeoff and download results")
         st.divider()
         
+        rows = takeoff_rows(st.session_state.project_data)
+        detail_df = pd.DataFrame([
+            {
+                'Level': row['level'],
+                'Wall Type': row['wall_type'],
+                'Material': row['material_type'],
+                'Perimeter': f"{row['perimeter_ft']:,.0f} ft",
+                'Height': f"{row['height_ft']:.1f} ft",
+                'Quantity': f"{row['quantity']:,.0f} sqft",
+                'R-Value': row['r_value']
+            }
+            for row in rows
+        ])
+        quantities = pd.DataFrame(rows, columns=['material_type', 'quantity', 'r_value', 'perimeter_ft'])
+        r_numbers = quantities['r_value'].str.extract(r'(\d+(?:\.\d+)?)')[0].astype(float)
+        rated = r_numbers.notna()
+        avg_r = (r_numbers[rated] * quantities['quantity'][rated]).sum() / quantities['quantity'][rated].sum() if rated.any() else None
+        
         # Summary
         st.markdown("#### 📊 Takeoff Summary")
         
-        summary_data = {
-            'Material': ['ccSPF (Spray Foam)', 'Batt Insulation', 'Sealant/Firestopping'],
-            'Quantity': ['17,140 sqft', '0 sqft', '2,080 lf'],
-            'R-Value': ['R-24 avg', 'N/A', 'N/A']
-        }
-        
-        summary_df = pd.DataFrame(summary_data)
+        summary_df = quantities.groupby('material_type', as_index=False)['quantity'].sum()
+        summary_df.columns = ['Material', 'Quantity (sqft)']
         st.dataframe(summary_df, use_container_width=True, hide_index=True)
         
         col1, col2, col3 = st.columns(3)
         with col1:
-            st.metric("Total ccSPF", "17,140 sqft")
+            ccspf = quantities.loc[quantities['material_type'] == "ccSPF", 'quantity'].sum()
+            st.metric("Total ccSPF", f"{ccspf:,.0f} sqft")
         with col2:
-            st.metric("Total Perimeter", "520 ft")
+            st.metric("Total Perimeter", f"{st.session_state.project_data.get('perimeter_ft', BOUNDARY_PERIMETER_FT):,.0f} ft")
         with col3:
-            st.metric("Avg R-Value", "R-27")
+            st.metric("Avg R-Value", f"R-{avg_r:.0f}" if avg_r else "N/A")
         
         st.divider()
         
         # Detail breakdown
         st.markdown("#### 📋 Item Breakdown")
         
-        detail_data = {
-            'Level': ['L2-3', 'L3-4', 'L4-5', 'Parapet'],
-            'Wall Type': ['EW-1', 'EW-1', 'EW-1', 'EW-2'],
-            'Material': ['ccSPF', 'ccSPF', 'ccSPF', 'ccSPF'],
-            'Perimeter': ['520 ft', '520 ft', '520 ft', '520 ft'],
-            'Height': ['10.0 ft', '10.5 ft', '10.0 ft', '4.0 ft'],
-            'Quantity': ['5,200 sqft', '5,460 sqft', '5,200 sqft', '2,080 sqft'],
-            'R-Value': ['R-24', 'R-24', 'R-24', 'R-30']
-        }
-        
-        detail_df = pd.DataFrame(detail_data)
         st.dataframe(detail_df, use_container_width=True, hide_index=True)
         
         st.divider()
@@ -507,7 +606,9 @@ if page == "New Takeoff":
         with col1:
             st.download_button(
                 label="📥 CSV",
-                data="Level,Wall Type,Material,Quantity,R-Value\nL2-3,EW-1,ccSPF,5200,R-24\nL3-4,EW-1,ccSPF,5460,R-24\nL4-5,EW-1,ccSPF,5200,R-24\nParapet,EW-2,ccSPF,2080,R-30",
+                data=pd.DataFrame(rows)[['level', 'wall_type', 'material_type', 'quantity', 'r_value']].to_csv(
+                    index=False, header=['Level', 'Wall Type', 'Material', 'Quantity', 'R-Value']
+                ) if rows else "",
                 file_name=f"{st.session_state.project_data.get('project_name', 'takeoff')}.csv",
                 mime="text/csv",
                 use_container_width=True
@@ -523,8 +624,29 @@ if page == "New Takeoff":
             )
         
         with col3:
-            if st.button("💾 Save Project", use_container_width=True, key="save_project"):
-                st.success("✓ Project saved")
+            # Saved once per wizard run; reruns and repeat clicks don't resubmit,
+            # and a retry after a failed save reuses the same idempotency key
+            saved = st.session_state.get('saved_project')
+            save_key = st.session_state.setdefault('save_key', uuid.uuid4().hex)
+            if st.button("💾 Save Project", use_container_width=True, key="save_project", disabled=bool(saved)):
+                data = st.session_state.project_data
+                try:
+                    with st.spinner("Saving..."):
+                        project, _ = api().save_project(
+                            data.get('project_name', ''),
+                            rows,
+                            notes=data.get('project_notes', ''),
+                            date=data.get('project_date'),
+                            idempotency_key=save_key
+                        )
+                    st.session_state.saved_project = project['id']
+                    recent_projects.clear()
+                    quick_stats.clear()
+                    saved = project['id']
+                except APIError as e:
+                    st.error(f"Could not save project: {e}")
+            if saved:
+                st.success(f"✓ Project saved (#{saved})")
         
         st.divider()
         
@@ -537,6 +659,8 @@ if page == "New Takeoff":
             if st.button("✨ New Takeoff", use_container_width=True):
                 st.session_state.step = 0
                 st.session_state.project_data = {}
+                st.session_state.pop('saved_project', None)
+                st.session_state.pop('save_key', None)
                 st.rerun()
 
 # ============================================================================
@@ -548,21 +672,27 @@ elif page == "Recent Projects":
     st.markdown("### 📂 Recent Projects", help="Your saved takeoff projects")
     st.divider()
     
-    # Sample recent projects
-    projects_data = {
-        'Project': ['Riverside Towers Phase 2B', 'Downtown Infill (King St)', 'Lakefront Residences'],
-        'Date': ['2026-02-24', '2026-02-22', '2026-02-20'],
-        'Status': ['✓ Complete', '⏳ In Progress', '✓ Complete'],
-        'Total ccSPF': ['17,140 sqft', '8,920 sqft', '12,500 sqft'],
-    }
-    
-    projects_df = pd.DataFrame(projects_data)
-    
-    st.dataframe(
-        projects_df,
-        use_container_width=True,
-        hide_index=True
-    )
+    status_labels = {'complete': '✓ Complete', 'in_progress': '⏳ In Progress', 'draft': '📝 Draft'}
+    projects = recent_projects()
+    
+    if projects is None:
+        st.warning("Could not reach the takeoff API. Check that the backend is running.")
+    elif not projects:
+        st.info("No saved projects yet.")
+    else:
+        projects_df = pd.DataFrame({
+            'Project': [p['name'] for p in projects],
+            'Date': [p['date'][:10] for p in projects],
+            'Status': [status_labels.get(p['status'], p['status']) for p in projects],
+            'Takeoffs': [p['takeoff_count'] for p in projects],
+            'Total ccSPF': [f"{p['materials'].get('ccSPF', 0):,.0f} sqft" for p in projects],
+        })
+        
+        st.dataframe(
+            projects_df,
+            use_container_width=True,
+            hide_index=True
+        )
     
     st.divider()
     